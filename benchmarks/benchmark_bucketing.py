@@ -0,0 +1,46 @@
+'''
+Report the padding ratio of batches with and without bucketing samples by lengths
+(see ``bucket_size`` of :meth:`cotk.dataloader.LanguageProcessingBase.restart`).
+
+Usage::
+
+	python benchmarks/benchmark_bucketing.py [--size 20000] [--batch_size 64] [--bucket_size 6400]
+'''
+import os
+import random
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+
+from benchmark_get_batch import DATALOADERS, write_corpus
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+	parser.add_argument("--size", type=int, default=20000, help="number of samples in each set")
+	parser.add_argument("--batch_size", type=int, default=64)
+	parser.add_argument("--bucket_size", type=int, default=6400)
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	with tempfile.TemporaryDirectory() as tmpdir:
+		results = []
+		for base_name, name, cls, _ in DATALOADERS:
+			path = os.path.join(tmpdir, name)
+			write_corpus(path, name, args.size, rng)
+			with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+				dl = cls(path, cache_dir=os.path.join(tmpdir, "cache"))
+				dl.restart("train", args.batch_size, shuffle=True)
+				shuffled = dl.get_padding_ratio("train")
+				dl.restart("train", shuffle=True, bucket_size=args.bucket_size)
+				bucketed = dl.get_padding_ratio("train")
+				dl.restart("test", args.batch_size, shuffle=False, bucket_size=dl.data_size["test"])
+				inference = dl.get_padding_ratio("test")
+			results.append((base_name, shuffled, bucketed, inference))
+
+	print("batch_size = %d, bucket_size = %d" % (args.batch_size, args.bucket_size))
+	print("%-24s %10s %10s %10s" % ("padding ratio", "shuffle", "bucket", "sorted"))
+	for base_name, shuffled, bucketed, inference in results:
+		print("%-24s %10.4f %10.4f %10.4f" % (base_name, shuffled, bucketed, inference))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,58 @@
+'''
+A benchmark of ``get_all_batch``, comparing the bulk reading of stored ids with calling
+``get_batch`` for each sample (the implementation it replaced). The peak memory of
+building the result is measured by :mod:`tracemalloc`.
+
+Usage::
+
+	python benchmarks/benchmark_get_all_batch.py [--size 20000]
+'''
+import os
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+from cotk.dataloader import LanguageProcessingBase
+
+from benchmark_get_batch import DATALOADERS, write_corpus
+
+def measure(func):
+	tracemalloc.start()
+	start = time.perf_counter()
+	res = func()
+	elapsed = time.perf_counter() - start
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del res
+	return elapsed, peak
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+	parser.add_argument("--size", type=int, default=20000, help="number of samples in each set")
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	with tempfile.TemporaryDirectory() as tmpdir:
+		results = []
+		for base_name, name, cls, _ in DATALOADERS:
+			path = os.path.join(tmpdir, name)
+			write_corpus(path, name, args.size, rng)
+			with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+				dl = cls(path, cache_dir=os.path.join(tmpdir, "cache"))
+			index = dl.index["test"]
+			loop = measure(lambda: LanguageProcessingBase._get_all_batch(dl, "test", index))
+			bulk = measure(lambda: dl.get_all_batch("test"))
+			ragged = measure(lambda: dl.get_all_batch("test", ragged=True))
+			results.append((base_name, loop, bulk, ragged))
+
+	print("size = %d" % args.size)
+	print("%-24s %18s %18s %18s" % ("ms / peak MB", "per sample", "bulk", "bulk ragged"))
+	for base_name, *timings in results:
+		print("%-24s" % base_name + "".join("%11.1f / %5.1f" % (elapsed * 1000, peak / 2 ** 20) \
+			for elapsed, peak in timings))
+
+if __name__ == "__main__":
+	main()
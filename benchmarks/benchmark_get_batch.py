@@ -0,0 +1,118 @@
+'''
+A micro-benchmark of ``get_batch``, comparing the padding engine in
+:mod:`cotk.dataloader.ragged_array` with the per-row python loops it replaced.
+The engine is timed through the whole ``get_batch`` (including the ``allvocabs``
+copy and unk masking), while the loops only pad, so the speedup is a lower bound.
+
+Usage::
+
+	python benchmarks/benchmark_get_batch.py [--size 20000] [--batch_size 512] [--repeat 20]
+'''
+import os
+import json
+import random
+import argparse
+import tempfile
+import timeit
+from contextlib import redirect_stdout
+from itertools import chain
+
+import numpy as np
+
+from cotk.dataloader import MSCOCO, OpenSubtitles, UbuntuCorpus, SST
+
+WORDS = ["w%d" % i for i in range(5000)]
+
+def random_sentence(rng, max_length):
+	return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, max_length)))
+
+def write_corpus(path, name, size, rng):
+	os.makedirs(path)
+	for key in ["train", "dev", "test"]:
+		with open(os.path.join(path, key + ".txt"), "w", encoding="utf-8") as f_file:
+			if name == "UbuntuCorpus":
+				for _ in range(size):
+					for _ in range(rng.randint(2, 10)):
+						f_file.write(random_sentence(rng, 40) + "\n")
+					f_file.write("\n")
+			else:
+				lines = size * 2 if name == "OpenSubtitles" else size
+				for _ in range(lines):
+					f_file.write(random_sentence(rng, 50) + "\n")
+		if name == "SST":
+			with open(os.path.join(path, key + "_labels.json"), "w", encoding="utf-8") as f_file:
+				json.dump([rng.randint(0, 4) for _ in range(size)], f_file)
+
+def pad_by_loop(sentences, indexes):
+	length = np.array(list(map(lambda i: len(sentences[i]), indexes)), dtype=int)
+	res = np.zeros((len(indexes), np.max(length)), dtype=int)
+	for i, j in enumerate(indexes):
+		res[i, :len(sentences[j])] = sentences[j]
+	return res, length
+
+def legacy_language_generation(data, indexes):
+	return pad_by_loop(data['sent'], indexes)
+
+def legacy_single_turn_dialog(data, indexes):
+	return pad_by_loop(data['post'], indexes), pad_by_loop(data['resp'], indexes)
+
+def legacy_sentence_classification(data, indexes):
+	res = pad_by_loop(data['sent'], indexes)
+	label = np.zeros(len(indexes), dtype=int)
+	for i, j in enumerate(indexes):
+		label[i] = data['label'][j]
+	return res, label
+
+def legacy_multi_turn_dialog(data, indexes):
+	sessions = data['session']
+	turn_length = np.array([len(sessions[i]) for i in indexes], dtype=int)
+	sent_length = np.array([np.array([len(sent) for sent in sessions[i]], dtype=int) \
+		for i in indexes])
+	res = np.zeros((len(indexes), np.max(turn_length), np.max(list(chain(*sent_length)))), dtype=int)
+	for i, index_i in enumerate(indexes):
+		for j, sent in enumerate(sessions[index_i]):
+			res[i, j, :len(sent)] = sent
+	return res, turn_length, sent_length
+
+DATALOADERS = [
+	("LanguageGeneration", "MSCOCO", MSCOCO, legacy_language_generation),
+	("SingleTurnDialog", "OpenSubtitles", OpenSubtitles, legacy_single_turn_dialog),
+	("MultiTurnDialog", "UbuntuCorpus", UbuntuCorpus, legacy_multi_turn_dialog),
+	("SentenceClassification", "SST", SST, legacy_sentence_classification),
+]
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+	parser.add_argument("--size", type=int, default=20000, help="number of samples in each set")
+	parser.add_argument("--batch_size", type=int, default=512)
+	parser.add_argument("--repeat", type=int, default=20, help="number of batches to time")
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	with tempfile.TemporaryDirectory() as tmpdir:
+		results = []
+		for base_name, name, cls, legacy in DATALOADERS:
+			path = os.path.join(tmpdir, name)
+			write_corpus(path, name, args.size, rng)
+			with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+				dl = cls(path, cache_dir=os.path.join(tmpdir, "cache"))
+			# the loops ran on the nested lists that dataloaders used to store
+			legacy_data = {field: (value.tolist() if hasattr(value, "tolist") else value) \
+				for field, value in dl.data["train"].items()}
+			batches = [rng.sample(range(dl.data_size["train"]), args.batch_size) \
+				for _ in range(args.repeat)]
+
+			loop_time = min(timeit.repeat(lambda: [legacy(legacy_data, b) for b in batches], \
+				number=1, repeat=3)) / args.repeat
+			engine_time = min(timeit.repeat(lambda: [dl.get_batch("train", b) for b in batches], \
+				number=1, repeat=3)) / args.repeat
+			results.append((base_name, loop_time, engine_time))
+
+	print("batch_size = %d" % args.batch_size)
+	print("%-24s %12s %12s %8s" % ("dataloader", "loop (ms)", "engine (ms)", "speedup"))
+	for base_name, loop_time, engine_time in results:
+		print("%-24s %12.2f %12.2f %7.1fx" % (base_name, loop_time * 1000, \
+			engine_time * 1000, loop_time / engine_time))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,76 @@
+'''
+A benchmark of :class:`cotk.dataloader.dataloader.DataloaderHash`, comparing the hashing of
+ragged arrays with the element-by-element hashing it replaced. Both produce the same digest.
+
+Usage::
+
+	python benchmarks/benchmark_hash.py [--size 20000] [--cpu_count 4]
+'''
+import os
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+from functools import partial
+from contextlib import redirect_stdout
+
+from cotk.dataloader.dataloader import DataloaderHash, DataField
+from cotk._utils.unordered_hash import UnorderedSha256
+
+from benchmark_get_batch import DATALOADERS, write_corpus
+
+def hash_by_loop(hash_obj, datasets, field_dict, id_to_word):
+	convert_ids_to_tokens = partial(hash_obj.convert_ids_to_tokens, id_to_word=id_to_word)
+	hash_all = hashlib.sha256()
+	for key in sorted(datasets.keys()):
+		fields = dict(field_dict[key])
+		ordered_hash_obj = hashlib.sha256()
+		for data_key in sorted(datasets[key].keys()):
+			field = DataField.get_field(fields[data_key])
+			unordered_hash_obj = UnorderedSha256()
+			for element in datasets[key][data_key]:
+				unordered_hash_obj.update_data(field.convert_element_to_bytes(element, convert_ids_to_tokens))
+			ordered_hash_obj.update(unordered_hash_obj.result.tobytes())
+		hash_all.update(ordered_hash_obj.digest())
+	return hash_all.hexdigest()
+
+def measure(func):
+	start = time.perf_counter()
+	res = func()
+	return time.perf_counter() - start, res
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+	parser.add_argument("--size", type=int, default=20000, help="number of samples in each set")
+	parser.add_argument("--cpu_count", type=int, default=4)
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	with tempfile.TemporaryDirectory() as tmpdir:
+		results = []
+		for base_name, name, cls, _ in DATALOADERS:
+			path = os.path.join(tmpdir, name)
+			write_corpus(path, name, args.size, rng)
+			with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+				dl = cls(path, cache_dir=os.path.join(tmpdir, "cache"))
+			field_dict = {key: [(data_key, "Session" if data_key == "session" else \
+				("Label" if data_key == "label" else "Sentence")) for data_key in dl.data[key]] \
+				for key in dl.key_name}
+			id_to_word = dl.all_vocab_list[len(dl.ext_vocab):dl.valid_vocab_len]
+			ignore_tokens = (dl.go_id, dl.eos_id, dl.pad_id)
+			hash_obj = DataloaderHash(ignore_tokens, dl.unk_id)
+			loop_time, expect = measure(lambda: hash_by_loop(hash_obj, dl.data, field_dict, id_to_word))
+			fast_time, res = measure(lambda: hash_obj.hash_datasets(dl.data, field_dict, id_to_word))
+			mp_time, mp_res = measure(lambda: DataloaderHash(ignore_tokens, dl.unk_id, args.cpu_count).hash_datasets( \
+				dl.data, field_dict, id_to_word))
+			assert res == expect == mp_res
+			results.append((base_name, loop_time, fast_time, mp_time))
+
+	print("size = %d, cpu_count = %d" % (args.size, args.cpu_count))
+	print("%-24s %12s %12s %12s" % ("hash (ms)", "loop", "ragged", "processes"))
+	for base_name, loop_time, fast_time, mp_time in results:
+		print("%-24s %12.1f %12.1f %12.1f" % (base_name, loop_time * 1000, fast_time * 1000, mp_time * 1000))
+
+if __name__ == "__main__":
+	main()
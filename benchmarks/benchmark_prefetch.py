@@ -0,0 +1,55 @@
+'''
+A benchmark of ``get_batches(..., prefetch=K)``, where a model step is simulated by ``time.sleep``.
+With prefetching, ``get_batch`` runs in a background thread during the model step,
+so an epoch takes about ``max(step, get_batch)`` per batch instead of ``step + get_batch``.
+
+Usage::
+
+	python benchmarks/benchmark_prefetch.py [--size 20000] [--batch_size 512] [--step_ms 5]
+'''
+import os
+import time
+import random
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+
+from benchmark_get_batch import DATALOADERS, write_corpus
+
+def run_epoch(dl, batch_size, step, prefetch):
+	start = time.perf_counter()
+	batch_num = 0
+	for _ in dl.get_batches("train", batch_size, shuffle=True, prefetch=prefetch):
+		time.sleep(step)
+		batch_num += 1
+	return (time.perf_counter() - start) / batch_num
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+	parser.add_argument("--size", type=int, default=20000, help="number of samples in each set")
+	parser.add_argument("--batch_size", type=int, default=512)
+	parser.add_argument("--step_ms", type=float, default=5, help="simulated time of a model step")
+	parser.add_argument("--prefetch", type=int, default=4)
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	step = args.step_ms / 1000
+	with tempfile.TemporaryDirectory() as tmpdir:
+		results = []
+		for base_name, name, cls, _ in DATALOADERS:
+			path = os.path.join(tmpdir, name)
+			write_corpus(path, name, args.size, rng)
+			with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+				dl = cls(path, cache_dir=os.path.join(tmpdir, "cache"))
+				serial = run_epoch(dl, args.batch_size, step, 0)
+				prefetched = run_epoch(dl, args.batch_size, step, args.prefetch)
+				data_only = run_epoch(dl, args.batch_size, 0, 0)
+			results.append((base_name, data_only, serial, prefetched))
+
+	print("batch_size = %d, step = %.1f ms, prefetch = %d" % (args.batch_size, args.step_ms, args.prefetch))
+	print("%-24s %14s %14s %14s" % ("ms per batch", "get_batch", "serial", "prefetch"))
+	for base_name, data_only, serial, prefetched in results:
+		print("%-24s %14.2f %14.2f %14.2f" % (base_name, data_only * 1000, serial * 1000, prefetched * 1000))
+
+if __name__ == "__main__":
+	main()
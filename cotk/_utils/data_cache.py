@@ -0,0 +1,133 @@
+'''
+A module for caching preprocessed data on disk.
+'''
+import os
+import pickle
+import hashlib
+import tempfile
+
+from .file_utils import _get_file_sha256
+
+# Increase it when the format of cached objects changes.
+CACHE_VERSION = 2
+
+def get_files_sha256(file_paths):
+	'''Get sha256 of the contents of several files.
+
+	Arguments:
+		file_paths (list): paths of files.
+
+	Returns:
+		(list): hex sha256 of each file.
+	'''
+	return [_get_file_sha256(file_path) for file_path in file_paths]
+
+def get_cache_key(*args):
+	r'''Get the key of a cached object. ``args`` must be consisted of objects with
+	deterministic ``repr``, such as str, int, None, and lists (tuples, dicts) of them.
+
+	Returns:
+		(str): hex sha256 of ``args``.
+	'''
+	return hashlib.sha256(repr((CACHE_VERSION, ) + args).encode()).hexdigest()
+
+def _get_cache_path(cache_dir, cache_key):
+	return os.path.join(cache_dir, cache_key + '.pkl')
+
+def load_cache(cache_dir, cache_key):
+	'''Load a cached object.
+
+	Arguments:
+		cache_dir (str): the directory of cache.
+		cache_key (str): key of the object, see :func:`get_cache_key`.
+
+	Returns:
+		The cached object, or ``None`` if it isn't cached or the cache is broken.
+	'''
+	cache_path = _get_cache_path(cache_dir, cache_key)
+	if not os.path.isfile(cache_path):
+		return None
+	try:
+		with open(cache_path, 'rb') as cache_file:
+			return pickle.load(cache_file)
+	except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+		# the cache is broken, or it refers to a class or module which has been renamed
+		return None
+
+def save_cache(cache_dir, cache_key, obj):
+	'''Save an object to cache. The file is written to a temporary path first and
+	then renamed, so a broken cache won't be left if the process is killed.
+
+	Arguments:
+		cache_dir (str): the directory of cache.
+		cache_key (str): key of the object, see :func:`get_cache_key`.
+		obj: a picklable object.
+	'''
+	os.makedirs(cache_dir, exist_ok=True)
+	with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as temp_file:
+		try:
+			pickle.dump(obj, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+		except BaseException:
+			temp_file.close()
+			os.remove(temp_file.name)
+			raise
+	os.replace(temp_file.name, _get_cache_path(cache_dir, cache_key))
+
+def save_cache_chunks(cache_dir, cache_key, chunks):
+	'''Save the elements of an iterable to cache while they are iterated, so they aren't kept
+	in memory at the same time. Like :func:`save_cache`, the cache is only saved if the
+	iteration is finished.
+
+	Arguments:
+		cache_dir (str): the directory of cache.
+		cache_key (str): key of the object, see :func:`get_cache_key`.
+		chunks (iterable): picklable objects.
+
+	Returns:
+		An iterator of the elements of ``chunks``.
+	'''
+	os.makedirs(cache_dir, exist_ok=True)
+	with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as temp_file:
+		try:
+			for chunk in chunks:
+				pickle.dump(chunk, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+				yield chunk
+		except BaseException:
+			# including ``GeneratorExit`` when the iteration is stopped
+			temp_file.close()
+			os.remove(temp_file.name)
+			raise
+	os.replace(temp_file.name, _get_cache_path(cache_dir, cache_key))
+
+def load_cache_chunks(cache_dir, cache_key):
+	'''Load the elements saved by :func:`save_cache_chunks`.
+
+	Arguments:
+		cache_dir (str): the directory of cache.
+		cache_key (str): key of the object, see :func:`get_cache_key`.
+
+	Returns:
+		(list): the saved elements, or ``None`` if they aren't cached or the cache is broken.
+	'''
+	cache_path = _get_cache_path(cache_dir, cache_key)
+	if not os.path.isfile(cache_path):
+		return None
+	chunks = []
+	try:
+		with open(cache_path, 'rb') as cache_file:
+			while cache_file.peek(1):
+				chunks.append(pickle.load(cache_file))
+	except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+		return None
+	return chunks
+
+def remove_cache(cache_dir, cache_key):
+	'''Remove a cached object if it exists.
+
+	Arguments:
+		cache_dir (str): the directory of cache.
+		cache_key (str): key of the object, see :func:`get_cache_key`.
+	'''
+	cache_path = _get_cache_path(cache_dir, cache_key)
+	if os.path.isfile(cache_path):
+		os.remove(cache_path)
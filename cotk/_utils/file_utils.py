@@ -6,14 +6,17 @@ Copyright by the AllenNLP authors.
 
 import os
 import json
-import tempfile
 import shutil
 import hashlib
 import logging
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 
 from tqdm import tqdm
 from checksumdir import dirhash
@@ -28,6 +31,17 @@ SH.setFormatter(FORMAT)
 LOGGER.addHandler(SH)
 CACHE_DIR = os.path.join(str(Path.home()), '.cotk_cache')
 CONFIG_DIR = os.path.join(os.path.dirname(__file__), '../resource_config')
+# Size of buffers for downloading, copying and hashing files.
+BUFFER_SIZE = 1 << 20
+# Number of connections downloading a file in parallel, if the server supports range requests.
+# It's overridden by the environment variable ``DOWNLOAD_CONNECTIONS``.
+DOWNLOAD_CONNECTIONS = 1
+# Times of retrying a broken connection when downloading a file.
+DOWNLOAD_RETRIES = 5
+# Timeouts (in seconds) of connecting to the server and waiting for data, after which the connection is retried.
+DOWNLOAD_TIMEOUT = (10, 60)
+# Interval (in seconds) of saving the state of a partial download.
+DOWNLOAD_STATE_INTERVAL = 5
 
 def _url_to_filename(url):
 	r'''Convert the url to sha256 as filename
@@ -50,24 +64,209 @@ def _get_config(res_name, config_dir=CONFIG_DIR):
 	return config
 
 
-def _http_get(url, temp_file):
-	'''Pull a file directly from http'''
-	req = requests.get(url, stream=True)
+def _http_get(url, temp_file, session=None):
+	'''Pull a file directly from http, and return sha256 of the content, which is
+	computed while writing, so the file needn't be read again.'''
+	req = (session or requests).get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+	req.raise_for_status()
 	content_length = req.headers.get('Content-Length')
 	total = int(content_length) if content_length is not None else None
 	progress = tqdm(unit="B", total=total)
-	for chunk in req.iter_content(chunk_size=65536):
+	hash_sha256 = hashlib.sha256()
+	for chunk in req.iter_content(chunk_size=BUFFER_SIZE):
 		if chunk:
 			progress.update(len(chunk))
+			hash_sha256.update(chunk)
 			temp_file.write(chunk)
 	progress.close()
+	return hash_sha256.hexdigest()
+
+
+def _probe_range(session, url):
+	'''Check whether the server supports range requests.
+
+	Returns:
+		(tuple): the size of the file and its validator (``ETag`` or ``Last-Modified``),
+		or ``(None, None)`` if range requests aren't supported.
+	'''
+	req = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=DOWNLOAD_TIMEOUT)
+	try:
+		if req.status_code == 416:
+			# e.g. the file is empty
+			return None, None
+		req.raise_for_status()
+		content_range = req.headers.get('Content-Range', '')
+		if req.status_code != 206 or not content_range.startswith('bytes 0-0/'):
+			return None, None
+		size = content_range.rsplit('/', 1)[1]
+		if not size.isdigit():
+			return None, None
+		return int(size), req.headers.get('ETag') or req.headers.get('Last-Modified')
+	finally:
+		req.close()
+
+
+class _RangeDownloader:
+	'''Download a file to ``part_path`` by range requests. The file is split into segments, which are
+	downloaded by different connections. The rest of each segment is recorded in ``part_path + '.json'``
+	every ``DOWNLOAD_STATE_INTERVAL`` seconds and when the download stops, so an interrupted download
+	continues from there, even after restarts. The data are flushed before they are recorded.'''
+	def __init__(self, session, url, part_path, state):
+		self.session = session
+		self.url = url
+		self.part_path = part_path
+		self.state_path = part_path + '.json'
+		self.state = state
+		self._lock = threading.Lock()
+		self._progress = None
+		self._saved_time = time.time()
+
+	@classmethod
+	def load(cls, session, url, part_path, size, validator, connections):
+		'''Continue the download recorded in the state file, or start a new one if there isn't one,
+		or the file on the server has changed.'''
+		state = None
+		try:
+			with open(part_path + '.json', 'r', encoding='utf-8') as state_file:
+				state = json.load(state_file)
+			if (state['url'], state['size'], state['validator']) != (url, size, validator) or \
+					os.path.getsize(part_path) != size:
+				state = None
+		except (OSError, ValueError, KeyError, TypeError):
+			state = None
+		if state is None:
+			seg_size = -(-size // max(connections, 1)) or 1
+			state = {'url': url, 'size': size, 'validator': validator, \
+				'segments': [[start, min(start + seg_size, size)] for start in range(0, size, seg_size)]}
+			with open(part_path, 'wb') as part_file:
+				part_file.truncate(size)
+		else:
+			LOGGER.info('resume downloading %s', url)
+		downloader = cls(session, url, part_path, state)
+		downloader._save_state()
+		return downloader
+
+	def _save_state(self):
+		self._saved_time = time.time()
+		temp_path = self.state_path + '.tmp'
+		with open(temp_path, 'w', encoding='utf-8') as state_file:
+			json.dump(self.state, state_file)
+		os.replace(temp_path, self.state_path)
+
+	def _fetch_once(self, index, hash_sha256):
+		start, end = self.state['segments'][index]
+		req = self.session.get(self.url, headers={'Range': 'bytes=%d-%d' % (start, end - 1)}, stream=True, \
+			timeout=DOWNLOAD_TIMEOUT)
+		try:
+			req.raise_for_status()
+			if req.status_code != 206:
+				raise IOError("the server of %s doesn't support range requests any more" % self.url)
+			with open(self.part_path, 'r+b') as part_file:
+				part_file.seek(start)
+				for chunk in req.iter_content(chunk_size=BUFFER_SIZE):
+					chunk = chunk[:end - start]
+					if not chunk:
+						continue
+					part_file.write(chunk)
+					part_file.flush()
+					if hash_sha256 is not None:
+						hash_sha256.update(chunk)
+					start += len(chunk)
+					with self._lock:
+						self.state['segments'][index][0] = start
+						self._progress.update(len(chunk))
+						if time.time() - self._saved_time >= DOWNLOAD_STATE_INTERVAL:
+							self._save_state()
+					if start >= end:
+						break
+		finally:
+			req.close()
+
+	def _fetch(self, index, hash_sha256=None):
+		# download the rest of a segment, and reconnect if the connection is broken
+		error = None
+		for retry in range(DOWNLOAD_RETRIES + 1):
+			start, end = self.state['segments'][index]
+			if start >= end:
+				return
+			if retry:
+				LOGGER.warning('connection broken (%s), retry downloading from byte %d', error, start)
+			try:
+				self._fetch_once(index, hash_sha256)
+				error = "incomplete read"
+			except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as err:
+				error = err
+		if self.state['segments'][index][0] < self.state['segments'][index][1]:
+			raise IOError("failed to download %s: %s" % (self.url, error))
+
+	def run(self, connections):
+		'''Download the rest of the file, and return sha256 of the content.'''
+		segments = self.state['segments']
+		rest = sum(end - start for start, end in segments)
+		self._progress = tqdm(unit="B", total=self.state['size'], initial=self.state['size'] - rest)
+		try:
+			if len(segments) == 1:
+				# the content is hashed while downloading, after the downloaded part is hashed
+				hash_sha256 = hashlib.sha256()
+				with open(self.part_path, 'rb') as part_file:
+					left = segments[0][0]
+					while left > 0:
+						chunk = part_file.read(min(BUFFER_SIZE, left))
+						hash_sha256.update(chunk)
+						left -= len(chunk)
+				self._fetch(0, hash_sha256)
+				return hash_sha256.hexdigest()
+			with ThreadPoolExecutor(max(connections, 1)) as executor:
+				for future in [executor.submit(self._fetch, i) for i in range(len(segments))]:
+					future.result()
+		finally:
+			self._progress.close()
+			with self._lock:
+				self._save_state()
+		return _get_file_sha256(self.part_path)
+
+
+def _download_to_cache(url, cache_path, connections=None):
+	'''Download a file to ``cache_path``, and return sha256 of the content. The file is written
+	to ``cache_path + '.part'`` first and then renamed, so a broken file won't be left at ``cache_path``
+	if the download fails.
+
+	If the server supports range requests, the download is resumed from the downloaded part after
+	failures or restarts, and the file is downloaded by ``connections`` connections in parallel.
+	Otherwise, the file is downloaded from the beginning by one connection.
+
+	Arguments:
+		connections (int): Number of connections. Default: If ``None``, the environment variable
+			``DOWNLOAD_CONNECTIONS`` will be used when it is set, or ``DOWNLOAD_CONNECTIONS`` otherwise.
+	'''
+	if connections is None:
+		connections = int(os.environ.get("DOWNLOAD_CONNECTIONS") or DOWNLOAD_CONNECTIONS)
+	part_path = cache_path + '.part'
+	with requests.Session() as session:
+		adapter = HTTPAdapter(pool_maxsize=max(connections, 1))
+		session.mount('http://', adapter)
+		session.mount('https://', adapter)
+		size, validator = _probe_range(session, url)
+		if size is None:
+			try:
+				with open(part_path, 'wb') as part_file:
+					content_hash = _http_get(url, part_file, session)
+			except BaseException:
+				os.remove(part_path)
+				raise
+		else:
+			content_hash = _RangeDownloader.load(session, url, part_path, size, validator, connections).run(connections)
+	os.replace(part_path, cache_path)
+	if os.path.exists(part_path + '.json'):
+		os.remove(part_path + '.json')
+	return content_hash
 
 
 def _get_file_sha256(file_path):
 	'''Get sha256 of given file'''
 	hash_sha256 = hashlib.sha256()
 	with open(file_path, "rb") as fin:
-		for chunk in iter(lambda: fin.read(4096), b""):
+		for chunk in iter(lambda: fin.read(BUFFER_SIZE), b""):
 			hash_sha256.update(chunk)
 	return hash_sha256.hexdigest()
 
@@ -135,15 +334,8 @@ def _get_resource(file_id, cache_dir=CACHE_DIR, config_dir=CONFIG_DIR):
 	meta_path = os.path.join(cache_dir, _url_to_filename(res_name) + '.json')
 
 	if not os.path.exists(meta_path):
-		with tempfile.NamedTemporaryFile()  as temp_file:
-			_http_get(url, temp_file)
-			temp_file.flush() # flush to avoid truncation
-			temp_file.seek(0) # shutil.copyfileobj() starts at the current position
-			with open(cache_path, 'wb') as cache_file:
-				shutil.copyfileobj(temp_file, cache_file)
-
 		# filename hash for search, content hash for validation
-		content_hash = _get_file_sha256(cache_path)
+		content_hash = _download_to_cache(url, cache_path)
 
 		cache_path = resource_processor.preprocess(cache_path)
 
@@ -185,21 +377,14 @@ def _download_data(url, cache_dir=CACHE_DIR):
 	meta_path = os.path.join(cache_dir, _url_to_filename(url) + '.json')
 
 	if not os.path.exists(meta_path):
-		with tempfile.NamedTemporaryFile() as temp_file:
-			_http_get(url, temp_file)
-			temp_file.flush() # flush to avoid truncation
-			temp_file.seek(0) # shutil.copyfileobj() starts at the current position
-
-			with open(cache_path, 'wb') as cache_file:
-				shutil.copyfileobj(temp_file, cache_file)
-			# filename hash for search, content hash for validation
-			content_hash = _get_file_sha256(cache_path)
+		# filename hash for search, content hash for validation
+		content_hash = _download_to_cache(url, cache_path)
 
-			cache_path = resource_processor.preprocess(cache_path)
+		cache_path = resource_processor.preprocess(cache_path)
 
-			meta = {'local_path': cache_path, 'hashtag': content_hash}
-			with open(meta_path, 'w', encoding='utf-8') as meta_file:
-				json.dump(meta, meta_file)
+		meta = {'local_path': cache_path, 'hashtag': content_hash}
+		with open(meta_path, 'w', encoding='utf-8') as meta_file:
+			json.dump(meta, meta_file)
 	else:
 		with open(meta_path, 'r', encoding='utf-8') as meta_file:
 			meta = json.load(meta_file)
@@ -254,8 +439,8 @@ def import_local_resources(file_id, local_path, cache_dir=CACHE_DIR, \
 	local_hashtag = _get_hashtag(local_path)
 	if local_hashtag == config['hashtag']:
 		cache_path = os.path.join(cache_dir, _url_to_filename(res_name))
-		with open(cache_path, 'wb') as cache_file:
-			shutil.copyfileobj(open(local_path, 'rb'), cache_file)
+		with open(local_path, 'rb') as local_file, open(cache_path, 'wb') as cache_file:
+			shutil.copyfileobj(local_file, cache_file, BUFFER_SIZE)
 
 		res_type = config.get('type', 'Default')
 		resource_processor = ResourceProcessor.load_class(res_type + 'ResourceProcessor') \
@@ -294,13 +479,7 @@ def load_file_from_url(url, force=False, cache_dir=CACHE_DIR):
 	if os.path.exists(cache_path):
 		return cache_path
 
-	with tempfile.NamedTemporaryFile() as temp_file:
-		_http_get(url, temp_file)
-		temp_file.flush() # flush to avoid truncation
-		temp_file.seek(0) # shutil.copyfileobj() starts at the current position
-
-		with open(cache_path, 'wb') as cache_file:
-			shutil.copyfileobj(temp_file, cache_file)
+	_download_to_cache(url, cache_path)
 
 	LOGGER.info('model cached at %s', cache_path)
 	return cache_path
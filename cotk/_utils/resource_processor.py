@@ -4,6 +4,8 @@ import os
 import zipfile
 import shutil
 import json
+import hashlib
+import uuid
 from itertools import chain
 from .metaclass import LoadClassInterface
 
@@ -54,7 +56,17 @@ class ZipResourceProcessor(ResourceProcessor):
 		return local_path
 
 class BaseResourceProcessor(ResourceProcessor):
-	"""Basic processor for MSCOCO, OpenSubtitles, Ubuntu..."""
+	"""Basic processor for MSCOCO, OpenSubtitles, Ubuntu...
+
+	Subclasses write the processed files by :meth:`_process`. They are written into a temporary directory,
+	which is renamed to ``processed`` with a marker recording the processor, its version and a hash of
+	the input files, so later calls of :meth:`postprocess` return the processed files without processing.
+	"""
+
+	# Version of the processed files, which should be increased when the output of :meth:`_process` changes.
+	_version = 1
+	_MARKER_NAME = '.complete.json'
+
 	def basepreprocess(self, local_path, name):
 		'''Preprocess after download and before save.
 		'''
@@ -64,10 +76,64 @@ class BaseResourceProcessor(ResourceProcessor):
 		unzip_file(local_path, dst_dir)
 		return os.path.join(dst_dir, name)
 
+	def _get_input_files(self, local_path): #pylint: disable=unused-argument
+		'''Names of the files in ``local_path`` read by :meth:`_process`.'''
+		return []
+
+	def _process(self, local_path, dst_dir):
+		'''Process the files in ``local_path``, and write the results into ``dst_dir``.'''
+		raise NotImplementedError
+
+	def _get_marker(self, local_path):
+		# The input files are identified by their sizes and modification times, so that they needn't be read.
+		hash_sha256 = hashlib.sha256()
+		for name in sorted(self._get_input_files(local_path)):
+			file_path = os.path.join(local_path, name)
+			if os.path.isfile(file_path):
+				stat = os.stat(file_path)
+				hash_sha256.update(('%s\0%d\0%d\0' % (name, stat.st_size, stat.st_mtime_ns)).encode('utf-8'))
+			else:
+				hash_sha256.update(('%s\0missing\0' % name).encode('utf-8'))
+		return {'processor': type(self).__name__, 'version': self._version, 'input_hash': hash_sha256.hexdigest()}
+
+	def _read_marker(self, dst_dir):
+		try:
+			with open(os.path.join(dst_dir, self._MARKER_NAME), 'r', encoding='utf-8') as marker_file:
+				return json.load(marker_file)
+		except (OSError, ValueError):
+			return None
+
 	def postprocess(self, local_path):
-		'''Postprocess before read.
+		'''Postprocess before read. It returns the ``processed`` directory in ``local_path``, and only processes
+		the files if they haven't been processed by the same version of the processor.
 		'''
-		return local_path
+		dst_dir = os.path.join(local_path, 'processed')
+		marker = self._get_marker(local_path)
+		if self._read_marker(dst_dir) == marker:
+			return dst_dir
+
+		temp_dir = '%s.%s.tmp' % (dst_dir, uuid.uuid4().hex)
+		stale_dir = '%s.%s.old' % (dst_dir, uuid.uuid4().hex)
+		os.makedirs(temp_dir)
+		try:
+			self._process(local_path, temp_dir)
+			with open(os.path.join(temp_dir, self._MARKER_NAME), 'w', encoding='utf-8') as marker_file:
+				json.dump(marker, marker_file)
+			# A non-empty directory can't be replaced by renaming, so the stale one is moved away first.
+			try:
+				os.rename(dst_dir, stale_dir)
+			except FileNotFoundError:
+				pass
+			try:
+				os.rename(temp_dir, dst_dir)
+			except OSError:
+				# another process has published the same files
+				if self._read_marker(dst_dir) != marker:
+					raise
+		finally:
+			shutil.rmtree(temp_dir, ignore_errors=True)
+			shutil.rmtree(stale_dir, ignore_errors=True)
+		return dst_dir
 
 #TODO: merge the following Processor because of duplicate codes
 class MSCOCOResourceProcessor(BaseResourceProcessor):
@@ -78,16 +144,15 @@ class MSCOCOResourceProcessor(BaseResourceProcessor):
 		'''
 		return self.basepreprocess(local_path, 'mscoco')
 
-	def postprocess(self, local_path):
-		local_path = super().postprocess(local_path)
-		new_local_path = os.path.join(local_path, 'processed')
-		os.makedirs(new_local_path, exist_ok=True)
+	def _get_input_files(self, local_path):
+		return ['mscoco_%s.txt' % key for key in ['train', 'dev', 'test']]
+
+	def _process(self, local_path, dst_dir):
 		for key in ['train', 'dev', 'test']:
 			local_file = os.path.join(local_path, 'mscoco_%s.txt' % key)
-			new_local_file = os.path.join(new_local_path, '%s.txt' % key)
+			new_local_file = os.path.join(dst_dir, '%s.txt' % key)
 			if os.path.isfile(local_file):
 				shutil.copy(local_file, new_local_file)
-		return new_local_path
 
 class OpenSubtitlesResourceProcessor(BaseResourceProcessor):
 	'''Processor for OpenSubtitles Dataset
@@ -97,10 +162,11 @@ class OpenSubtitlesResourceProcessor(BaseResourceProcessor):
 		'''
 		return self.basepreprocess(local_path, 'opensubtitles')
 
-	def postprocess(self, local_path):
-		local_path = super().postprocess(local_path)
-		new_local_path = os.path.join(local_path, 'processed')
-		os.makedirs(new_local_path, exist_ok=True)
+	def _get_input_files(self, local_path):
+		return ['opensub_pair_%s.%s' % (key, suffix) for key in ['train', 'test', 'dev'] \
+			for suffix in ['post', 'response']]
+
+	def _process(self, local_path, dst_dir):
 		for key in ['train', 'test', 'dev']:
 			post_path = os.path.join(local_path, 'opensub_pair_%s.post' % key)
 			response_path = os.path.join(local_path, 'opensub_pair_%s.response' % key)
@@ -108,11 +174,10 @@ class OpenSubtitlesResourceProcessor(BaseResourceProcessor):
 				continue
 			with open(post_path, 'r', encoding='utf-8') as posts:
 				with open(response_path, 'r', encoding='utf-8') as responses:
-					with open(os.path.join(new_local_path, '%s.txt' % key), 'w', encoding='utf-8') as out:
+					with open(os.path.join(dst_dir, '%s.txt' % key), 'w', encoding='utf-8') as out:
 						for post, resp in zip(posts, responses):
 							out.write(post if post[-1] == '\n' else (post + '\n'))
 							out.write(resp if resp[-1] == '\n' else (resp + '\n'))
-		return new_local_path
 
 class UbuntuResourceProcessor(BaseResourceProcessor):
 	'''Processor for UbuntuCorpus dataset
@@ -122,16 +187,16 @@ class UbuntuResourceProcessor(BaseResourceProcessor):
 		'''
 		return self.basepreprocess(local_path, 'ubuntu_dataset')
 
-	def postprocess(self, local_path):
+	def _get_input_files(self, local_path):
+		return ['ubuntu_corpus_%s.csv' % key for key in ['train', 'dev', 'test']]
+
+	def _process(self, local_path, dst_dir):
 		import csv
-		local_path = super().postprocess(local_path)
-		new_local_path = os.path.join(local_path, 'processed')
-		os.makedirs(new_local_path, exist_ok=True)
 		for key in ['train', 'dev', 'test']:
 			local_file = os.path.join(local_path, 'ubuntu_corpus_%s.csv' % key)
 			if not os.path.isfile(local_file):
 				continue
-			new_local_file = os.path.join(new_local_path, '%s.txt' % key)
+			new_local_file = os.path.join(dst_dir, '%s.txt' % key)
 			with open(local_file, 'r', encoding='utf-8') as f:
 				reader = csv.reader(f)
 				head = next(reader)
@@ -146,7 +211,6 @@ class UbuntuResourceProcessor(BaseResourceProcessor):
 						f.write(sent)
 						f.write('\n')
 					f.write('\n')
-		return new_local_path
 
 
 class SwitchboardCorpusResourceProcessor(BaseResourceProcessor):
@@ -157,14 +221,13 @@ class SwitchboardCorpusResourceProcessor(BaseResourceProcessor):
 		'''
 		return self.basepreprocess(local_path, 'switchboard_corpus')
 
-	def postprocess(self, local_path):
-		local_path = super().postprocess(local_path)
-		new_local_path = os.path.join(local_path, 'processed')
-		os.makedirs(new_local_path, exist_ok=True)
+	def _get_input_files(self, local_path):
+		return ['switchboard_corpus_%s.jsonl' % key for key in ['train', 'test', 'dev', 'multi_ref']]
 
+	def _process(self, local_path, dst_dir):
 		for key in ['train', 'test', 'dev', 'multi_ref']:
 			filepath = os.path.join(local_path, 'switchboard_corpus_%s.jsonl' % key)
-			new_filepath = os.path.join(new_local_path, '%s.txt' % key)
+			new_filepath = os.path.join(dst_dir, '%s.txt' % key)
 			res = self._read_file(filepath, key == 'multi_ref')
 
 			with open(new_filepath, 'w', encoding='utf-8') as fout:
@@ -181,7 +244,6 @@ class SwitchboardCorpusResourceProcessor(BaseResourceProcessor):
 							line += '\n'
 						fout.write(line)
 					fout.write('\n')
-		return new_local_path
 
 	def _read_file(self, filepath, read_multi_ref=False):
 		"""
@@ -239,17 +301,15 @@ class SSTResourceProcessor(BaseResourceProcessor):
 		with open(os.path.join(dest, key + '_labels.json'), 'w', encoding='utf-8') as fp:
 			json.dump(labels, fp, ensure_ascii=False)
 
-	def postprocess(self, local_path):
-		local_path = super().postprocess(local_path)
-		new_local_path = os.path.join(local_path, 'processed')
-		os.makedirs(new_local_path, exist_ok=True)
+	def _get_input_files(self, local_path):
+		return [key + '.txt' for key in ['train', 'test', 'dev']]
 
+	def _process(self, local_path, dst_dir):
 		for key in ['train', 'test', 'dev']:
 			if not os.path.isfile(os.path.join(local_path, key + '.txt')):
 				raise FileNotFoundError("there isn\'t %s in %s" % (key + '.txt', local_path))
 			else:
-				self._postprocess(local_path, new_local_path, key)
-		return new_local_path
+				self._postprocess(local_path, dst_dir, key)
 
 class GloveResourceProcessor(ResourceProcessor):
 	'''Base Class for all dimension version of glove wordvector.
@@ -3,6 +3,7 @@ A module for hash unordered elements
 '''
 
 import hashlib
+from itertools import islice
 
 import numpy as np
 
@@ -11,6 +12,9 @@ class UnorderedSha256:
 	'''
 		Using SHA256 on unordered elements
 	'''
+	# number of digests summed at a time by `update_many`, which bounds the memory
+	CHUNK_SIZE = 65536
+
 	def __init__(self):
 		self.result = np.array([0] * 32, dtype=np.uint8)
 
@@ -23,6 +27,31 @@ class UnorderedSha256:
 		'''update digest by hash. type(hashvalue)=bytes'''
 		self.result += np.array(list(hashvalue), dtype=np.uint8)
 
+	def update_many(self, iterable):
+		'''update digest by each data in iterable. type(data)=bytes.
+		The result is the same as calling `update_data` for each data.'''
+		iterator = iter(iterable)
+		while True:
+			digests = b"".join(hashlib.sha256(data).digest() for data in islice(iterator, self.CHUNK_SIZE))
+			if not digests:
+				break
+			self.update_digests(digests)
+
+	def update_digests(self, digests):
+		'''update digest by several hashes. digests is a uint8 ndarray with shape [N, 32],
+		or bytes concatenating N hashes. The result is the same as calling `update_hash` for each hash.'''
+		if not isinstance(digests, np.ndarray):
+			digests = np.frombuffer(digests, dtype=np.uint8)
+		digests = digests.reshape(-1, 32)
+		# summing in uint64 and reducing modulo 256 once equals to wrapping uint8 additions
+		self.result += (digests.sum(axis=0, dtype=np.uint64) % 256).astype(np.uint8)
+
+	def merge(self, other):
+		'''update digest by all data of another UnorderedSha256, e.g. a partial hash computed
+		by a worker process. Returns self.'''
+		self.result += other.result
+		return self
+
 	def digest(self):
 		'''return unordered hashvalue'''
 		return bytes(self.result.tolist()).hex()
@@ -11,8 +11,13 @@ from .single_turn_dialog import SingleTurnDialog, OpenSubtitles, BERTSingleTurnD
 from .multi_turn_dialog import MultiTurnDialog, UbuntuCorpus, SwitchboardCorpus
 from .language_generation import LanguageGeneration, MSCOCO
 from .sentence_classification import SentenceClassification, SST
+from .ragged_array import RaggedArray
+from .vocab import Vocab
+from .intern import SentenceInterner
+from .tokenizer import Tokenizer, RegexTokenizer, SpaceTokenizer, register_tokenizer, get_tokenizer
 
 __all__ = ['Dataloader', 'SingleTurnDialog', 'OpenSubtitles', 'MultiTurnDialog', 'UbuntuCorpus', \
 	   'SwitchboardCorpus', 'LanguageGeneration', 'MSCOCO', 'LanguageProcessingBase', \
 	   'SentenceClassification', 'SST', 'BERTOpenSubtitles', 'BERTLanguageProcessingBase', \
-		'BERTSingleTurnDialog']
+		'BERTSingleTurnDialog', 'RaggedArray', 'Vocab', 'SentenceInterner', 'Tokenizer', 'RegexTokenizer', 'SpaceTokenizer', 'register_tokenizer', \
+		'get_tokenizer']
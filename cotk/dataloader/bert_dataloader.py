@@ -1,6 +1,8 @@
 '''
 A module for BERT dataloader
 '''
+import numpy as np
+
 from .dataloader import LanguageProcessingBase
 from .._utils import trim_before_target
 from .._utils.imports import LazyObject
@@ -45,6 +47,7 @@ class BERTLanguageProcessingBase(LanguageProcessingBase):
 		self._build_bert_vocab()
 
 		super().__init__(self.ext_vocab, key_name)
+		self._build_bert_id_tables()
 
 	def _build_bert_vocab(self):
 		self.word2bert_id = dict(self.tokenizer.vocab)
@@ -57,6 +60,20 @@ class BERTLanguageProcessingBase(LanguageProcessingBase):
 		self.bert_go_id = self.word2bert_id["[CLS]"]
 		self.bert_eos_id = self.word2bert_id["[SEP]"]
 
+	def _build_bert_id_tables(self):
+		# Dense lookup tables between bert ids and ids, so that conversions are done by ``take``.
+		# They can only be built after the vocabulary of the dataset is loaded.
+		self._bert_id_to_id_table = np.array([self.word2id.get(word, self.unk_id) for word in self.bert_id2word], \
+			dtype=int)
+		self._bert_id_to_valid_id_table = self._bert_id_to_id_table.copy()
+		self._bert_id_to_valid_id_table[self._bert_id_to_valid_id_table >= self.valid_vocab_len] = self.unk_id
+		self._id_to_bert_id_table = np.array([self.word2bert_id.get(word, self.bert_unk_id) \
+			for word in self.all_vocab_list], dtype=int)
+
+	def _get_id_num(self):
+		# batches contain bert ids as well
+		return max(len(self.all_vocab_list), len(self.bert_id2word))
+
 	def _valid_bert_id_to_id(self, bert_id):
 		'''This function return the id for a valid bert id, otherwise return ``unk_id``.
 
@@ -123,8 +140,24 @@ class BERTLanguageProcessingBase(LanguageProcessingBase):
 		Returns:
 				(list): list of id(int)
 		'''
-		return self.convert_tokens_to_ids(\
-			self.convert_bert_ids_to_tokens(bert_ids, False), invalid_vocab)
+		return self.convert_bert_ids_to_ids_batch(np.array(bert_ids, dtype=int), invalid_vocab).tolist()
+
+	def convert_bert_ids_to_ids_batch(self, bert_ids, invalid_vocab=False):
+		'''Convert an array of bert ids (e.g. a padded 2-d array of a batch) to ids. The result is the same as
+		calling :meth:`convert_bert_ids_to_ids` for each sentence, but it's done by one lookup of a precomputed table.
+
+		Arguments:
+				bert_ids (:class:`numpy.ndarray`): an array of bert id(int) with any shape.
+				invalid_vocab (bool): whether to provide invalid vocabs.
+					If ``False``, invalid vocabs will be replaced by ``unk_id``.
+					If ``True``, invalid vocabs will using their own id.
+					Default: ``False``
+
+		Returns:
+				(:class:`numpy.ndarray`): an array of id(int) with the same shape as ``bert_ids``.
+		'''
+		table = self._bert_id_to_id_table if invalid_vocab else self._bert_id_to_valid_id_table
+		return table.take(bert_ids)
 
 	def convert_ids_to_bert_ids(self, ids):
 		'''Convert list of id(int) to list of bert id(int)
@@ -135,5 +168,17 @@ class BERTLanguageProcessingBase(LanguageProcessingBase):
 		Returns:
 				bert_ids (list): list of bert id(int)
 		'''
-		return self.convert_tokens_to_bert_ids(\
-			self.convert_ids_to_tokens(ids, False))
+		return self.convert_ids_to_bert_ids_batch(np.array(ids, dtype=int)).tolist()
+
+	def convert_ids_to_bert_ids_batch(self, ids):
+		'''Convert an array of ids (e.g. a padded 2-d array returned by :meth:`get_batch`) to bert ids.
+		The result is the same as calling :meth:`convert_ids_to_bert_ids` for each sentence,
+		but it's done by one lookup of a precomputed table.
+
+		Arguments:
+				ids (:class:`numpy.ndarray`): an array of id(int) with any shape.
+
+		Returns:
+				(:class:`numpy.ndarray`): an array of bert id(int) with the same shape as ``ids``.
+		'''
+		return self._id_to_bert_id_table.take(ids)
@@ -1,18 +1,115 @@
 '''
 A module for dataloader
 '''
+import os
 import random
 import hashlib
+import pickle
+import tempfile
 from functools import partial
-from collections import Counter
-from itertools import chain
+from collections import Counter, deque
+from collections.abc import MutableMapping
+from itertools import chain, islice, repeat
+import multiprocessing
+from multiprocessing import Pool
 
 import numpy as np
-from nltk.tokenize import WordPunctTokenizer
 
 from .._utils import trim_before_target
 from .._utils.metaclass import DocStringInheritor, LoadClassInterface
 from .._utils.unordered_hash import UnorderedSha256
+from .._utils.data_cache import get_cache_key, get_files_sha256, load_cache, save_cache, \
+	save_cache_chunks, load_cache_chunks, remove_cache
+from .tokenizer import get_tokenizer
+from .streaming import ShuffleBufferIndex, ShardIndex
+from .prefetch import PrefetchIterator
+from .ragged_array import RaggedArray, RaggedArrayWriter, get_id_dtype
+from .vocab import VocabBuilder, Vocab
+from .intern import SentenceInterner
+from .sampler import bucket_by_length, sort_by_length, batch_by_tokens, shuffle_batches, \
+	shard_index, shard_batches, restore_index, padding_ratio
+
+
+def _ragged_to_list(value):
+	# convert a value returned by ``_get_all_batch`` to the list returned by ``get_all_batch``
+	if isinstance(value, RaggedArray):
+		return value.split() if value.depth == 1 else value.pad_each()
+	return list(value)
+
+
+def _extend_records(origin_data, fields, records):
+	# append the elements of tokenized ``records`` to the lists of their fields in ``origin_data``
+	for record in records:
+		for (data_key, _), element in zip(fields, record):
+			origin_data[data_key].append(element)
+
+
+class _LazySplits(MutableMapping):
+	# A dict of splits of a dataset, where a split is loaded by ``load_split(key)`` when it's accessed
+	# for the first time. See ``lazy`` in :meth:`LanguageProcessingBase._general_load_data`.
+	def __init__(self, keys, load_split):
+		self._keys = list(keys)
+		self._splits = {}
+		self._load_split = load_split
+
+	def is_loaded(self, key):
+		return key in self._splits
+
+	def __getitem__(self, key):
+		if key not in self._splits:
+			if key not in self._keys:
+				raise KeyError(key)
+			self._splits[key] = self._load_split(key)
+		return self._splits[key]
+
+	def __setitem__(self, key, value):
+		if key not in self._keys:
+			self._keys.append(key)
+		self._splits[key] = value
+
+	def __delitem__(self, key):
+		self._keys.remove(key)
+		self._splits.pop(key, None)
+
+	def __iter__(self):
+		return iter(self._keys)
+
+	def __len__(self):
+		return len(self._keys)
+
+	def __repr__(self):
+		return "_LazySplits(%s, loaded=%s)" % (self._keys, list(self._splits))
+
+
+def _padded_array(ids, ndim):
+	# get ``ids`` as an ndarray of int with ``ndim`` dimensions, or None if ``ids`` is jagged
+	if not isinstance(ids, np.ndarray):
+		level = ids
+		try:
+			for depth in range(1, ndim):
+				if len(set(map(len, level))) > 1:
+					return None
+				if depth < ndim - 1:
+					level = list(chain.from_iterable(level))
+		except TypeError:
+			return None
+		ids = np.asarray(ids)
+	if ids.ndim != ndim or ids.dtype.kind not in "iu":
+		return None
+	return ids
+
+
+def _trim_lengths(ids, eos_id, pad_id):
+	# the length of each sentence (the last axis of ``ids``) after :meth:`LanguageProcessingBase.trim`
+	max_length = ids.shape[-1]
+	if max_length == 0:
+		return np.zeros(ids.shape[:-1], dtype=np.int64)
+	# cut at the first ``<eos>`` if exists
+	is_eos = ids == eos_id
+	lengths = np.where(is_eos.any(axis=-1), is_eos.argmax(axis=-1), max_length)
+	# then find the last id which is not ``<pad>`` before the cut by a reverse scan
+	kept = (ids != pad_id) & (np.arange(max_length) < lengths[..., None])
+	return np.where(kept.any(axis=-1), max_length - kept[..., ::-1].argmax(axis=-1), 0)
 
 
 class DataField(LoadClassInterface, metaclass=DocStringInheritor):
@@ -84,6 +181,21 @@ class DataField(LoadClassInterface, metaclass=DocStringInheritor):
 		"""
 		return element
 
+	CONVERT_TO_TOKENS_BATCH_ARG = """
+			elements(list): a list of elements of a raw dataset.
+			tokenize_batch(callable): a callable object, which converts a list of sentences to a list of lists of tokens."""
+
+	def convert_to_tokens_batch(self, elements, tokenize_batch):
+		"""Convert a list of elements to tokens. The result is the same as calling `convert_to_tokens` for each element.
+		By default, `convert_to_tokens` is called with a sentence tokenized by `tokenize_batch` each time. Subclasses
+		can override it, so that all the sentences are tokenized by `tokenize_batch` in one call.
+
+		Args:{CONVERT_TO_TOKENS_BATCH_ARG}
+		"""
+		def tokenize(sentence):
+			return tokenize_batch([sentence])[0]
+		return [self.convert_to_tokens(element, tokenize) for element in elements]
+
 	# pylint: disable=W0613
 	def iter_sentence(self, element):
 		"""Returns an generator of the sentences in the element.
@@ -118,6 +230,16 @@ class DataField(LoadClassInterface, metaclass=DocStringInheritor):
 	CUT_ARG = """
 			element: An element of the dataset. It is returned by the method `convert_to_ids`."""
 
+	def pack(self, elements, dtype):
+		"""Pack a list of elements into a compact storage, which is saved in `dataloader.data`. By default,
+		the list is returned without changes.
+
+		Args:
+			elements(list): A list of elements returned by the method `cut`.
+			dtype(numpy.dtype): dtype of ids.
+		"""
+		return elements
+
 	def cut(self, element, **kwargs):
 		"""Cut the element if necessary.
 
@@ -193,6 +315,13 @@ class Sentence(DataField):
 		"""
 		return tokenize(element)
 
+	def convert_to_tokens_batch(self, elements, tokenize_batch):
+		"""Convert a list of elements(sentences) to lists of tokens.
+
+		Args:{DataField.CONVERT_TO_TOKENS_BATCH_ARG}
+		"""
+		return tokenize_batch(elements)
+
 	def iter_sentence(self, element):
 		yield element
 
@@ -201,11 +330,18 @@ class Sentence(DataField):
 
 		Args:{DataField.CONVERT_TO_IDS_ARG}"""
 
-		return [dataloader.go_id] + \
-					list(map(lambda word: word2id[word] if word in word2id else dataloader.unk_id, element)) \
-					+ [dataloader.eos_id]
+		return [dataloader.go_id] + list(map(word2id.get, element, repeat(dataloader.unk_id))) + [dataloader.eos_id]
 
 	# pylint: disable=W0221
+	def pack(self, elements, dtype):
+		"""Pack a list of sentences into a :class:`.ragged_array.RaggedArray`.
+
+		Args:
+			elements(list): A list of sentences returned by the method `cut`.
+			dtype(numpy.dtype): dtype of ids.
+		"""
+		return RaggedArray.from_list(elements, 1, dtype)
+
 	def cut(self, element, max_sent_length=None, **_):
 		"""Cut the element(sentence) if it's too long.
 
@@ -253,10 +389,33 @@ class Session(DataField):
 		"""
 		return [tokenize(sentence) for sentence in element]
 
+	def convert_to_tokens_batch(self, elements, tokenize_batch):
+		"""Convert a list of elements(sessions) to lists of lists of tokens. Sentences in all the sessions are
+		tokenized together.
+
+		Args:{DataField.CONVERT_TO_TOKENS_BATCH_ARG}
+		"""
+		sentences = tokenize_batch(list(chain.from_iterable(elements)))
+		res = []
+		start = 0
+		for element in elements:
+			res.append(sentences[start:start + len(element)])
+			start += len(element)
+		return res
+
 	def iter_sentence(self, element):
 		yield from element
 
 	# pylint: disable=W0221
+	def pack(self, elements, dtype):
+		"""Pack a list of sessions into a :class:`.ragged_array.RaggedArray` with ``depth=2``.
+
+		Args:
+			elements(list): A list of sessions returned by the method `cut`.
+			dtype(numpy.dtype): dtype of ids.
+		"""
+		return RaggedArray.from_list(elements, 2, dtype)
+
 	def cut(self, element, max_sent_length=None, max_turn_length=None, **_):
 		"""Cut the element(element) if it's too long.
 
@@ -304,6 +463,130 @@ class Label(DataField):
 		return element
 
 
+
+def _read_records(f_file, fields):
+	"""Read a file and yields records. A record is a list of raw elements, one for each field. Only the last
+	record may be shorter than ``fields``, if the file ends in the middle of it."""
+	while True:
+		record = []
+		try:
+			for _, field in fields:
+				record.append(field.get_next(f_file))
+		except StopIteration:
+			if record:
+				yield record
+			break
+		yield record
+
+def _iter_chunks(iterable, chunk_size):
+	"""Split an iterable into lists with length ``chunk_size``, except the last one."""
+	iterator = iter(iterable)
+	while True:
+		chunk = list(islice(iterator, chunk_size))
+		if not chunk:
+			break
+		yield chunk
+
+def _convert_records_to_tokens(records, fields, tokenize_batch, special_tokens):
+	"""Tokenize raw records and count the tokens in them. Elements of the same field are tokenized
+	in one call of ``tokenize_batch``.
+
+	Returns:
+		(tuple): containing:
+
+		* **records** (list): tokenized records.
+		* **counter** (:class:`collections.Counter`): the number of occurrences of each token.
+	"""
+	counter = Counter()
+	res = [[] for _ in records]
+	for i, (_, field) in enumerate(fields):
+		# the last record may be incomplete
+		indexes = [j for j, record in enumerate(records) if len(record) > i]
+		elements = field.convert_to_tokens_batch([records[j][i] for j in indexes], tokenize_batch)
+		for j, element in zip(indexes, elements):
+			counter.update(field.iter_tokens(element))
+			res[j].append(element)
+	for token in special_tokens:
+		if token in counter:
+			raise RuntimeError('The dataset contains special token "%s". This is not allowed.' % token)
+	return res, counter
+
+_MP_CONVERT_ARGS = None
+
+def _mp_init_convert(fields, tokenize_batch, special_tokens):
+	"""Initializer of worker processes, see :func:`_mp_convert_records_to_tokens`."""
+	global _MP_CONVERT_ARGS #pylint: disable=global-statement
+	_MP_CONVERT_ARGS = (fields, tokenize_batch, special_tokens)
+
+def _mp_convert_records_to_tokens(records):
+	"""Run :func:`_convert_records_to_tokens` in a worker process. The statistics of deduplication
+	counted by the worker are returned as well if ``tokenize_batch`` is a :class:`.intern.SentenceInterner`."""
+	tokenize_batch = _MP_CONVERT_ARGS[1]
+	res, counter = _convert_records_to_tokens(records, *_MP_CONVERT_ARGS)
+	stats = tokenize_batch.pop_stats() if isinstance(tokenize_batch, SentenceInterner) else None
+	return res, counter, stats
+
+def _print_dedup_stats(interner):
+	stats = interner.get_stats()
+	print("dedup: %d sentences, %d tokenized, dedup ratio: %f, tokenize time: %.2fs, " \
+		  "saved time: %.2fs, saved memory of tokens: %.2fMB" % (stats['sentences'], stats['distinct'], \
+		  stats['dedup_ratio'], stats['tokenize_time'], stats['saved_time'], stats['saved_memory'] / 2 ** 20))
+
+def _can_send_to_workers(context, args):
+	"""Whether ``args`` can be passed to the worker processes created by ``context``. The arguments are
+	pickled unless processes are created by ``fork``, which fails on objects like local classes."""
+	if context.get_start_method() == "fork":
+		return True
+	try:
+		pickle.dumps(args)
+	except Exception: #pylint: disable=broad-except
+		return False
+	return True
+
+def _imap_bounded(pool, func, iterable, max_pending):
+	"""Like ``pool.imap``, but at most ``max_pending`` elements of ``iterable`` are read in advance,
+	so the memory doesn't grow with the length of ``iterable``."""
+	pending = deque()
+	for element in iterable:
+		pending.append(pool.apply_async(func, (element, )))
+		if len(pending) >= max_pending:
+			yield pending.popleft().get()
+	while pending:
+		yield pending.popleft().get()
+
+def _hash_ragged_elements(array, prefix, table, keep):
+	"""Get the :class:`UnorderedSha256` of sentences (``depth=1``) or sessions (``depth=2``) in ``array``.
+	Each element is hashed as ``repr((field.__class__, sentences))``, where ``prefix`` is
+	``"(" + repr(field.__class__) + ", "``, ``table[i]`` is the ``repr`` of id ``i``, and
+	ids ``i`` with ``keep[i] == False`` are skipped. See :meth:`DataloaderHash.convert_ids_to_tokens`."""
+	mask = keep[array.values]
+	offsets = np.concatenate(([0], np.cumsum(mask)))[array.offsets[-1]].tolist()
+	ids = array.values[mask].tolist()
+	sents = ["[" + ", ".join(map(table.__getitem__, ids[offsets[i]:offsets[i + 1]])) + "]" \
+		for i in range(len(offsets) - 1)]
+	if array.depth == 2:
+		session_offsets = array.offsets[0].tolist()
+		elements = (", ".join(sents[session_offsets[i]:session_offsets[i + 1]]) \
+			for i in range(len(session_offsets) - 1))
+	else:
+		elements = sents
+	res = UnorderedSha256()
+	res.update_many((prefix + "[" + element + "])").encode() for element in elements)
+	return res
+
+_MP_HASH_ARGS = None
+
+def _mp_init_hash(table, keep):
+	"""Initializer of worker processes, see :func:`_mp_hash_ragged_elements`."""
+	global _MP_HASH_ARGS #pylint: disable=global-statement
+	_MP_HASH_ARGS = (table, keep)
+
+def _mp_hash_ragged_elements(args):
+	"""Run :func:`_hash_ragged_elements` in a worker process."""
+	array, prefix = args
+	return _hash_ragged_elements(array, prefix, *_MP_HASH_ARGS)
+
+
 class Dataloader(LoadClassInterface, metaclass=DocStringInheritor):
 	'''Base class of Dataloader.
 	'''
@@ -316,7 +599,9 @@ class DataloaderHash(metaclass=DocStringInheritor):
 	"""
 	A class that can calculate hash value for a dataloader.
 	"""
-	def __init__(self, ignore_tokens, unk_id=None):
+	HASH_CHUNK_SIZE = 10000
+
+	def __init__(self, ignore_tokens, unk_id=None, cpu_count=1):
 		"""
 		Initialize.
 
@@ -324,9 +609,13 @@ class DataloaderHash(metaclass=DocStringInheritor):
 			ignore_tokens (Iterable): Iterable of integers. Each of them represent an id of a token.
 				All these tokens are ignored, when calculating hash value.
 			unk_id (int): Id of unknown token(`unk`). If it's None, we assume that there's no `unk` in dataset.
+			cpu_count (int): Number of processes hashing sentences and sessions. Elements are split into chunks
+				with ``HASH_CHUNK_SIZE`` elements, and the hash value doesn't depend on the number of processes.
+				Default: 1.
 		"""
 		self.ignore_tokens = set(ignore_tokens)
 		self.unk_id = unk_id
+		self.cpu_count = cpu_count
 		if unk_id is not None and not isinstance(unk_id, int):
 			raise TypeError('`unk_id` must be None, or an integer.')
 		for i in self.ignore_tokens:
@@ -393,11 +682,59 @@ class DataloaderHash(metaclass=DocStringInheritor):
 			field = fields[data_key]
 			field = DataField.get_field(field)
 			unordered_hash_obj = UnorderedSha256()
-			for element in dataset[data_key]:
-				unordered_hash_obj.update_data(field.convert_element_to_bytes(element, convert_ids_to_tokens))
+			array = self._get_ragged_array(dataset[data_key], field)
+			if array is not None:
+				unordered_hash_obj.merge(self._hash_ragged_array(array, field, id_to_word))
+			else:
+				unordered_hash_obj.update_many(field.convert_element_to_bytes(element, convert_ids_to_tokens) \
+					for element in dataset[data_key])
 			ordered_hash_obj.update(unordered_hash_obj.result.tobytes())
 		return ordered_hash_obj.digest()
 
+	@staticmethod
+	def _get_ragged_array(data, field):
+		"""Get the data of a :class:`Sentence` or :class:`Session` field as a :class:`.RaggedArray` of
+		non-negative ids, which can be hashed by :meth:`_hash_ragged_array`.
+		Returns ``None`` for other fields, which are hashed element by element."""
+		if type(field) not in (Sentence, Session): #pylint: disable=unidiomatic-typecheck
+			return None
+		depth = 1 if isinstance(field, Sentence) else 2
+		if not isinstance(data, RaggedArray):
+			try:
+				data = RaggedArray.from_list(data, depth, np.int64)
+			except (TypeError, ValueError):
+				return None
+		if data.depth != depth or (len(data.values) and np.min(data.values) < 0):
+			return None
+		return data
+
+	def _hash_ragged_array(self, array, field, id_to_word):
+		"""Get the :class:`UnorderedSha256` of all elements in a :class:`.RaggedArray`, which is the same as
+		:meth:`DataField.convert_element_to_bytes` with :meth:`convert_ids_to_tokens` for each element.
+		The representation of each id is computed once."""
+		vocab_size = int(np.max(array.values)) + 1 if len(array.values) else 0
+		table = [repr(token) for token in self.convert_ids_to_tokens(range(vocab_size), id_to_word)]
+		# ``convert_ids_to_tokens`` skips ignored tokens, so ``table`` is re-aligned to ids
+		keep = np.ones(vocab_size, dtype=bool)
+		for id_ in self.ignore_tokens:
+			if id_ != self.unk_id and 0 <= id_ < vocab_size:
+				keep[id_] = False
+		table_iter = iter(table)
+		table = [next(table_iter) if keep[id_] else None for id_ in range(vocab_size)]
+
+		prefix = "(" + repr(field.__class__) + ", "
+		chunks = ((array.take(np.arange(start, min(start + self.HASH_CHUNK_SIZE, len(array)))), prefix) \
+			for start in range(0, len(array), self.HASH_CHUNK_SIZE))
+		res = UnorderedSha256()
+		if self.cpu_count > 1 and len(array) > self.HASH_CHUNK_SIZE:
+			with Pool(self.cpu_count, initializer=_mp_init_hash, initargs=(table, keep)) as pool:
+				for partial_hash in pool.imap_unordered(_mp_hash_ragged_elements, chunks):
+					res.merge(partial_hash)
+		else:
+			for chunk, _ in chunks:
+				res.merge(_hash_ragged_elements(chunk, prefix, table, keep))
+		return res
+
 	_hash_dataset.__doc__ = __HASH_DATASET_DOC + \
 		"""
 		Returns (bytes):
@@ -454,7 +791,18 @@ class LanguageProcessingBase(Dataloader):
 			all_vocab_list (list): vocabulary list of the datasets,
 					including valid vocabs and invalid vocabs.
 			word2id (dict): a dict mapping tokens to its id. You don't need to use it 
-					at most times, see :meth:`convert_tokens_to_ids` instead."""
+					at most times, see :meth:`convert_tokens_to_ids` instead.
+			id_dtype (:class:`numpy.dtype`): dtype of ids in the arrays returned by :meth:`get_batch`.
+					Default: ``int``. See :meth:`set_batch_dtype`.
+			length_dtype (:class:`numpy.dtype`): dtype of lengths in the arrays returned by
+					:meth:`get_batch`. Default: ``int``. See :meth:`set_batch_dtype`."""
+
+	# If it's not ``None``, data are shuffled by a buffer of this size instead of shuffling
+	# all indexes in memory, see :meth:`restart`. It's set by subclasses supporting streaming mode.
+	_shuffle_buffer_size = None
+	# If it's not ``None``, splits of the dataset are converted to ids when they are accessed
+	# for the first time. It's set by :meth:`_general_load_data` in lazy mode.
+	_lazy_args = None
 
 	def __init__(self, \
 				 ext_vocab=None, \
@@ -472,22 +820,92 @@ class LanguageProcessingBase(Dataloader):
 
 		# initialize by subclass
 		self.all_vocab_list, self.valid_vocab_len, self.data, self.data_size = self._load_data()
-		self.word2id = {w: i for i, w in enumerate(self.all_vocab_list)}
+		self._vocab = Vocab(self.all_vocab_list, self.valid_vocab_len, \
+			self.pad_id, self.unk_id, self.go_id, self.eos_id)
+		self.word2id = self._vocab.word2id
+		self.id_dtype = np.dtype(int)
+		self.length_dtype = np.dtype(int)
 
 		# postprocess initialization
 		self.index = {}
 		self.batch_id = {}
 		self.batch_size = {}
+		self._batch_offsets = {}  # offsets of batches with different sizes, see `restart`
+		self._epoch = {}  # the number of epochs shuffled by ``seed``, see `restart`
+		self._sharded = {}  # whether ``self.index`` is a shard of the data, see `restart`
 		for key in self.key_name:
+			self._epoch[key] = 0
+			self._sharded[key] = False
 			self.batch_id[key] = 0
 			self.batch_size[key] = None
-			self.index[key] = list(range(self.data_size[key]))
+			self._batch_offsets[key] = None
+			if self._shuffle_buffer_size is None:
+				self.index[key] = list(range(self.data_size[key]))
+			else:
+				self.index[key] = range(self.data_size[key])
+		self._shuffle_rng = None  # it's created when needed, see `_get_shuffle_rng`
+		if self._shuffle_buffer_size is not None:
+			self._shuffle_rng = random.Random(random.getrandbits(64))
 
 	@property
 	def hash_value(self):
 		"""return hash value of dataset"""
+		if self.__hash_value is None and self._lazy_args is not None:
+			self.__hash_value = self._hash_lazy_data()
 		return self.__hash_value
 
+	@property
+	def vocab(self):
+		''':class:`.Vocab`: the vocabulary converting between tokens and ids.
+		'''
+		# ``all_vocab_list`` may be set (or replaced) without calling ``__init__``,
+		# so the vocabulary is rebuilt when it changes
+		vocab = self.__dict__.get('_vocab')
+		if vocab is None or vocab.all_vocab_list is not self.all_vocab_list or \
+				vocab.valid_vocab_len != self.valid_vocab_len:
+			self._vocab = Vocab(self.all_vocab_list, self.valid_vocab_len, \
+				self.pad_id, self.unk_id, self.go_id, self.eos_id)
+		return self._vocab
+
+	def _get_id_num(self):
+		# the number of ids which may appear in batches, see `set_batch_dtype`
+		return len(self.all_vocab_list)
+
+	def set_batch_dtype(self, id_dtype=None, length_dtype=None):
+		r'''Set dtypes of the arrays returned by :meth:`get_batch`. Compact dtypes like ``int32``
+		or ``uint16`` make batches 2 or 4 times smaller than the default ``int`` (``int64`` on most platforms).
+		Note that some frameworks (e.g. pytorch) can't index with ``uint16``, convert the arrays before that.
+
+		Arguments:
+			id_dtype (:class:`numpy.dtype`, str): dtype of ids. It must be an integer type which can store
+				all ids of the vocabulary. ``"auto"`` means the smallest such type, ``uint16`` or ``int32``.
+				If ``None``, ``id_dtype`` won't change. Default: ``None``.
+			length_dtype (:class:`numpy.dtype`, str): dtype of lengths (e.g. ``sent_length``). It must be
+				an integer type. ``"auto"`` means ``int32``. If ``None``, ``length_dtype`` won't change.
+				Default: ``None``.
+
+		Examples:
+			>>> dataloader.set_batch_dtype(id_dtype="auto", length_dtype="auto")
+			>>> dataloader.get_batch("train", [0, 1])["sent"].dtype
+			dtype('uint16')
+		'''
+		if id_dtype is not None:
+			if isinstance(id_dtype, str) and id_dtype == "auto":
+				id_dtype = get_id_dtype(self._get_id_num())
+			id_dtype = np.dtype(id_dtype)
+			if id_dtype.kind not in "iu":
+				raise TypeError("id_dtype must be an integer type, but got %s." % id_dtype)
+			if np.iinfo(id_dtype).max < self._get_id_num() - 1:
+				raise ValueError("id_dtype %s can't store %d ids." % (id_dtype, self._get_id_num()))
+			self.id_dtype = id_dtype
+		if length_dtype is not None:
+			if isinstance(length_dtype, str) and length_dtype == "auto":
+				length_dtype = np.int32
+			length_dtype = np.dtype(length_dtype)
+			if length_dtype.kind not in "iu":
+				raise TypeError("length_dtype must be an integer type, but got %s." % length_dtype)
+			self.length_dtype = length_dtype
+
 	def _valid_word2id(self, word):
 		'''This function return the id for a valid word, otherwise return ``unk_id``.
 
@@ -508,8 +926,9 @@ class LanguageProcessingBase(Dataloader):
 		Arguments:
 			sentence (str): a string to be tokenized
 			remains_capital(bool): Whether remaining capital letter in data or converting them to lower case.
-			tokenizer (str): How to tokenize sentence. ``nltk.tokenize.WordPunctTokenizer`` is used if ``nltk`` is specified,
-				python built-in ``str.split`` is used if ``space`` is specified.
+			tokenizer (str): The name of a registered tokenizer, see :func:`.tokenizer.get_tokenizer`.
+				The results are the same as ``nltk.tokenize.WordPunctTokenizer`` if ``nltk`` is specified,
+				and python built-in ``str.split`` if ``space`` is specified.
 
 		Returns:
 			list: a list of tokens(str)
@@ -518,15 +937,75 @@ class LanguageProcessingBase(Dataloader):
 			sentence = sentence.strip()
 		else:
 			sentence = sentence.lower().strip()
-		if tokenizer == 'nltk':
-			return WordPunctTokenizer().tokenize(sentence)
-		elif tokenizer == 'space':
-			return sentence.split()
+		return get_tokenizer(tokenizer).tokenize(sentence)
+
+	def tokenize_batch(self, sentences, remains_capital, tokenizer):
+		r'''Convert a list of sentences(str) to lists of tokens(str). It is faster than
+		calling :meth:`tokenize` for each sentence. Subclasses overriding :meth:`tokenize`
+		should override this method as well, because the dataset is tokenized by this method.
+
+		Arguments:
+			sentences (list): a list of strings to be tokenized
+			remains_capital(bool): Whether remaining capital letter in data or converting them to lower case.
+			tokenizer (str): The name of a registered tokenizer, see :meth:`tokenize`.
+
+		Returns:
+			list: a list of lists of tokens(str)
+		'''
+		if remains_capital:
+			sentences = [sentence.strip() for sentence in sentences]
 		else:
-			raise ValueError('tokenizer of dataloader should be either "nltk" or "space"')
+			sentences = [sentence.lower().strip() for sentence in sentences]
+		return get_tokenizer(tokenizer).tokenize_batch(sentences)
+
+	# The number of records processed by a worker process at a time. Multiprocessing won't be used
+	# if each split of the dataset is not longer than one chunk.
+	LOAD_CHUNK_SIZE = 1000
+	# The start method of worker processes for tokenizing, see :func:`multiprocessing.get_context`.
+	# If ``None``, the default start method of the platform is used.
+	LOAD_START_METHOD = None
+
+	def _iter_tokenized_chunks(self, file_path, key, fields, special_tokens, cpu_count, interner=None):
+		r'''Read the raw file of a dataset sequentially and yield tokenized chunks.
+		See :meth:`_general_load_data` for arguments.
+
+		Arguments:
+			interner (:class:`.intern.SentenceInterner`): If not ``None``, sentences are tokenized by it
+				instead of :meth:`tokenize_batch`. Each worker process has its own intern table,
+				and their statistics are added to ``interner``. Default: ``None``.
+
+		Returns:
+			An iterator. Each element is a tuple of a list of tokenized records and a counter of tokens.
+		'''
+		tokenize_batch = self.tokenize_batch if interner is None else interner
+		with open("%s/%s.txt" % (file_path, key), encoding='utf-8') as f_file:
+			chunks = _iter_chunks(_read_records(f_file, fields), self.LOAD_CHUNK_SIZE)
+			head = list(islice(chunks, 2))
+			chunks = chain(head, chunks)
+			context = multiprocessing.get_context(self.LOAD_START_METHOD)
+			if len(head) > 1 and cpu_count > 1 and \
+					_can_send_to_workers(context, (fields, tokenize_batch, special_tokens)):
+				with context.Pool(cpu_count, initializer=_mp_init_convert, \
+						initargs=(fields, tokenize_batch, special_tokens)) as pool:
+					# the order of chunks is kept, so that the result is the same as a single process.
+					for records, counter, stats in \
+							_imap_bounded(pool, _mp_convert_records_to_tokens, chunks, 2 * cpu_count):
+						if interner is not None:
+							interner.add_stats(stats)
+						yield records, counter
+			else:
+				for chunk in chunks:
+					yield _convert_records_to_tokens(chunk, fields, tokenize_batch, special_tokens)
+
+	def _get_interner(self, dedup):
+		# create the intern table used for tokenizing, see ``dedup`` in :meth:`_general_load_data`
+		if dedup is False or dedup is None:
+			return None
+		return SentenceInterner(self.tokenize_batch, None if dedup is True else dedup)
 
 	def _general_load_data(self, file_path, data_fields, min_vocab_times, max_sent_length, max_turn_length,
-						   invalid_vocab_times):
+						   invalid_vocab_times, cache_dir=None, tokenize_args=None, cpu_count=None, \
+						   streaming=False, lazy=False, dedup=False):
 		r'''This function implements a general loading process.
 
 		Arguments:
@@ -559,6 +1038,40 @@ class LanguageProcessingBase(Dataloader):
 				not less than ``invalid_vocab_times`` in the **whole dataset** (except valid words) will be
 				marked as invalid words. Otherwise, they are unknown words, which are ignored both for
 				model or metrics.
+			cache_dir (str): A directory for caching the preprocessed data. If the dataset has been processed
+				with the same arguments before, the cached result is loaded instead of reading the raw files.
+				The cache is invalidated when the content of the raw files changes. If ``None``, cache is disabled.
+				Default: ``None``.
+			tokenize_args (tuple): Arguments deciding the behaviour of :meth:`tokenize`, which are used as a part
+				of the key of cache (e.g. ``(tokenizer, remains_capital)``). Default: ``None``.
+			cpu_count (int): Number of used cpu for tokenizing. Records are split into chunks with
+				``LOAD_CHUNK_SIZE`` records, which are tokenized by different processes. The result is the
+				same as the one produced by a single process. Multiprocessing will **NOT** be used when
+				``cpu_count`` is set to ``1`` or the dataset is small. If processes are not created by ``fork``
+				(see ``LOAD_START_METHOD``), the fields and the tokenizer are pickled, and the data is loaded
+				by a single process when they can't be pickled. Default: if ``None``, the environment variable ``CPU_COUNT``
+				will be used when it is set, or all available cpu will be used otherwise.
+			streaming (bool): If ``True``, the raw files are read twice: the first pass only counts tokens
+				for building the vocabulary, and the second pass writes ids to disk, which are memory-mapped
+				by :class:`.ragged_array.RaggedArray`. Therefore, the memory doesn't grow with the size of
+				dataset. Ids are written to ``cache_dir`` if it's specified, or to a temporary directory
+				otherwise. Only :class:`Sentence` fields are supported. Default: ``False``.
+			lazy (bool): If ``True``, the raw files are only read for counting tokens and records,
+				and each split is converted to ids when it's accessed for the first time (e.g. by
+				:meth:`restart`, :meth:`get_batch` or :meth:`get_all_batch`), so the splits which are never
+				used cost neither time nor memory. The vocabulary is the same as the one in eager mode.
+				:attr:`hash_value` needs all the splits, so it converts them when it's accessed.
+				If ``cache_dir`` is specified, the vocabulary and the token counts are cached, the tokenized
+				splits are cached by the first pass and reused when they are converted, and each split is
+				cached separately after it's converted. Otherwise, a split is tokenized again when it's converted,
+				which is also the case in streaming mode. Default: ``False``.
+			dedup (bool, int): If ``True``, each distinct sentence is tokenized only once by a
+				:class:`.intern.SentenceInterner`, and identical sentences share one list of tokens while loading
+				(but not the converted ids).
+				If it's an integer, at most ``dedup`` distinct sentences are kept in the intern table of each
+				process, and the least recently used ones are evicted. The ratio of deduplicated sentences,
+				the tokenization time and the memory saved are printed. The result is the same as the one
+				without deduplication, so it isn't a part of the key of cache. Default: ``False``.
 
 		Returns:
 			(tuple): containing:
@@ -568,7 +1081,8 @@ class LanguageProcessingBase(Dataloader):
 			* **valid_vocab_len** (int): the number of valid vocab.
 			  ``vocab_list[:valid_vocab_len]`` will be regarded as valid vocabs,
 			  while ``vocab_list[valid_vocab_len:]`` regarded as invalid vocabs.
-			* **data** (dict): a dict contains data.
+			* **data** (dict): a dict contains data. In lazy mode, it's a mapping loading each split
+			  when it's accessed.
 			* **data_size** (dict): a dict contains size of each item in data.
 		'''
 		def get_fields(fields):
@@ -596,102 +1110,296 @@ class LanguageProcessingBase(Dataloader):
 		# 'test': [['sent', Sentence()], ['label', Label()]]}.
 		# Note, different dataset may have different fields.
 
+		if cpu_count is None:
+			if "CPU_COUNT" in os.environ and os.environ["CPU_COUNT"] is not None:
+				cpu_count = int(os.environ["CPU_COUNT"])
+			else:
+				cpu_count = multiprocessing.cpu_count()
+
 		special_tokens = set(self.ext_vocab)
+		cache_key = None
+		if cache_dir is not None:
+			cache_key = get_cache_key(self.__class__.__name__, getattr(self, '_version', None), \
+				self.ext_vocab, self.key_name, \
+				{key: [(data_key, field.__class__.__name__) for data_key, field in data_fields[key]] \
+					for key in self.key_name}, \
+				min_vocab_times, max_sent_length, max_turn_length, invalid_vocab_times, tokenize_args, streaming, \
+				lazy, get_files_sha256(["%s/%s.txt" % (file_path, key) for key in self.key_name]))
+			cache = load_cache(cache_dir, cache_key)
+			if cache is not None:
+				print("load preprocessed data from cache %s" % cache_key)
+				self.__hash_value = cache['hash_value']
+				if lazy:
+					self._lazy_args = dict(file_path=file_path, data_fields=data_fields, \
+						max_sent_length=max_sent_length, max_turn_length=max_turn_length, \
+						special_tokens=special_tokens, cpu_count=cpu_count, streaming=streaming, dedup=dedup, \
+						cache_dir=cache_dir, cache_key=cache_key, vocab_builder=cache['vocab_builder'])
+					return cache['all_vocab_list'], cache['valid_vocab_len'], \
+						_LazySplits(self.key_name, self._load_lazy_split), cache['data_size']
+				return cache['all_vocab_list'], cache['valid_vocab_len'], cache['data'], cache['data_size']
+
+		if streaming:
+			for key in self.key_name:
+				for data_key, field in data_fields[key]:
+					if not isinstance(field, Sentence):
+						raise ValueError("Streaming mode only supports Sentence fields, but %s is %s." % \
+							(data_key, field.__class__.__name__))
+
+		# in streaming or lazy mode, the raw files are read again when converting records to ids
+		keep_records = not (streaming or lazy)
 		origin_data = {}
+		data_size = {}
+		vocab_builder = VocabBuilder()
+		# each pass over the raw files uses a new intern table, which is dropped after the pass
+		interner = self._get_interner(dedup)
 		for key in self.key_name:
 			origin_data[key] = {data_key: [] for data_key, _ in data_fields[key]}
-			with open("%s/%s.txt" % (file_path, key), encoding='utf-8') as f_file:
-				while True:
-					try:
-						for data_key, field in data_fields[key]:
-							element = field.convert_to_tokens(field.get_next(f_file), self.tokenize)
-							for token in field.iter_tokens(element):
-								if token in special_tokens:
-									raise RuntimeError('The dataset contains special token "%s". This is not allowed.' % token)
-							origin_data[key][data_key].append(element)
-					except StopIteration:
-						break
-
-		def chain_allvocab(dic, fields):
-			vocabs = []
-			for data_key, field in fields:
-				for element in dic[data_key]:
-					vocabs.extend(field.iter_tokens(element))
-			return vocabs
-
-		raw_vocab_list = chain_allvocab(origin_data['train'], data_fields['train'])
+			data_size[key] = 0
+			# tokens are counted by the processes tokenizing chunks, and the counters are merged here
+			chunks = self._iter_tokenized_chunks(file_path, key, data_fields[key], special_tokens, cpu_count, interner)
+			if lazy and not streaming and cache_dir is not None:
+				# the tokenized split is reused when it's converted, see :meth:`_load_lazy_split`
+				chunks = save_cache_chunks(cache_dir, get_cache_key(cache_key, key, 'tokens'), chunks)
+			for records, counter in chunks:
+				if keep_records:
+					_extend_records(origin_data[key], data_fields[key], records)
+				data_size[key] += len(records)
+				vocab_builder.update(key, counter)
+
+		if interner is not None:
+			_print_dedup_stats(interner)
+
 		# Important: Sort the words preventing the index changes between
 		# different runs
-		vocab = sorted(Counter(raw_vocab_list).most_common(), \
-					   key=lambda pair: (-pair[1], pair[0]))
-		left_vocab = [x[0] for x in vocab if x[1] >= min_vocab_times]
-		vocab_list = self.ext_vocab + list(left_vocab)
+		vocab_list = self.ext_vocab + vocab_builder.get_vocab(min_vocab_times, ['train'])
 		valid_vocab_len = len(vocab_list)
-		valid_vocab_set = set(vocab_list)
-
-		for key in self.key_name:
-			if key == 'train':
-				continue
-			raw_vocab_list.extend(chain_allvocab(origin_data[key], data_fields[key]))
-
-		vocab = sorted(Counter(raw_vocab_list).most_common(), \
-					   key=lambda pair: (-pair[1], pair[0]))
-		left_vocab = [x[0] for x in vocab if x[1] >= invalid_vocab_times and x[0] not in valid_vocab_set]
-		vocab_list.extend(left_vocab)
+		vocab_list.extend(vocab_builder.get_vocab(invalid_vocab_times, self.key_name, exclude=set(vocab_list)))
 
 		print("valid vocab list length = %d" % valid_vocab_len)
 		print("vocab list length = %d" % len(vocab_list))
 
+		if lazy:
+			# the counters are kept for printing the statistics of each split when it's converted
+			self._lazy_args = dict(file_path=file_path, data_fields=data_fields, \
+				max_sent_length=max_sent_length, max_turn_length=max_turn_length, \
+				special_tokens=special_tokens, cpu_count=cpu_count, streaming=streaming, dedup=dedup, \
+				cache_dir=cache_dir, cache_key=cache_key, vocab_builder=vocab_builder)
+			if cache_dir is not None:
+				save_cache(cache_dir, cache_key, {
+					'all_vocab_list': vocab_list,
+					'valid_vocab_len': valid_vocab_len,
+					'data_size': data_size,
+					'vocab_builder': vocab_builder,
+					'hash_value': None
+				})
+			return vocab_list, valid_vocab_len, _LazySplits(self.key_name, self._load_lazy_split), data_size
+
 		word2id = {w: i for i, w in enumerate(vocab_list)}
 
-		data = {}
-		data_size = {}
-		for key in self.key_name:
-			data[key] = {}
-			for data_key, field in data_fields[key]:
-				origin_data[key][data_key] = [field.convert_to_ids(element, word2id, self) for element in origin_data[key][data_key]]
-				data[key][data_key] = [
-					field.cut(element, max_sent_length=max_sent_length, max_turn_length=max_turn_length) for element in
-					origin_data[key][data_key]]
-				if key not in data_size:
-					data_size[key] = len(data[key][data_key])
-				elif data_size[key] != len(data[key][data_key]):
-					raise RuntimeError(
-						"The data of input %s.txt contains different numbers of fields" % key)
-
-			vocab = chain_allvocab(origin_data[key], data_fields[key])
-			vocab_num = len(vocab)
-			oov_num = sum([word not in word2id for word in vocab])
-			invalid_num = sum([word not in valid_vocab_set for word in vocab]) - oov_num
-
-			sent_length = []
-			for data_key, field in data_fields[key]:
-				sent_length.extend([len(sent) for element in origin_data[key][data_key] for sent in field.iter_sentence(element)])
-
-			cut_word_num = np.sum(np.maximum(np.array(sent_length) - max_sent_length, 0))
-
-			session_keys = [data_key for data_key, field in data_fields[key] if field.__class__ == Session]
-			if session_keys:
-				turn_length = list(map(len, chain.from_iterable((origin_data[key][sess_key] for sess_key in session_keys))))
-				max_turn_length_before_cut = max(turn_length)
-				sent_num = sum(turn_length)
-				cut_sentence_rate = np.sum(np.maximum(np.array(turn_length) - max_turn_length, 0)) / sent_num
-			else:
-				max_turn_length_before_cut = 1
-				cut_sentence_rate = 0
-			print(("%s set. invalid rate: %f, unknown rate: %f, max sentence length before cut: %d, " + \
-				   "cut word rate: %f\n\tmax turn length before cut: %d, cut sentence rate: %f") % \
-				  (key, invalid_num / vocab_num, oov_num / vocab_num, max(sent_length), \
-				   cut_word_num / vocab_num, max_turn_length_before_cut, cut_sentence_rate))
+		if streaming:
+			data, data_size = self._write_streaming_data(file_path, data_fields, \
+				self._get_streaming_dir(cache_dir, cache_key), word2id, valid_vocab_len, max_sent_length, \
+				special_tokens, cpu_count, self._get_interner(dedup))
+		else:
+			data, data_size = self._convert_origin_data(origin_data, data_fields, word2id, vocab_list, \
+				valid_vocab_len, max_sent_length, max_turn_length, vocab_builder)
 
 		# calculate hash value
 		hash_value = DataloaderHash(ignore_tokens=(self.go_id, self.eos_id, self.pad_id),
-									unk_id=self.unk_id).hash_datasets(data, data_fields, vocab_list[len(
+									unk_id=self.unk_id, cpu_count=cpu_count).hash_datasets(data, data_fields, vocab_list[len(
 			self.ext_vocab):valid_vocab_len])
 		self.__hash_value = hash_value
 
+		if cache_dir is not None:
+			save_cache(cache_dir, cache_key, {
+				'all_vocab_list': vocab_list,
+				'valid_vocab_len': valid_vocab_len,
+				'data': data,
+				'data_size': data_size,
+				'hash_value': hash_value
+			})
+
 		return vocab_list, valid_vocab_len, data, data_size
 
+	def _get_streaming_dir(self, cache_dir, cache_key):
+		# Ids are written to ``cache_dir`` if it's specified, or to a temporary directory otherwise.
+		if cache_dir is not None:
+			data_dir = os.path.join(cache_dir, cache_key)
+			os.makedirs(data_dir, exist_ok=True)
+			return data_dir
+		if getattr(self, '_streaming_tempdir', None) is None:
+			self._streaming_tempdir = tempfile.TemporaryDirectory()
+		return self._streaming_tempdir.name
+
+	def _load_lazy_split(self, key):
+		r'''Convert a split of the dataset to ids in lazy mode. It's called when the split is accessed for
+		the first time. The tokenized split cached by the first pass is used if ``cache_dir`` is specified,
+		or the raw file of the split is read and tokenized again otherwise. See :meth:`_general_load_data`.
+
+		Returns:
+			(dict): the data of the split.
+		'''
+		args = self._lazy_args
+		cache_dir, cache_key = args['cache_dir'], args['cache_key']
+		if cache_dir is not None:
+			split_cache_key = get_cache_key(cache_key, key)
+			split = load_cache(cache_dir, split_cache_key)
+			if split is not None:
+				return split
+
+		fields = args['data_fields'][key]
+		if args['streaming']:
+			split, _ = self._write_streaming_split(key, args['file_path'], fields, \
+				self._get_streaming_dir(cache_dir, cache_key), self.word2id, self.valid_vocab_len, \
+				args['max_sent_length'], args['special_tokens'], args['cpu_count'], self._get_interner(args['dedup']))
+		else:
+			origin_split = {data_key: [] for data_key, _ in fields}
+			interner = None
+			chunks = None if cache_dir is None else \
+				load_cache_chunks(cache_dir, get_cache_key(cache_key, key, 'tokens'))
+			if chunks is None:
+				interner = self._get_interner(args['dedup'])
+				chunks = self._iter_tokenized_chunks(args['file_path'], key, fields, \
+					args['special_tokens'], args['cpu_count'], interner)
+			for records, _ in chunks:
+				_extend_records(origin_split, fields, records)
+			if interner is not None:
+				_print_dedup_stats(interner)
+			split, _ = self._convert_origin_split(key, origin_split, fields, self.word2id, self.all_vocab_list, \
+				self.valid_vocab_len, args['max_sent_length'], args['max_turn_length'], args['vocab_builder'])
+
+		if cache_dir is not None:
+			save_cache(cache_dir, split_cache_key, split)
+			remove_cache(cache_dir, get_cache_key(cache_key, key, 'tokens'))
+		return split
+
+	def _hash_lazy_data(self):
+		# compute the hash value in lazy mode, which converts all the splits
+		args = self._lazy_args
+		hash_value = DataloaderHash(ignore_tokens=(self.go_id, self.eos_id, self.pad_id),
+									unk_id=self.unk_id, cpu_count=args['cpu_count']).hash_datasets( \
+			self.data, args['data_fields'], self.all_vocab_list[len(self.ext_vocab):self.valid_vocab_len])
+		if args['cache_dir'] is not None:
+			save_cache(args['cache_dir'], args['cache_key'], {
+				'all_vocab_list': self.all_vocab_list,
+				'valid_vocab_len': self.valid_vocab_len,
+				'data_size': self.data_size,
+				'vocab_builder': args['vocab_builder'],
+				'hash_value': hash_value
+			})
+		return hash_value
+
+	def _convert_origin_data(self, origin_data, data_fields, word2id, vocab_list, valid_vocab_len, \
+			max_sent_length, max_turn_length, vocab_builder):
+		r'''Convert tokenized data to ids and cut them. It's a part of :meth:`_general_load_data`.
+		The statistics of tokens are computed from the counters in ``vocab_builder``.
+
+		Returns:
+			(tuple): containing ``data`` and ``data_size``.
+		'''
+		data = {}
+		data_size = {}
+		for key in self.key_name:
+			data[key], data_size[key] = self._convert_origin_split(key, origin_data[key], data_fields[key], \
+				word2id, vocab_list, valid_vocab_len, max_sent_length, max_turn_length, vocab_builder)
+		return data, data_size
+
+	def _convert_origin_split(self, key, origin_split, fields, word2id, vocab_list, valid_vocab_len, \
+			max_sent_length, max_turn_length, vocab_builder):
+		r'''Convert a tokenized split of the dataset to ids and cut them. See :meth:`_convert_origin_data`.
+
+		Returns:
+			(tuple): containing the data of the split and its size.
+		'''
+		valid_vocab_set = set(vocab_list[:valid_vocab_len])
+		split = {}
+		split_size = None
+		for data_key, field in fields:
+			origin_split[data_key] = [field.convert_to_ids(element, word2id, self) for element in origin_split[data_key]]
+			split[data_key] = field.pack([
+				field.cut(element, max_sent_length=max_sent_length, max_turn_length=max_turn_length) for element in
+				origin_split[data_key]], get_id_dtype(len(vocab_list)))
+			if split_size is None:
+				split_size = len(split[data_key])
+			elif split_size != len(split[data_key]):
+				raise RuntimeError(
+					"The data of input %s.txt contains different numbers of fields" % key)
+
+		counter = vocab_builder.get_counter([key])
+		vocab_num = sum(counter.values())
+		oov_num = sum(times for word, times in counter.items() if word not in word2id)
+		invalid_num = sum(times for word, times in counter.items() if word not in valid_vocab_set) - oov_num
+
+		sent_length = []
+		for data_key, field in fields:
+			sent_length.extend([len(sent) for element in origin_split[data_key] for sent in field.iter_sentence(element)])
+
+		cut_word_num = np.sum(np.maximum(np.array(sent_length) - max_sent_length, 0))
+
+		session_keys = [data_key for data_key, field in fields if field.__class__ == Session]
+		if session_keys:
+			turn_length = list(map(len, chain.from_iterable((origin_split[sess_key] for sess_key in session_keys))))
+			max_turn_length_before_cut = max(turn_length)
+			sent_num = sum(turn_length)
+			cut_sentence_rate = np.sum(np.maximum(np.array(turn_length) - max_turn_length, 0)) / sent_num
+		else:
+			max_turn_length_before_cut = 1
+			cut_sentence_rate = 0
+		print(("%s set. invalid rate: %f, unknown rate: %f, max sentence length before cut: %d, " + \
+			   "cut word rate: %f\n\tmax turn length before cut: %d, cut sentence rate: %f") % \
+			  (key, invalid_num / vocab_num, oov_num / vocab_num, max(sent_length), \
+			   cut_word_num / vocab_num, max_turn_length_before_cut, cut_sentence_rate))
+
+		return split, split_size
+
+	def _write_streaming_data(self, file_path, data_fields, data_dir, word2id, valid_vocab_len, \
+			max_sent_length, special_tokens, cpu_count, interner=None):
+		r'''Read the raw files again, convert sentences to ids and write them to ``data_dir``.
+		It's a part of :meth:`_general_load_data` in streaming mode.
+
+		Returns:
+			(tuple): containing ``data`` and ``data_size``.
+		'''
+		data = {}
+		data_size = {}
+		for key in self.key_name:
+			data[key], data_size[key] = self._write_streaming_split(key, file_path, data_fields[key], data_dir, \
+				word2id, valid_vocab_len, max_sent_length, special_tokens, cpu_count, interner)
+		return data, data_size
+
+	def _write_streaming_split(self, key, file_path, fields, data_dir, word2id, valid_vocab_len, \
+			max_sent_length, special_tokens, cpu_count, interner=None):
+		r'''Read the raw file of a split again, convert sentences to ids and write them to ``data_dir``.
+		See :meth:`_write_streaming_data`.
+
+		Returns:
+			(tuple): containing the data of the split and its size.
+		'''
+		writers = {data_key: RaggedArrayWriter(os.path.join(data_dir, "%s_%s" % (key, data_key)), \
+			get_id_dtype(len(word2id))) for data_key, _ in fields}
+		sizes = {data_key: 0 for data_key, _ in fields}
+		vocab_num = invalid_num = oov_num = cut_word_num = max_sent_length_before_cut = 0
+		for records, counter in self._iter_tokenized_chunks(file_path, key, fields, special_tokens, cpu_count, interner):
+			# like the eager mode, the tokens are counted without <go> and <eos>
+			vocab_num += sum(counter.values())
+			for i, (data_key, field) in enumerate(fields):
+				sents = [field.convert_to_ids(record[i], word2id, self) for record in records if len(record) > i]
+				for sent in sents:
+					oov_num += sent.count(self.unk_id)
+					invalid_num += sum(1 for idx in sent if idx >= valid_vocab_len)
+					max_sent_length_before_cut = max(max_sent_length_before_cut, len(sent))
+					cut_word_num += max(len(sent) - max_sent_length, 0)
+				writers[data_key].extend([field.cut(sent, max_sent_length=max_sent_length) for sent in sents])
+				sizes[data_key] += len(sents)
+		split = {data_key: writer.close() for data_key, writer in writers.items()}
+		if len(set(sizes.values())) > 1:
+			raise RuntimeError("The data of input %s.txt contains different numbers of fields" % key)
+		print(("%s set. invalid rate: %f, unknown rate: %f, max sentence length before cut: %d, " + \
+			   "cut word rate: %f") % \
+			  (key, invalid_num / vocab_num, oov_num / vocab_num, max_sent_length_before_cut, \
+			   cut_word_num / vocab_num))
+		return split, sizes[fields[0][0]]
+
 	def _load_data(self):
 		r'''This function is called during the initialization.
 
@@ -728,32 +1436,213 @@ class LanguageProcessingBase(Dataloader):
 		# using utf-8 ：instead of : for avoiding bug in sphinx
 		return self.all_vocab_list[:self.valid_vocab_len]
 
-	def restart(self, key, batch_size=None, shuffle=True):
+	def _get_shuffle_rng(self):
+		# The generator is seeded by the global random state when it's first used,
+		# without changing the global random state.
+		if self._shuffle_rng is None:
+			rng_state = random.getstate()
+			self._shuffle_rng = random.Random(random.getrandbits(64))
+			random.setstate(rng_state)
+		return self._shuffle_rng
+
+	def _get_padding_shapes(self, key):
+		r'''Get the shapes of samples in padded arrays returned by :meth:`get_batch`,
+		which are used for bucketing samples by lengths.
+
+		Arguments:
+			key (str): key name of dataset, must be contained in ``self.key_name``.
+
+		Returns:
+			(tuple): containing:
+
+			* **shapes** (list): a list of 2-d arrays, one for each kind of padded array.
+			  ``shapes[k][i]`` is the shape of sample ``i`` in the ``k``-th padded array,
+			  e.g. ``[sent_length]``. Samples are sorted by the columns in order.
+			* **tokens** (:class:`numpy.ndarray`): the number of ids of each sample in all padded arrays.
+		'''
+		raise NotImplementedError( \
+			"This function should be implemented by subclasses.")
+
+	def restart(self, key, batch_size=None, shuffle=True, bucket_size=None, \
+			max_tokens=None, max_batch_size=None, rank=0, world_size=1, seed=None, pad_shards=True):
 		r'''Initialize batches. This function be called before :func:`get_next_batch`
 		or an epoch is end.
 
+		In streaming mode, the data is shuffled by a buffer (see :func:`.streaming.shuffle_buffer`),
+		so that batches are read from disk almost sequentially. The shard of each process is also
+		read from the buffer (see :class:`.streaming.ShardIndex`) if ``world_size > 1``.
+
 		Arguments:
 				key (str): key name of dataset, must be contained in ``self.key_name``.
 				batch_size (int): the number of sample in a batch.
 					default: if ``None``, last ``batch_size`` is used.
 				shuffle (bool): whether to shuffle the data. Default: ``True``.
+				bucket_size (int): if not ``None``, samples with similar lengths are put into
+					the same batch, which reduces padding. If ``shuffle`` is ``True``, samples
+					are shuffled in buckets of ``bucket_size`` samples
+					(see :func:`.sampler.bucket_by_length`). Otherwise, samples are sorted by
+					lengths in each bucket (see :func:`.sampler.sort_by_length`), which is useful
+					for inference, and :meth:`get_restore_index` restores the original order.
+					The padding saved by bucketing can be checked by :meth:`get_padding_ratio`,
+					e.g. compared with the ratio of a random ``index``.
+					Default: ``None``.
+				max_tokens (int): if not ``None``, batches have different numbers of samples, and
+					the padded size of each batch (e.g. ``batch_size * max(sent_length)``, summed over
+					all padded arrays) is at most ``max_tokens``. Samples are sorted by lengths and
+					packed into batches (see :func:`.sampler.batch_by_tokens`), then batches are
+					shuffled if ``shuffle`` is ``True``. ``batch_size`` and ``bucket_size``
+					are not used. Default: ``None``.
+				max_batch_size (int): the max number of samples in a batch if ``max_tokens``
+					is not ``None``. Default: ``None``.
+				rank (int): the rank of this process in data-parallel training. Default: ``0``.
+				world_size (int): the number of processes in data-parallel training. If it's larger
+					than ``1``, every process gets a disjoint shard of the same shuffled data with the
+					same number of batches (see :func:`.sampler.shard_index` and
+					:func:`.sampler.shard_batches`). Default: ``1``.
+				seed (int): if not ``None``, the data is shuffled by ``seed`` and the number of
+					epochs (i.e. the times :meth:`restart` is called with ``seed`` for ``key``),
+					instead of the random state of the dataloader. It must be the same in all
+					processes if ``world_size > 1``. Default: if ``None``, ``0`` is used
+					when ``world_size > 1``.
+				pad_shards (bool): if the data can't be sharded evenly, whether to repeat samples
+					(or batches if ``max_tokens`` is set) from the beginning, or drop the left ones.
+					Default: ``True``.
 		'''
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
+		if not 0 <= rank < world_size:
+			raise ValueError("rank should be in [0, world_size).")
+		# in lazy mode, the split is converted to ids before iterating it
+		self.data.get(key)
+		if world_size > 1 and seed is None:
+			seed = 0
+		rng = self._get_epoch_rng(key, seed)
+		if world_size > 1 or self._sharded[key]:
+			# Shards are cut from the same order in all processes, which can't depend on the last epoch
+			# of this process. And if the last epoch is sharded, the full index is recovered.
+			self.index[key] = list(range(self.data_size[key])) if self._shuffle_buffer_size is None \
+				else range(self.data_size[key])
+		self._sharded[key] = world_size > 1
+		if max_tokens is not None:
+			self._restart_by_tokens(key, shuffle, max_tokens, max_batch_size, rng, \
+				rank, world_size, pad_shards)
+			return
 		if batch_size is None and self.batch_size[key] is None:
 			raise ValueError("You need batch_size to initialize.")
-		if shuffle:
+		if batch_size is not None:
+			self.batch_size[key] = batch_size
+		self._batch_offsets[key] = None
+		if bucket_size is not None:
+			shapes, _ = self._get_padding_shapes(key)
+			keys = [shape[:, i] for shape in shapes for i in range(shape.shape[1])]
+			if shuffle:
+				# samples in a batch of all processes are bucketed together, then split into processes
+				self.index[key] = bucket_by_length(keys, self.batch_size[key] * world_size, \
+					bucket_size, rng()).tolist()
+			else:
+				self.index[key] = sort_by_length(keys, bucket_size).tolist()
+		elif shuffle and self._shuffle_buffer_size is not None:
+			self.index[key] = ShuffleBufferIndex(self.data_size[key], self._shuffle_buffer_size, \
+				rng().randint(2 ** 31) if seed is not None else self._get_shuffle_rng().getrandbits(64))
+		elif shuffle and seed is not None:
+			self.index[key] = rng().permutation(self.data_size[key]).tolist()
+		elif shuffle:
 			rng_state = random.getstate()
 			random.shuffle(self.index[key])
 			random.setstate(rng_state)
+		if world_size > 1 and isinstance(self.index[key], (range, ShuffleBufferIndex)):
+			# in streaming mode, the shard is read from the shuffle buffer lazily
+			self.index[key] = ShardIndex(self.index[key], rank, world_size, self.batch_size[key], pad_shards)
+		elif world_size > 1:
+			self.index[key] = shard_index(self.index[key], rank, world_size, \
+				self.batch_size[key], pad_shards).tolist()
 
 		self.batch_id[key] = 0
-		if batch_size is not None:
-			self.batch_size[key] = batch_size
 		print("%s set restart, %d batches and %d left" % (key, \
 														  len(self.index[key]) // self.batch_size[key], \
 														  len(self.index[key]) % self.batch_size[key]))
 
+	def _get_epoch_rng(self, key, seed):
+		# Return a function creating the random generator of this epoch. If ``seed`` is not ``None``,
+		# the generator only depends on ``seed`` and the epoch, so that it's the same in all processes.
+		if seed is None:
+			return lambda: np.random.RandomState(self._get_shuffle_rng().getrandbits(32))
+		self._epoch[key] += 1
+		epoch = self._epoch[key]
+		return lambda: np.random.RandomState([seed, epoch])
+
+	def _restart_by_tokens(self, key, shuffle, max_tokens, max_batch_size, rng, rank, world_size, pad_shards):
+		# Planning batches only needs sorting the stored lengths, and a few numpy operations for
+		# each batch, see `batch_by_tokens`.
+		shapes, _ = self._get_padding_shapes(key)
+		keys = [shape[:, i] for shape in shapes for i in range(shape.shape[1])]
+		if shuffle:
+			rng = rng()
+			permutation = rng.permutation(self.data_size[key])
+			index = permutation[sort_by_length([k[permutation] for k in keys])]
+			offsets = batch_by_tokens(shapes, index, max_tokens, max_batch_size)
+			index, offsets = shuffle_batches(index, offsets, rng)
+		else:
+			index = sort_by_length(keys)
+			offsets = batch_by_tokens(shapes, index, max_tokens, max_batch_size)
+		if world_size > 1:
+			index, offsets = shard_batches(index, offsets, rank, world_size, pad_shards)
+		self.index[key] = index.tolist()
+		self._batch_offsets[key] = offsets
+		self.batch_id[key] = 0
+		print("%s set restart, %d batches with at most %d tokens, padding ratio: %.4f" % \
+			(key, len(offsets) - 1, max_tokens, self.get_padding_ratio(key)))
+
+	def get_padding_ratio(self, key, index=None, batch_size=None, ignore_left_samples=False):
+		r'''Get the ratio of padding ids in the padded arrays of batches, which are generated
+		by :meth:`get_next_batch`.
+
+		Arguments:
+			key (str): key name of dataset, must be contained in ``self.key_name``.
+			index (list): the order of samples. Default: if ``None``, ``self.index[key]`` is used.
+			batch_size (int): the number of sample in a batch.
+				Default: if ``None``, batches of last :meth:`restart` are used.
+			ignore_left_samples (bool): whether the last incomplete batch is ignored.
+				Default: ``False``.
+
+		Returns:
+			(float): the ratio of padding ids to all ids in batches.
+		'''
+		if key not in self.key_name:
+			raise ValueError("No set named %s." % key)
+		if batch_size is None and self._batch_offsets[key] is not None:
+			batch_size = self._batch_offsets[key]
+		batch_size = batch_size if batch_size is not None else self.batch_size[key]
+		if batch_size is None:
+			raise ValueError("You need batch_size to compute padding ratio.")
+		shapes, tokens = self._get_padding_shapes(key)
+		return padding_ratio(shapes, tokens, self.index[key] if index is None else index, \
+			batch_size, ignore_left_samples)
+
+	def get_restore_index(self, key):
+		r'''Get the permutation which restores the original order of samples from the order
+		of batches, e.g. after :meth:`restart` with ``shuffle=False`` and ``bucket_size``.
+
+		Arguments:
+			key (str): key name of dataset, must be contained in ``self.key_name``.
+
+		Returns:
+			(:class:`numpy.ndarray`): ``restore``. If ``outputs`` is the list of per-sample outputs
+			in the order of batches (without ignoring left samples), ``[outputs[i] for i in restore]``
+			is in the original order of the dataset.
+
+		Examples:
+			>>> size = dataloader.data_size["test"]
+			>>> dataloader.restart("test", batch_size=64, shuffle=False, bucket_size=size)
+			>>> outputs = []
+			>>> for batch in iter(lambda: dataloader.get_next_batch("test"), None):
+			...     outputs.extend(model(batch))
+			>>> outputs = [outputs[i] for i in dataloader.get_restore_index("test")]
+		'''
+		if key not in self.key_name:
+			raise ValueError("No set named %s." % key)
+		return restore_index(self.index[key])
+
 	GET_BATCH_DOC_WITHOUT_RETURNS = r'''
 		Get a batch of specified `indexes`.
 
@@ -778,29 +1667,41 @@ class LanguageProcessingBase(Dataloader):
 			key (str): key name of dataset, must be contained in ``self.key_name``.
 			ignore_left_samples (bool): If the number of left samples is not equal to
 				``batch_size``, ignore them. This make sure all batches have same number of samples.
-				Default: ``False``
+				It's not used if batches are initialized with ``max_tokens``. Default: ``False``
 
 		Returns:
 			A dict like :func:`get_batch`, or None if the epoch is end.
 		'''
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
-		if self.batch_size[key] is None:
-			raise RuntimeError( \
-				"Please run restart before calling this function.")
-		batch_id = self.batch_id[key]
-		start, end = batch_id * \
-					 self.batch_size[key], (batch_id + 1) * self.batch_size[key]
-		if start >= len(self.index[key]):
-			return None
-		if ignore_left_samples and end > len(self.index[key]):
+		index = self._next_batch_index(key, ignore_left_samples)
+		if index is None:
 			return None
-		index = self.index[key][start:end]
-		res = self.get_batch(key, index)
+		return self.get_batch(key, index)
+
+	def _next_batch_index(self, key, ignore_left_samples):
+		# Get indexes of the next batch and move to the next batch, or return ``None`` if the epoch is end.
+		batch_id = self.batch_id[key]
+		offsets = self._batch_offsets[key]
+		if offsets is not None:
+			if batch_id + 1 >= len(offsets):
+				return None
+			start, end = offsets[batch_id], offsets[batch_id + 1]
+		else:
+			if self.batch_size[key] is None:
+				raise RuntimeError( \
+					"Please run restart before calling this function.")
+			start, end = batch_id * \
+						 self.batch_size[key], (batch_id + 1) * self.batch_size[key]
+			if start >= len(self.index[key]):
+				return None
+			if ignore_left_samples and end > len(self.index[key]):
+				return None
 		self.batch_id[key] += 1
-		return res
+		return self.index[key][start:end]
 
-	def get_batches(self, key, batch_size=None, shuffle=True, ignore_left_samples=False):
+	def get_batches(self, key, batch_size=None, shuffle=True, ignore_left_samples=False, bucket_size=None, \
+			max_tokens=None, max_batch_size=None, prefetch=0, rank=0, world_size=1, seed=None, pad_shards=True):
 		'''An iterator over batches. It first call :func:`restart`, and then :func:`get_next_batches`\
 			until no more data is available.
 
@@ -811,32 +1712,86 @@ class LanguageProcessingBase(Dataloader):
 			ignore_left_samples (bool): If the number of left samples is not equal to
 				``batch_size``, ignore them. This make sure all batches have same number of samples.
 				Default: ``False``.
+			bucket_size (int): if not ``None``, samples with similar lengths are put into the same batch.
+				See :meth:`restart`. Default: ``None``.
+			max_tokens (int): if not ``None``, the padded size of each batch is at most ``max_tokens``,
+				and ``batch_size`` is not used. See :meth:`restart`. Default: ``None``.
+			max_batch_size (int): the max number of samples in a batch if ``max_tokens`` is
+				not ``None``. Default: ``None``.
+			prefetch (int): if positive, at most ``prefetch`` batches are prepared ahead by a background
+				thread (see :class:`.prefetch.PrefetchIterator`), while the order of batches is
+				not changed. The thread is stopped when the iteration is end or the iterator is closed.
+				Default: ``0``.
+			rank (int): the rank of this process in data-parallel training. Default: ``0``.
+			world_size (int): the number of processes in data-parallel training. See :meth:`restart`.
+				Default: ``1``.
+			seed (int): the random seed shared by all processes. See :meth:`restart`. Default: ``None``.
+			pad_shards (bool): whether to pad or drop samples when the data can't be sharded evenly.
+				See :meth:`restart`. Default: ``True``.
 
 		Returns:
 			An iterator where each element is like :func:`get_batch`.
+
+		Examples:
+			>>> for batch in dataloader.get_batches("train", max_tokens=4096, max_batch_size=128):
+			...     assert batch["sent"].size <= 4096
 		'''
-		self.restart(key, batch_size, shuffle)
+		self.restart(key, batch_size, shuffle, bucket_size, max_tokens, max_batch_size, \
+			rank, world_size, seed, pad_shards)
+		if prefetch > 0:
+			indexes = iter(lambda: self._next_batch_index(key, ignore_left_samples), None)
+			tasks = ((key, index) for index in indexes)
+			with PrefetchIterator(self.get_batch, tasks, prefetch) as batches:
+				yield from batches
+			return
 		while True:
 			res = self.get_next_batch(key, ignore_left_samples)
 			if res is None:
 				break
 			yield res
 
-	def get_all_batch(self, key):
+	def get_all_batch(self, key, ragged=False):
 		r'''Concatenate all batches to a single dict, where padding will not be applied.
-		Exactly, this function called :func:`.get_batch` where ``len(indexes)==1`` multiple times
-		and concatenate all the values in the returned dicts.
+		The samples are in the order of ``self.index[key]``, and the returned content is
+		the same as calling :func:`.get_batch` where ``len(indexes)==1`` for each sample
+		and concatenating all the values in the returned dicts.
+
+		Unlike calling :func:`.get_batch`, the stored ids are read in bulk.
 
+		Arguments:
+			key (str): key name of dataset, must be contained in ``self.key_name``.
+			ragged (bool): If ``False``, all the values are converted to lists like the
+				concatenation of :func:`.get_batch`. If ``True``, sentences and sessions are
+				returned as :class:`.RaggedArray` (a flat array of ids plus offsets), and
+				lengths and labels are returned as 1-d :class:`numpy.ndarray`. Default: ``False``.
 
-        Arguments:
-            key (str): key name of dataset, must be contained in ``self.key_name``.
+		Returns:
+			A dict like :func:`get_batch`, but all the values are not padded.
+			If ``ragged=False``, the sentences are 1-d :class:`numpy.ndarray`,
+			and the sessions are 2-d :class:`numpy.ndarray` padded to their own
+			``[turn_length, max(sent_length)]``.
+		'''
+		if key not in self.key_name:
+			raise ValueError("No set named %s." % key)
+		index = np.fromiter(self.index[key], dtype=np.int64)
+		res = self._get_all_batch(key, index)
+		if not ragged:
+			# convert values one by one, so that each ragged array is freed after conversion
+			for attr in list(res):
+				res[attr] = _ragged_to_list(res.pop(attr))
+		return res
 
-        Returns:
-            A dict like :func:`get_batch`, but all the values are not padded
-            and their type will be converted to list.
-        '''
+	def _get_all_batch(self, key, index):
+		r'''Get all the samples of ``index`` for :meth:`get_all_batch` with ``ragged=True``.
+		Subclasses read the stored ids in bulk, while this default implementation calls
+		:func:`.get_batch` for each sample and returns lists.
+
+		Arguments:
+			key (str): key name of dataset, must be contained in ``self.key_name``.
+			index (:class:`numpy.ndarray`): indexes of samples.
+		'''
 		res = {}
-		for idx in self.index[key]:
+		for idx in index:
 			batch = self.get_batch(key, [idx])
 			for attr, val in batch.items():
 				if attr not in res:
@@ -846,6 +1801,24 @@ class LanguageProcessingBase(Dataloader):
 				res[attr].extend(val)
 		return res
 
+	def _take_ids(self, key, field, index, depth=1):
+		r'''Get sentences (``depth=1``) or sessions (``depth=2``) of ``self.data[key][field]``
+		in bulk.
+
+		Returns:
+			(tuple): two :class:`.RaggedArray` of ``self.id_dtype`` like :meth:`get_batch`. The first one only
+			provides valid words, where ``unk_id`` is used if a word is not valid. The second one provides all words.
+		'''
+		data = self.data[key][field]
+		if isinstance(data, RaggedArray):
+			allvocabs = data.take(index)
+		else:
+			allvocabs = RaggedArray.from_list([data[i] for i in index], depth)
+		allvocabs = RaggedArray(allvocabs.values.astype(self.id_dtype), allvocabs.offsets)
+		valid = allvocabs.values.copy()
+		valid[valid >= self.valid_vocab_len] = self.unk_id
+		return RaggedArray(valid, allvocabs.offsets), allvocabs
+
 	def convert_tokens_to_ids(self, sent, invalid_vocab=False):
 		r'''Convert a sentence from string to ids representation.
 
@@ -871,10 +1844,7 @@ class LanguageProcessingBase(Dataloader):
 			...	["<go>", "I", "have", "been", "to", "China", "<eos>"], invalid_vocab=True)
 			>>> [2, 4, 5, 6, 7, 8, 3]
 		'''
-		if invalid_vocab:
-			return list(map(lambda word: self.word2id.get(word, self.unk_id), sent))
-		else:
-			return list(map(self._valid_word2id, sent))
+		return self.vocab.encode(sent, invalid_vocab)
 
 	def trim(self, ids):
 		r'''Trim a sentence represented by ids. There will be two steps:
@@ -929,4 +1899,61 @@ class LanguageProcessingBase(Dataloader):
 		'''
 		if trim:
 			ids = self.trim(ids)
-		return list(map(lambda word: self.all_vocab_list[word], ids))
+		return self.vocab.decode(ids)
+
+	def trim_batch(self, ids):
+		r'''Trim a batch of sentences represented by ids. The result is the same as calling
+		:func:`trim` for each sentence, but the lengths of trimmed sentences in a padded array are
+		computed by numpy at once.
+
+		Arguments:
+			ids (list or :class:`numpy.ndarray`): a 2-d array of int. Size: ``[batch_size, sent_length]``.
+				A jagged list is trimmed sentence by sentence.
+
+		Returns:
+			(list): a jagged 2-d list of trimmed ids. Size: ``[batch_size, ~sent_length]``,
+			where "~" means different sizes in this dimension is allowed.
+
+		Examples:
+
+			>>> # all_vocab_list = ["<pad>", "<unk>", "<go>", "<eos>", "I", "have",
+			>>> #	"been", "to", "China"]
+			>>> dataloader.trim_batch(np.array(
+			...	[[2, 4, 5, 6, 7, 8, 0, 0, 3, 4, 3, 0],
+			...	[2, 4, 5, 3, 0, 0, 0, 0, 0, 0, 0, 0]]))
+			>>> [[2, 4, 5, 6, 7, 8], [2, 4, 5]]
+		'''
+		array = _padded_array(ids, 2)
+		if array is None:
+			return [self.trim(sent) for sent in ids]
+		lengths = _trim_lengths(array, self.eos_id, self.pad_id)
+		return [sent[:length] for sent, length in zip(array.tolist(), lengths.tolist())]
+
+	def convert_ids_to_tokens_batch(self, ids, trim=True):
+		'''Convert a batch of sentences from ids to string representation. The result is the same as
+		calling :func:`convert_ids_to_tokens` for each sentence, but a padded array is converted
+		by :meth:`.Vocab.decode_batch` at once.
+
+		Arguments:
+				ids (list or :class:`numpy.ndarray`): a 2-d array of int.
+					Size: ``[batch_size, sent_length]``.
+				trim (bool): if True, call :func:`trim_batch` before convertion.
+
+		Returns:
+			(list): a jagged 2-d list of tokens. Size: ``[batch_size, ~sent_length]``.
+
+		Examples:
+			>>> # all_vocab_list = ["<pad>", "<unk>", "<go>", "<eos>", "I", "have",
+			>>> #	"been", "to", "China"]
+			>>> dataloader.convert_ids_to_tokens_batch(np.array(
+			...		[[2, 4, 5, 6, 7, 8, 3, 0, 0], [2, 4, 3, 0, 0, 0, 0, 0, 0]]), trim=True)
+			>>> [["<go>", "I", "have", "been", "to", "China"], ["<go>", "I"]]
+		'''
+		array = _padded_array(ids, 2)
+		if array is None:
+			return [self.convert_ids_to_tokens(sent, trim) for sent in ids]
+		tokens = self.vocab.decode_batch(array).tolist()
+		if not trim:
+			return tokens
+		lengths = _trim_lengths(array, self.eos_id, self.pad_id)
+		return [sent[:length] for sent, length in zip(tokens, lengths.tolist())]
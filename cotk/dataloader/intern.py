@@ -0,0 +1,116 @@
+'''
+A module for deduplicating sentences when loading datasets.
+'''
+import sys
+import time
+from collections import OrderedDict
+
+
+class SentenceInterner:
+	r'''An intern table of sentences, which tokenizes each distinct sentence only once.
+	It's called like ``tokenize_batch``, and identical sentences share one list of tokens in the result,
+	so the memory of tokenized sentences with many repeats (e.g. "thank you") is saved as well.
+	The shared lists must not be modified. Only the lists of tokens are shared: the ids converted from
+	them are not, so the memory of a loaded dataset is the same as the one loaded without deduplication.
+
+	The table is dropped when pickled (e.g. sent to worker processes), so each process has its own table,
+	and the statistics of processes are summed up by :meth:`add_stats`.
+
+	Arguments:
+		tokenize_batch (callable): a function converting a list of sentences to a list of lists of tokens.
+		max_size (int): If not ``None``, at most ``max_size`` distinct sentences are kept in the table,
+			and the least recently used ones are evicted. Otherwise, all distinct sentences are kept.
+			Default: ``None``.
+
+	Examples:
+		>>> interner = SentenceInterner(lambda sentences: [s.split() for s in sentences])
+		>>> tokens = interner(["thank you", "i see", "thank you"])
+		>>> tokens
+		[['thank', 'you'], ['i', 'see'], ['thank', 'you']]
+		>>> tokens[0] is tokens[2]
+		True
+		>>> interner.get_stats()["distinct"]
+		2
+	'''
+	def __init__(self, tokenize_batch, max_size=None):
+		if max_size is not None and max_size <= 0:
+			raise ValueError("max_size should be positive.")
+		self.tokenize_batch = tokenize_batch
+		self.max_size = max_size
+		self._table = OrderedDict()
+		self._stats = _empty_stats()
+
+	def __getstate__(self):
+		return {'tokenize_batch': self.tokenize_batch, 'max_size': self.max_size}
+
+	def __setstate__(self, state):
+		self.__init__(state['tokenize_batch'], state['max_size'])
+
+	def __call__(self, sentences):
+		table = self._table
+		missing = list(OrderedDict.fromkeys(sentence for sentence in sentences if sentence not in table))
+		if missing:
+			start = time.time()
+			tokenized = self.tokenize_batch(missing)
+			self._stats['tokenize_time'] += time.time() - start
+			for sentence, tokens in zip(missing, tokenized):
+				table[sentence] = (tokens, sys.getsizeof(tokens) + sum(map(sys.getsizeof, tokens)))
+
+		res = []
+		stats = self._stats
+		for sentence in sentences:
+			tokens, size = table[sentence]
+			res.append(tokens)
+			stats['memory'] += size
+			if self.max_size is not None:
+				table.move_to_end(sentence)
+		stats['sentences'] += len(sentences)
+		stats['distinct'] += len(missing)
+		stats['distinct_memory'] += sum(table[sentence][1] for sentence in missing)
+		if self.max_size is not None:
+			while len(table) > self.max_size:
+				table.popitem(last=False)
+		return res
+
+	def add_stats(self, stats):
+		r'''Add the statistics of another interner, e.g. the one in a worker process.
+
+		Arguments:
+			stats (dict): returned by :meth:`pop_stats` of the other interner.
+		'''
+		for name, value in stats.items():
+			self._stats[name] += value
+
+	def pop_stats(self):
+		r'''Get the statistics (see :meth:`get_stats`) counted since the last call, and reset them.'''
+		stats, self._stats = self._stats, _empty_stats()
+		return stats
+
+	def get_stats(self):
+		r'''Get the statistics of deduplication.
+
+		Returns:
+			(dict): containing:
+
+			* **sentences** (int): the number of tokenized sentences.
+			* **distinct** (int): the number of sentences which are actually tokenized. It's the number of
+			  distinct sentences if all of them are kept in the table.
+			* **dedup_ratio** (float): the ratio of sentences which are not tokenized again.
+			* **tokenize_time** (float): the seconds spent on tokenizing.
+			* **saved_time** (float): the estimated seconds saved by deduplication, assuming that all
+			  sentences cost the same time.
+			* **saved_memory** (int): the estimated bytes of token lists saved by deduplication. It only
+			  covers the lists returned by the interner, which are kept while loading and dropped after
+			  they are converted to ids. If the sentences are tokenized by worker processes, the lists are
+			  only shared within a chunk after they are sent back, so it's an upper bound.
+		'''
+		stats = dict(self._stats)
+		sentences, distinct = stats['sentences'], stats['distinct']
+		stats['dedup_ratio'] = 1 - distinct / sentences if sentences else 0.
+		stats['saved_time'] = stats['tokenize_time'] * (sentences - distinct) / distinct if distinct else 0.
+		stats['saved_memory'] = stats.pop('memory') - stats.pop('distinct_memory')
+		return stats
+
+
+def _empty_stats():
+	return {'sentences': 0, 'distinct': 0, 'tokenize_time': 0., 'memory': 0, 'distinct_memory': 0}
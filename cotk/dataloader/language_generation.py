@@ -5,6 +5,8 @@ import numpy as np
 from .._utils.file_utils import get_resource_file_path
 from .._utils import hooks
 from .dataloader import LanguageProcessingBase
+from .ragged_array import pad_sentences
+from .sampler import sentence_lengths
 from ..metric import MetricChain, PerplexityMetric, LanguageGenerationRecorder, \
 	FwBwBleuCorpusMetric, SelfBleuCorpusMetric
 
@@ -31,9 +33,30 @@ class LanguageGeneration(LanguageProcessingBase):
 				not less than ``invalid_vocab_times`` in the **whole dataset** (except valid words) will be
 				marked as invalid words. Otherwise, they are unknown words, which are ignored both for
 				model or metrics. {INVALID_VOCAB_TIMES_DEFAULT}
-			tokenizer (str): How to tokenize sentence. ``nltk.tokenize.WordPunctTokenizer`` is used if ``nltk`` is specified,
-				python built-in ``str.split`` is used if ``space`` is specified. {TOKENIZER_DEFAULT}
+			tokenizer (str): How to tokenize sentence. The results are the same as ``nltk.tokenize.WordPunctTokenizer``
+				if ``nltk`` is specified, and python built-in ``str.split`` if ``space`` is specified. Other tokenizers
+				can be registered by :func:`.tokenizer.register_tokenizer`. {TOKENIZER_DEFAULT}
 			remains_capital(bool): Whether remaining capital letter in data or converting them to lower case. {REMAINS_CAPITAL_DEFAULT}
+			cache_dir (str): A directory for caching the preprocessed dataset. The second construction
+				with the same arguments loads the cache instead of processing the raw files.
+				If ``None``, cache is disabled. Default: ``None``.
+			cpu_count (int): Number of used cpu for tokenizing the dataset. Multiprocessing
+				will **NOT** be used when ``cpu_count`` is set to ``1`` or the dataset is small.
+				Default: If ``None``, the environment variable ``CPU_COUNT`` will be used
+				when available, or all available cpu will be used otherwise.
+			streaming (bool): Whether to load the dataset in streaming mode, where sentences are stored
+				on disk instead of memory and read almost sequentially when getting batches.
+				It's useful for datasets which don't fit in memory. Default: ``False``.
+			shuffle_buffer_size (int): In streaming mode, data are shuffled by a buffer with size of
+				``shuffle_buffer_size`` when calling :meth:`restart`. The memory for shuffling is bounded
+				by it. Larger buffer makes the order more random. Default: ``10000``.
+			lazy (bool): Whether to convert each split (e.g. ``test``) to ids only when it's used for the
+				first time, which saves time and memory if some splits are never used. The vocabulary is the
+				same as the one built without ``lazy``. Default: ``False``.
+			dedup (bool, int): Whether to tokenize each distinct sentence only once, which saves the time of
+				tokenizing if the dataset contains many repeated sentences. Identical sentences share their tokens
+				while loading, but not the loaded ids. If it's an integer, at most ``dedup`` distinct sentences are
+				remembered at a time. The dataset is the same as the one loaded without ``dedup``. Default: ``False``.
 		'''
 	FILE_ID_DEFAULT = ''
 	VALID_VOCAB_TIMES_DEFAULT = ''
@@ -50,7 +73,8 @@ class LanguageGeneration(LanguageProcessingBase):
 	def __init__(self, file_id, min_vocab_times, \
 			max_sent_length, invalid_vocab_times, \
 			tokenizer, remains_capital, \
-			):
+			cache_dir=None, cpu_count=None, \
+			streaming=False, shuffle_buffer_size=10000, lazy=False, dedup=False):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
@@ -58,6 +82,12 @@ class LanguageGeneration(LanguageProcessingBase):
 		self._invalid_vocab_times = invalid_vocab_times
 		self._tokenizer = tokenizer
 		self._remains_capital = remains_capital
+		self._cache_dir = cache_dir
+		self._cpu_count = cpu_count
+		self._streaming = streaming
+		self._shuffle_buffer_size = shuffle_buffer_size if streaming else None
+		self._lazy = lazy
+		self._dedup = dedup
 		super().__init__()
 
 	def tokenize(self, sentence, remains_capital=None, tokenizer=None):
@@ -72,11 +102,26 @@ class LanguageGeneration(LanguageProcessingBase):
 		return super().tokenize(sentence, remains_capital or self._remains_capital, \
 			tokenizer or self._tokenizer)
 
+	def tokenize_batch(self, sentences, remains_capital=None, tokenizer=None):
+		r'''Convert a list of sentences(str) to lists of tokens(str)
+
+		Arguments:
+			sentences (list): a list of strings to be tokenized
+
+		Returns:
+			list: a list of lists of tokens(str)
+		'''
+		return super().tokenize_batch(sentences, remains_capital or self._remains_capital, \
+			tokenizer or self._tokenizer)
+
 	def _load_data(self):
 		r'''Loading dataset, invoked during the initialization of :class:`LanguageProcessingBase`.
 		'''
 		return super()._general_load_data(self._file_path, [['sent', 'Sentence']], \
-			self._min_vocab_times, self._max_sent_length, None, self._invalid_vocab_times)
+			self._min_vocab_times, self._max_sent_length, None, self._invalid_vocab_times, \
+			cache_dir=self._cache_dir, tokenize_args=(self._tokenizer, self._remains_capital), \
+			cpu_count=self._cpu_count, streaming=self._streaming, lazy=self._lazy, \
+			dedup=self._dedup)
 
 	def get_batch(self, key, indexes):
 		'''{LanguageProcessingBase.GET_BATCH_DOC_WITHOUT_RETURNS}
@@ -117,19 +162,24 @@ class LanguageGeneration(LanguageProcessingBase):
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
 		res = {}
-		batch_size = len(indexes)
-		res["sent_length"] = np.array( \
-			list(map(lambda i: len(self.data[key]['sent'][i]), indexes)), dtype=int)
-		res_sent = res["sent"] = np.zeros( \
-			(batch_size, np.max(res["sent_length"])), dtype=int)
-		for i, j in enumerate(indexes):
-			sentence = self.data[key]['sent'][j]
-			res["sent"][i, :len(sentence)] = sentence
+		res_sent, res["sent_length"] = pad_sentences(self.data[key]['sent'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["sent"] = res_sent
 
 		res["sent_allvocabs"] = res_sent.copy()
 		res_sent[res_sent >= self.valid_vocab_len] = self.unk_id
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = {}
+		res["sent"], res["sent_allvocabs"] = self._take_ids(key, 'sent', index)
+		res["sent_length"] = res["sent"].get_lengths().astype(self.length_dtype)
+		return res
+
+	def _get_padding_shapes(self, key):
+		sent_length = sentence_lengths(self.data[key]['sent'])
+		return [sent_length[:, None]], sent_length
+
 	def get_teacher_forcing_metric(self, gen_log_prob_key="gen_log_prob"):
 		'''Get metrics for teacher-forcing. In other words, this function
 		provides metrics for language modelling task.
@@ -216,6 +266,8 @@ class MSCOCO(LanguageGeneration):
 	def __init__(self, file_id="resources://MSCOCO", min_vocab_times=10, \
 			max_sent_length=50, invalid_vocab_times=0, \
 			tokenizer="nltk", remains_capital=True, \
-			):
+			cache_dir=None, cpu_count=None, \
+			streaming=False, shuffle_buffer_size=10000, lazy=False, dedup=False):
 		super().__init__(file_id, min_vocab_times, max_sent_length, invalid_vocab_times, \
-			tokenizer, remains_capital)
+			tokenizer, remains_capital, cache_dir, cpu_count, \
+			streaming, shuffle_buffer_size, lazy, dedup)
@@ -1,13 +1,15 @@
 """
 A module for multi turn dialog.
 """
-from itertools import chain
 
 import numpy as np
 
 from .._utils.file_utils import get_resource_file_path
 from .._utils import hooks
-from .dataloader import LanguageProcessingBase, Session
+from .._utils.metaclass import DocStringInheritor
+from .dataloader import LanguageProcessingBase, Session, _padded_array, _trim_lengths
+from .ragged_array import RaggedArray, pad_sessions
+from .sampler import session_lengths
 from ..metric import MetricChain, MultiTurnPerplexityMetric, MultiTurnBleuCorpusMetric, \
 	MultiTurnDialogRecorder
 from ..metric import BleuPrecisionRecallMetric, EmbSimilarityPrecisionRecallMetric
@@ -94,22 +96,27 @@ class MultiTurnDialog(LanguageProcessingBase):
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
 		res = {}
-		res["turn_length"] = np.array([len(self.data[key]['session'][i]) for i in indexes], dtype=int)
-		res["sent_length"] = []
-		for i in indexes:
-			sent_length = np.array([len(sent) for sent in self.data[key]['session'][i]], dtype=int)
-			res["sent_length"].append(sent_length)
-		res["sent_length"] = np.array(res["sent_length"])
-		res_sent = res["sent"] = np.zeros((len(indexes), np.max(res['turn_length']), \
-			np.max(list(chain(*res['sent_length'])))), dtype=int)
-		for i, index_i in enumerate(indexes):
-			for j, sent in enumerate(self.data[key]['session'][index_i]):
-				res_sent[i, j, :len(sent)] = sent
+		res_sent, res["turn_length"], sent_length = pad_sessions(self.data[key]['session'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["sent_length"] = np.array(sent_length)
+		res["sent"] = res_sent
 
 		res["sent_allvocabs"] = res_sent.copy()
 		res_sent[res_sent >= self.valid_vocab_len] = self.unk_id
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = {}
+		res["sent"], res["sent_allvocabs"] = self._take_ids(key, 'session', index, depth=2)
+		session_offsets, sent_offsets = res["sent"].offsets
+		res["turn_length"] = np.diff(session_offsets).astype(self.length_dtype)
+		res["sent_length"] = RaggedArray(np.diff(sent_offsets).astype(self.length_dtype), [session_offsets])
+		return res
+
+	def _get_padding_shapes(self, key):
+		turn_length, max_sent_length, tokens = session_lengths(self.data[key]['session'])
+		return [np.stack([turn_length, max_sent_length], axis=1)], tokens
+
 	def multi_turn_trim(self, index, turn_length=None, ignore_first_token=False):
 		r'''Trim indexes for multi turn dialog. There will be 3 steps:
 
@@ -169,6 +176,55 @@ class MultiTurnDialog(LanguageProcessingBase):
 			res.append(turn_trim)
 		return res
 
+	def _multi_turn_trim_spans(self, array, turn_length, ignore_first_token):
+		# the number of kept turns, and the start and end of each kept turn in a padded array of sessions
+		lengths = _trim_lengths(array, self.eos_id, self.pad_id)
+		starts = np.minimum(lengths, 1) if ignore_first_token else np.zeros_like(lengths)
+		max_turn = array.shape[1]
+		if turn_length is None:
+			# sessions stop at the first empty turn
+			is_empty = lengths <= starts
+			turn_nums = np.where(is_empty.any(axis=1), is_empty.argmax(axis=1), max_turn) \
+				if max_turn else np.zeros(len(array), dtype=np.int64)
+		else:
+			turn_length = np.asarray(turn_length)
+			turn_nums = np.where(turn_length != 0, np.clip(turn_length, 0, max_turn), max_turn)
+		return turn_nums.tolist(), starts.tolist(), lengths.tolist()
+
+	def multi_turn_trim_batch(self, index, turn_length=None, ignore_first_token=False):
+		r'''Trim a batch of sessions. The result is the same as calling :func:`multi_turn_trim`
+		for each session, but the lengths of trimmed turns in a padded array are computed by numpy at once.
+
+		Arguments:
+			index (list or :class:`numpy.ndarray`): a 3-d array of int.
+				Size: ``[batch_size, turn_length, sent_length]``. A jagged list is trimmed
+				session by session.
+			turn_length (list or :class:`numpy.ndarray`): the turn length of each session.
+				See :func:`multi_turn_trim`. Default: ``None``
+			ignore_first_token (bool): if True, ignore first token of each turn (must be ``<go>``).
+
+		Returns:
+			(list) a jagged 3-d array of trimmed index. Size: ``[batch_size, ~turn_length, ~sent_length]``.
+
+		Examples:
+			>>> # all_vocab_list = ["<pad>", "<unk>", "<go>", "<eos>", "I", "have",
+			>>> #	"been", "to", "China", "Japan"]
+			>>> dataloader.multi_turn_trim_batch(np.array(
+			...	[[[2, 4, 5, 6, 7, 8, 0, 0, 3, 4, 3, 0],
+			...	[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]],
+			...	[[2, 4, 5, 6, 7, 9, 3, 0, 3, 4, 3, 0],
+			...	[2, 4, 5, 6, 7, 8, 0, 0, 3, 4, 3, 0]]]),
+			...	turn_length = None, ignore_first_token = True)
+			[[[4, 5, 6, 7, 8]], [[4, 5, 6, 7, 9], [4, 5, 6, 7, 8]]]
+		'''
+		array = _padded_array(index, 3)
+		if array is None:
+			return [self.multi_turn_trim(session, None if turn_length is None else turn_length[i], \
+				ignore_first_token) for i, session in enumerate(index)]
+		spans = self._multi_turn_trim_spans(array, turn_length, ignore_first_token)
+		return [[sent[start:end] for sent, start, end in zip(session[:turn_num], starts, ends)] \
+			for session, turn_num, starts, ends in zip(array.tolist(), *spans)]
+
 	def convert_multi_turn_tokens_to_ids(self, session, invalid_vocab=False):
 		'''Convert a session from string to index representation.
 
@@ -195,14 +251,7 @@ class MultiTurnDialog(LanguageProcessingBase):
 			... ["<go>", "I", "have", "been", "to", "Japan", "<eos>"]], invalid_vocab=True)
 			>>> [[2, 4, 5, 6, 7, 8, 3], [2, 4, 5, 6, 7, 9, 3]]
 		'''
-		if invalid_vocab:
-			return list(map(lambda sent: list(map( \
-				lambda word: self.word2id.get(word, self.unk_id), sent)), \
-			session))
-		else:
-			return list(map(lambda sent: list(map( \
-				self._valid_word2id, sent)), \
-			session))
+		return self.vocab.encode_batch(session, invalid_vocab).tolist()
 
 	def convert_multi_turn_ids_to_tokens(self, index, trim=True, turn_length=None, \
 				ignore_first_token=False):
@@ -250,9 +299,37 @@ class MultiTurnDialog(LanguageProcessingBase):
 		if trim:
 			index = self.multi_turn_trim(index, turn_length=turn_length, \
 				ignore_first_token=ignore_first_token)
-		return list(map(lambda sent: \
-			list(map(lambda word: self.all_vocab_list[word], sent)), \
-			index))
+		return list(map(self.vocab.decode, index))
+
+	def convert_multi_turn_ids_to_tokens_batch(self, index, trim=True, turn_length=None, \
+				ignore_first_token=False):
+		'''Convert a batch of sessions from index to string representation. The result is the same as
+		calling :func:`convert_multi_turn_ids_to_tokens` for each session, but a padded array is converted
+		by :meth:`.Vocab.decode_batch` at once.
+
+		Arguments:
+			index (list or :class:`numpy.ndarray`): a 3-d array of int.
+				Size: ``[batch_size, turn_length, sent_length]``.
+			trim (bool): if True, call :func:`multi_turn_trim_batch` before convertion.
+			turn_length (list or :class:`numpy.ndarray`): Only works when trim=``True``.
+				The turn length of each session. Default: None
+			ignore_first_token (bool): Only works when trim=``True``.
+				If True, ignore first token of each turn (must be `<go>`).
+
+		Returns:
+			(list): a jagged 3-d list of tokens. Size: ``[batch_size, ~turn_length, ~sent_length]``.
+		'''
+		array = _padded_array(index, 3)
+		if array is None:
+			return [self.convert_multi_turn_ids_to_tokens(session, trim, \
+				None if turn_length is None else turn_length[i], ignore_first_token) \
+				for i, session in enumerate(index)]
+		tokens = self.vocab.decode_batch(array).tolist()
+		if not trim:
+			return tokens
+		spans = self._multi_turn_trim_spans(array, turn_length, ignore_first_token)
+		return [[sent[start:end] for sent, start, end in zip(session[:turn_num], starts, ends)] \
+			for session, turn_num, starts, ends in zip(tokens, *spans)]
 
 	def get_teacher_forcing_metric(self, multi_turn_gen_log_prob_key="multi_turn_gen_log_prob"):
 		'''Get metric for teacher-forcing.
@@ -328,28 +405,69 @@ class UbuntuCorpus(MultiTurnDialog):
 			not less than ``invalid_vocab_times`` in the **whole dataset** (except valid words) will be
 			marked as invalid words. Otherwise, they are unknown words, both in training or
 			testing stages. Default: ``0`` (No unknown words).
+		cache_dir (str): A directory for caching the preprocessed dataset. The second construction
+			with the same arguments loads the cache instead of processing the raw files.
+			If ``None``, cache is disabled. Default: ``None``.
+		cpu_count (int): Number of used cpu for tokenizing the dataset. Multiprocessing
+			will **NOT** be used when ``cpu_count`` is set to ``1`` or the dataset is small.
+			Default: If ``None``, the environment variable ``CPU_COUNT`` will be used
+			when available, or all available cpu will be used otherwise.
+		lazy (bool): Whether to convert each split (e.g. ``test``) to ids only when it's used for the
+			first time, which saves time and memory if some splits are never used. The vocabulary is the
+			same as the one built without ``lazy``. Default: ``False``.
+		dedup (bool, int): Whether to tokenize each distinct sentence only once, which saves the time of
+			tokenizing if the dataset contains many repeated sentences. Identical sentences share their tokens
+			while loading, but not the loaded ids. If it's an integer, at most ``dedup`` distinct sentences are
+			remembered at a time. The dataset is the same as the one loaded without ``dedup``. Default: ``False``.
 	'''
 
 	@hooks.hook_dataloader
 	def __init__(self, file_id="resources://Ubuntu", min_vocab_times=10, \
-			max_sent_length=50, max_turn_length=20, invalid_vocab_times=0):
+			max_sent_length=50, max_turn_length=20, invalid_vocab_times=0, cache_dir=None, \
+			cpu_count=None, lazy=False, dedup=False):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
 		self._max_sent_length = max_sent_length
 		self._max_turn_length = max_turn_length
 		self._invalid_vocab_times = invalid_vocab_times
+		self._cache_dir = cache_dir
+		self._cpu_count = cpu_count
+		self._lazy = lazy
+		self._dedup = dedup
 		super(UbuntuCorpus, self).__init__()
 
 	def _load_data(self):
 		r'''Loading dataset, invoked during the initialization of :class:`MultiTurnDialog`.
 		'''
 		return super()._general_load_data(self._file_path, [['session', 'Session']], self._min_vocab_times,
-										  self._max_sent_length, self._max_turn_length, self._invalid_vocab_times)
+										  self._max_sent_length, self._max_turn_length, self._invalid_vocab_times,
+										  cache_dir=self._cache_dir,
+										  cpu_count=self._cpu_count,
+										  lazy=self._lazy,
+										  dedup=self._dedup)
 
 	def tokenize(self, sentence, remains_capital=False, tokenizer='nltk'):
 		return super().tokenize(sentence, remains_capital, tokenizer)
 
+	def tokenize_batch(self, sentences, remains_capital=False, tokenizer='nltk'):
+		return super().tokenize_batch(sentences, remains_capital, tokenizer)
+
+
+class _CandidateMeta(DocStringInheritor):
+	# ``repr`` of field classes is a part of the hash value of datasets. The class was defined in
+	# :meth:`SwitchboardCorpus._load_data`, whose ``repr`` is kept, so the hash value doesn't change.
+	def __repr__(cls):
+		return "<class 'cotk.dataloader.multi_turn_dialog.SwitchboardCorpus._load_data.<locals>.Candidate'>"
+
+
+class _Candidate(Session, metaclass=_CandidateMeta):
+	"""Each candidate contains several sentences. These sentences won't be cut.
+	It's defined in the module, so that it can be pickled for the worker processes of loading."""
+	def cut(self, element, max_sent_length=None, max_turn_length=None):
+		# don\'t cut
+		return super().cut(element, None, None)
+
 
 class SwitchboardCorpus(MultiTurnDialog):
 	'''A dataloader for Switchboard dataset.
@@ -373,13 +491,18 @@ class SwitchboardCorpus(MultiTurnDialog):
 
 	@hooks.hook_dataloader
 	def __init__(self, file_id="resources://SwitchboardCorpus", min_vocab_times=5, \
-				max_sent_length=50, max_turn_length=1000, invalid_vocab_times=0):
+				max_sent_length=50, max_turn_length=1000, invalid_vocab_times=0, cache_dir=None, \
+				cpu_count=None, lazy=False, dedup=False):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
 		self._max_sent_length = max_sent_length
 		self._max_turn_length = max_turn_length
 		self._invalid_vocab_times = invalid_vocab_times
+		self._cache_dir = cache_dir
+		self._cpu_count = cpu_count
+		self._lazy = lazy
+		self._dedup = dedup
 
 		self.word2id = {}
 		super().__init__()
@@ -391,19 +514,17 @@ class SwitchboardCorpus(MultiTurnDialog):
 			self.key_name.append('multi_ref')
 		data_fields = {key: [['session', 'Session']] for key in self.key_name}
 
-		class Candidate(Session):
-			"""Each candidate contains several sentences. These sentences won't be cut."""
-			def cut(self, element, max_sent_length=None, max_turn_length=None):
-				# don\'t cut
-				return super().cut(element, None, None)
-
-		data_fields['multi_ref'].append(['candidate_allvocabs', Candidate()])
+		data_fields['multi_ref'].append(['candidate_allvocabs', _Candidate()])
 		return super()._general_load_data(self._file_path,
 										  data_fields,
 										  self._min_vocab_times,
 										  self._max_sent_length,
 										  self._max_turn_length,
-										  self._invalid_vocab_times)
+										  self._invalid_vocab_times,
+										  cache_dir=self._cache_dir,
+										  cpu_count=self._cpu_count,
+										  lazy=self._lazy,
+										  dedup=self._dedup)
 
 	def tokenize(self, sentence):
 		r'''Convert sentence(str) to list of token(str)
@@ -416,6 +537,17 @@ class SwitchboardCorpus(MultiTurnDialog):
 		'''
 		return super().tokenize(sentence, True, 'nltk')
 
+	def tokenize_batch(self, sentences):
+		r'''Convert a list of sentences(str) to lists of token(str)
+
+		Arguments:
+			sentences (list)
+
+		Returns:
+			(list): list of lists of token(str)
+		'''
+		return super().tokenize_batch(sentences, True, 'nltk')
+
 	def get_batch(self, key, indexes):
 		'''{LanguageProcessingBase.GET_BATCH_DOC_WITHOUT_RETURNS}
 
@@ -446,6 +578,12 @@ class SwitchboardCorpus(MultiTurnDialog):
 				res['candidate_allvocabs'].append(self.data[key]['candidate_allvocabs'][i])
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = super()._get_all_batch(key, index)
+		if "candidate_allvocabs" in self.data[key]:
+			res['candidate_allvocabs'] = [self.data[key]['candidate_allvocabs'][i] for i in index]
+		return res
+
 	def get_multi_ref_metric(self, generated_num_per_context=20, word2vec=None,\
 				multiple_gen_key="multiple_gen_key"):
 		'''Get metrics for multiple references.
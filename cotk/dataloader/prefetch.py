@@ -0,0 +1,89 @@
+'''
+A module for preparing batches in background, so that they are overlapped with model steps.
+'''
+import queue
+import threading
+
+_END = object()
+
+
+class PrefetchIterator:
+	r'''An iterator over ``func(*args)`` for ``args`` in ``tasks``, where the results are computed
+	in order by a background thread. At most ``size`` results are prepared ahead,
+	and they are handed over by a bounded queue.
+
+	The background thread stops when all tasks are done, or :meth:`close` is called (which is also
+	invoked when the iterator is used as a context manager). Exceptions raised by ``func``
+	or ``tasks`` are raised again by ``__next__``.
+
+	Arguments:
+		func (callable): the function computing results, e.g. :meth:`.LanguageProcessingBase.get_batch`.
+		tasks (Iterable): arguments of ``func``. Each element is a tuple. It's iterated in the
+			background thread, too.
+		size (int): the max number of results prepared ahead. Must be positive.
+	'''
+
+	def __init__(self, func, tasks, size):
+		if size <= 0:
+			raise ValueError("size should be positive.")
+		self._func = func
+		self._tasks = tasks
+		self._queue = queue.Queue(maxsize=size)
+		self._stop = threading.Event()
+		self._finished = False
+		self._thread = threading.Thread(target=self._work, daemon=True)
+		self._thread.start()
+
+	def _work(self):
+		try:
+			for args in self._tasks:
+				if self._stop.is_set():
+					return
+				self._put((True, self._func(*args)))
+			self._put(_END)
+		except BaseException as err: # pylint: disable=broad-except
+			self._put((False, err))
+
+	def _put(self, item):
+		# ``put`` with timeout, so that the thread can exit after `close` even if the queue is full
+		while not self._stop.is_set():
+			try:
+				self._queue.put(item, timeout=0.1)
+				return
+			except queue.Full:
+				pass
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		if self._finished:
+			raise StopIteration
+		item = self._queue.get()
+		if item is _END:
+			self.close()
+			raise StopIteration
+		succeed, value = item
+		if not succeed:
+			self.close()
+			raise value
+		return value
+
+	def close(self):
+		r'''Stop the background thread and discard prepared results.
+		'''
+		self._finished = True
+		self._stop.set()
+		if self._thread is not threading.current_thread():
+			self._thread.join()
+		while True:
+			try:
+				self._queue.get_nowait()
+			except queue.Empty:
+				break
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
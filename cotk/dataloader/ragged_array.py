@@ -0,0 +1,392 @@
+'''
+A module for compact storage of sentences and sessions.
+'''
+import os
+from itertools import chain
+
+import numpy as np
+
+
+def get_id_dtype(vocab_size):
+	r'''Get the smallest dtype which can store ids of a vocabulary.
+
+	Arguments:
+		vocab_size (int): the size of vocabulary.
+
+	Returns:
+		(:class:`numpy.dtype`): ``uint16`` if ``vocab_size <= 65536``, ``int32`` otherwise.
+	'''
+	if vocab_size <= np.iinfo(np.uint16).max + 1:
+		return np.dtype(np.uint16)
+	return np.dtype(np.int32)
+
+
+class RaggedArray:
+	r'''A read-only list of sentences (``depth=1``) or sessions (``depth=2``), where all the ids are
+	stored in a flat array, like the CSR format of sparse matrix.
+
+	Each element is returned as python lists, so it can be used like a list of lists.
+	For example, ``array[i]`` is a list of ids if ``depth=1``, or a list of sentences
+	if ``depth=2``.
+
+	Arguments:
+		values (:class:`numpy.ndarray`): ids of all sentences. Size: ``[token_num]``.
+		offsets (list): a list of ``depth`` arrays of ``int64``. ``offsets[-1]`` records where each sentence starts
+			in ``values``, and the last element of it is ``token_num``. If ``depth=2``, ``offsets[0]`` records
+			where each session starts in the sentences.
+		path (str): If the arrays are memory-mapped from files written by :meth:`save`, it's the path of files.
+			Default: ``None``.
+	'''
+
+	def __init__(self, values, offsets, path=None):
+		self.values = values
+		self.offsets = list(offsets)
+		self._path = path
+
+	@property
+	def depth(self):
+		'''int: ``1`` for sentences, ``2`` for sessions.'''
+		return len(self.offsets)
+
+	@property
+	def dtype(self):
+		''':class:`numpy.dtype`: dtype of ids.'''
+		return self.values.dtype
+
+	@classmethod
+	def from_list(cls, elements, depth=1, dtype=np.int32):
+		r'''Build a ragged array from a list of sentences or sessions.
+
+		Arguments:
+			elements (list): a list of sentences (``depth=1``) or sessions (``depth=2``).
+			depth (int): ``1`` or ``2``. Default: ``1``.
+			dtype (:class:`numpy.dtype`): dtype of ids. Default: ``int32``.
+		'''
+		offsets = []
+		for _ in range(depth):
+			lengths = np.fromiter(map(len, elements), dtype=np.int64, count=len(elements))
+			offsets.append(np.concatenate(([0], np.cumsum(lengths))))
+			elements = list(chain.from_iterable(elements))
+		values = np.fromiter(elements, dtype=dtype, count=len(elements))
+		return cls(values, offsets)
+
+	@classmethod
+	def load(cls, path, mmap_mode='r'):
+		r'''Load a ragged array saved by :meth:`save`.
+
+		Arguments:
+			path (str): the path of files without suffix.
+			mmap_mode (str): If not ``None``, arrays are memory-mapped, see :func:`numpy.load`.
+				Default: ``r``.
+		'''
+		values = np.load(path + '.values.npy', mmap_mode=mmap_mode)
+		offsets = []
+		depth = 0
+		while os.path.exists('%s.offsets%d.npy' % (path, depth)):
+			offsets.append(np.load('%s.offsets%d.npy' % (path, depth), mmap_mode=mmap_mode))
+			depth += 1
+		return cls(values, offsets, path if mmap_mode is not None else None)
+
+	def save(self, path):
+		r'''Save the arrays to files, which can be loaded by :meth:`load`.
+
+		Arguments:
+			path (str): the path of files without suffix.
+		'''
+		np.save(path + '.values.npy', self.values)
+		for depth, offsets in enumerate(self.offsets):
+			np.save('%s.offsets%d.npy' % (path, depth), offsets)
+
+	def __getstate__(self):
+		if self._path is not None:
+			return {'path': self._path}
+		return {'values': self.values, 'offsets': self.offsets}
+
+	def __setstate__(self, state):
+		if 'path' in state:
+			self.__dict__.update(RaggedArray.load(state['path']).__dict__)
+		else:
+			self.__init__(state['values'], state['offsets'])
+
+	def __len__(self):
+		return len(self.offsets[0]) - 1
+
+	def _get_sentences(self, start, end):
+		offsets = self.offsets[-1][start:end + 1]
+		values = self.values[offsets[0]:offsets[-1]].tolist()
+		offsets = (offsets - offsets[0]).tolist()
+		return [values[offsets[i]:offsets[i + 1]] for i in range(end - start)]
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("RaggedArray index out of range")
+		if self.depth == 1:
+			return self.values[self.offsets[0][index]:self.offsets[0][index + 1]].tolist()
+		return self._get_sentences(int(self.offsets[0][index]), int(self.offsets[0][index + 1]))
+
+	def __iter__(self):
+		if self.depth == 1:
+			yield from self._get_sentences(0, len(self))
+		else:
+			sentences = self._get_sentences(0, int(self.offsets[0][-1]))
+			offsets = self.offsets[0].tolist()
+			for i in range(len(self)):
+				yield sentences[offsets[i]:offsets[i + 1]]
+
+	def tolist(self):
+		'''Convert to a list of sentences or sessions.'''
+		return list(self)
+
+	def take(self, indexes):
+		r'''Get elements of ``indexes`` as a new ragged array in memory, without converting
+		them to lists.
+
+		Arguments:
+			indexes (list): indexes of elements.
+
+		Returns:
+			(:class:`RaggedArray`): the elements of ``indexes``.
+		'''
+		indexes = _normalize_indexes(indexes, len(self))
+		offsets = []
+		for level_offsets in self.offsets:
+			starts = level_offsets[indexes]
+			lengths = level_offsets[indexes + 1] - starts
+			offsets.append(np.concatenate(([0], np.cumsum(lengths))))
+			indexes = _ranges(starts, lengths)
+		return RaggedArray(self.values[indexes], offsets)
+
+	def split(self):
+		r'''Split ``values`` into a list of arrays, one for each sentence. Only for ``depth=1``.
+		The arrays are views of ``values``, so no ids are copied.
+
+		Returns:
+			(list): a list of 1-d :class:`numpy.ndarray`.
+		'''
+		if self.depth != 1:
+			raise ValueError("split only supports depth=1.")
+		offsets = self.offsets[0].tolist()
+		return [self.values[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+
+	def pad_each(self):
+		r'''Pad each session into a 2-d array with ``0``, whose size is
+		``[turn_length, max(sent_length)]`` of the session. Only for ``depth=2``.
+
+		Returns:
+			(list): a list of 2-d :class:`numpy.ndarray`, which are views of a flat array.
+		'''
+		if self.depth != 2:
+			raise ValueError("pad_each only supports depth=2.")
+		session_offsets, sent_offsets = self.offsets
+		turn_length = np.diff(session_offsets)
+		sent_length = np.diff(sent_offsets)
+		max_sent_length = np.zeros(len(self), dtype=np.int64)
+		has_turn = turn_length > 0
+		max_sent_length[has_turn] = np.maximum.reduceat(sent_length, session_offsets[:-1][has_turn]) \
+			if len(sent_length) else 0
+		# each sentence is a row of width ``max_sent_length`` of its session in the flat array
+		row_width = np.repeat(max_sent_length, turn_length)
+		row_starts = np.concatenate(([0], np.cumsum(row_width)))
+		res = np.zeros(row_starts[-1], dtype=self.values.dtype)
+		res[_ranges(row_starts[:-1], sent_length)] = self.values
+		cells = np.concatenate(([0], np.cumsum(turn_length * max_sent_length))).tolist()
+		return [res[cells[i]:cells[i + 1]].reshape(turn, width) \
+			for i, (turn, width) in enumerate(zip(turn_length.tolist(), max_sent_length.tolist()))]
+
+	def get_lengths(self, indexes=None):
+		r'''Get the lengths of elements, i.e. the number of ids in sentences, or the number of
+		sentences in sessions.
+
+		Arguments:
+			indexes (list): indexes of elements. Default: if ``None``, all elements are used.
+
+		Returns:
+			(:class:`numpy.ndarray`): lengths of elements.
+		'''
+		lengths = np.diff(self.offsets[0])
+		if indexes is None:
+			return lengths
+		return lengths[np.asarray(indexes, dtype=np.int64)]
+
+	def __eq__(self, other):
+		if isinstance(other, RaggedArray):
+			return self.depth == other.depth and \
+				all(np.array_equal(a, b) for a, b in zip(self.offsets, other.offsets)) and \
+				np.array_equal(self.values, other.values)
+		if isinstance(other, list):
+			return self.tolist() == other
+		return NotImplemented
+
+	def __ne__(self, other):
+		res = self.__eq__(other)
+		if res is NotImplemented:
+			return res
+		return not res
+
+	__hash__ = None
+
+	def __repr__(self):
+		return "RaggedArray(%d elements, depth=%d, dtype=%s)" % (len(self), self.depth, self.dtype)
+
+
+class RaggedArrayWriter:
+	r'''Write sentences to disk sequentially, which can be memory-mapped by :meth:`RaggedArray.load`.
+	Only sentences (``depth=1``) are supported.
+
+	Arguments:
+		path (str): the path of files without suffix.
+		dtype (:class:`numpy.dtype`): dtype of ids. Default: ``int32``.
+	'''
+
+	def __init__(self, path, dtype=np.int32):
+		self._path = path
+		self._dtype = np.dtype(dtype)
+		self._values_file = open(path + '.values.tmp', 'wb')
+		self._offsets_file = open(path + '.offsets0.tmp', 'wb')
+		self._end = 0
+		self._size = 0
+		self._offsets_file.write(np.zeros(1, dtype=np.int64).tobytes())
+
+	def extend(self, sentences):
+		r'''Append sentences to the end of file.
+
+		Arguments:
+			sentences (list): a list of sentences, where each sentence is a list of ids.
+		'''
+		lengths = np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences))
+		total = int(lengths.sum())
+		values = np.fromiter(chain.from_iterable(sentences), dtype=self._dtype, count=total)
+		self._values_file.write(values.tobytes())
+		self._offsets_file.write((self._end + np.cumsum(lengths)).tobytes())
+		self._end += total
+		self._size += len(sentences)
+
+	def close(self):
+		r'''Close the files and convert them to ``.npy`` format.
+
+		Returns:
+			(:class:`RaggedArray`): the written sentences, which are memory-mapped.
+		'''
+		self._values_file.close()
+		self._offsets_file.close()
+		for name, dtype, size in (('values', self._dtype, self._end), ('offsets0', np.int64, self._size + 1)):
+			_raw_to_npy(self._path + '.' + name + '.tmp', self._path + '.' + name + '.npy', dtype, size)
+		return RaggedArray.load(self._path)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self._values_file.close()
+		self._offsets_file.close()
+
+
+def _raw_to_npy(raw_path, npy_path, dtype, size):
+	'''Convert a file of raw array data to ``.npy`` format without loading it into memory.'''
+	array = np.lib.format.open_memmap(npy_path, mode='w+', dtype=dtype, shape=(size, ))
+	if size:
+		chunk_size = 1 << 24
+		with open(raw_path, 'rb') as raw_file:
+			for start in range(0, size, chunk_size):
+				chunk = np.frombuffer(raw_file.read(min(chunk_size, size - start) * array.itemsize), dtype=dtype)
+				array[start:start + len(chunk)] = chunk
+	array.flush()
+	del array
+	os.remove(raw_path)
+
+
+def _ranges(starts, lengths):
+	'''Concatenate ``range(starts[i], starts[i] + lengths[i])`` for all ``i``.'''
+	ends = np.cumsum(lengths)
+	total = int(ends[-1]) if len(ends) else 0
+	# int32 halves the temporary memory, which is as large as the number of ids
+	dtype = np.int32 if len(starts) and max(total, int(np.max(starts + lengths))) < 2 ** 31 else np.int64
+	res = np.repeat((starts - ends + lengths).astype(dtype), lengths)
+	res += np.arange(total, dtype=dtype)
+	return res
+
+def _normalize_indexes(indexes, size):
+	indexes = np.asarray(indexes, dtype=np.int64).reshape(-1)
+	return np.where(indexes < 0, indexes + size, indexes)
+
+def _pad_flat(values, starts, lengths, dtype):
+	'''Gather ``values[starts[i]:starts[i]+lengths[i]]`` into the i-th row of a padded 2-d array.'''
+	res = np.zeros((len(lengths), np.max(lengths)), dtype=dtype)
+	columns = np.arange(res.shape[1])
+	mask = columns < lengths[:, None]
+	res[mask] = values[(starts[:, None] + columns)[mask]]
+	return res
+
+def _pad_lists(rows, dtype):
+	'''Pad a list of lists of ids into a 2-d array.'''
+	lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+	res = np.zeros((len(rows), np.max(lengths)), dtype=dtype)
+	res[np.arange(res.shape[1]) < lengths[:, None]] = \
+		np.fromiter(chain.from_iterable(rows), dtype=dtype, count=int(lengths.sum()))
+	return res, lengths
+
+def pad_sentences(sentences, indexes, dtype=int, length_dtype=int):
+	r'''Get sentences of ``indexes`` and pad them into a 2-d array with ``0``.
+	If ``sentences`` is a :class:`RaggedArray`, ids are gathered from the flat array directly.
+
+	Arguments:
+		sentences (:class:`RaggedArray`, list): a list of sentences.
+		indexes (list): indexes of sentences in the batch.
+		dtype (:class:`numpy.dtype`): dtype of the returned array. Default: ``int``.
+		length_dtype (:class:`numpy.dtype`): dtype of the returned lengths. Default: ``int``.
+
+	Returns:
+		(tuple): containing:
+
+		* **padded** (:class:`numpy.ndarray`): Size: ``[batch_size, max(length)]``
+		* **length** (:class:`numpy.ndarray`): the length of each sentence. Size: ``[batch_size]``
+	'''
+	if isinstance(sentences, RaggedArray) and sentences.depth == 1:
+		indexes = _normalize_indexes(indexes, len(sentences))
+		offsets = sentences.offsets[0]
+		starts = offsets[indexes]
+		lengths = offsets[indexes + 1] - starts
+		return _pad_flat(sentences.values, starts, lengths, dtype), lengths.astype(length_dtype)
+	padded, lengths = _pad_lists([sentences[i] for i in indexes], dtype)
+	return padded, lengths.astype(length_dtype)
+
+def pad_sessions(sessions, indexes, dtype=int, length_dtype=int):
+	r'''Get sessions of ``indexes`` and pad them into a 3-d array with ``0``.
+	If ``sessions`` is a :class:`RaggedArray`, ids are gathered from the flat array directly.
+
+	Arguments:
+		sessions (:class:`RaggedArray`, list): a list of sessions.
+		indexes (list): indexes of sessions in the batch.
+		dtype (:class:`numpy.dtype`): dtype of the returned array. Default: ``int``.
+		length_dtype (:class:`numpy.dtype`): dtype of the returned lengths. Default: ``int``.
+
+	Returns:
+		(tuple): containing:
+
+		* **padded** (:class:`numpy.ndarray`): Size: ``[batch_size, max(turn_length), max(sent_length)]``
+		* **turn_length** (:class:`numpy.ndarray`): the number of sentences in each session. Size: ``[batch_size]``
+		* **sent_length** (list): a list of 1-d arrays, the length of sentences in each session.
+	'''
+	if isinstance(sessions, RaggedArray) and sessions.depth == 2:
+		indexes = _normalize_indexes(indexes, len(sessions))
+		session_offsets, sent_offsets = sessions.offsets
+		starts = session_offsets[indexes]
+		turn_lengths = session_offsets[indexes + 1] - starts
+		turn_mask = np.arange(np.max(turn_lengths)) < turn_lengths[:, None]
+		sent_indexes = (starts[:, None] + np.arange(turn_mask.shape[1]))[turn_mask]
+		sent_starts = sent_offsets[sent_indexes]
+		sent_lengths = sent_offsets[sent_indexes + 1] - sent_starts
+		sents = _pad_flat(sessions.values, sent_starts, sent_lengths, dtype)
+	else:
+		rows = [sessions[i] for i in indexes]
+		turn_lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+		turn_mask = np.arange(np.max(turn_lengths)) < turn_lengths[:, None]
+		sents, sent_lengths = _pad_lists(list(chain.from_iterable(rows)), dtype)
+	res = np.zeros((len(turn_lengths), turn_mask.shape[1], sents.shape[1]), dtype=dtype)
+	res[turn_mask] = sents
+	sent_lengths = np.split(sent_lengths.astype(length_dtype), np.cumsum(turn_lengths)[:-1])
+	return res, turn_lengths.astype(length_dtype), sent_lengths
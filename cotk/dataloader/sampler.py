@@ -0,0 +1,291 @@
+'''
+A module for ordering samples by their lengths, which reduces padding in batches.
+'''
+import numpy as np
+
+from .ragged_array import RaggedArray
+
+
+def sentence_lengths(sentences):
+	r'''Get the length of each sentence.
+
+	Arguments:
+		sentences (:class:`.RaggedArray`, list): a list of sentences.
+
+	Returns:
+		(:class:`numpy.ndarray`): the number of ids in each sentence.
+	'''
+	if isinstance(sentences, RaggedArray):
+		return sentences.get_lengths().astype(np.int64)
+	return np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences))
+
+def session_lengths(sessions):
+	r'''Get the turn length, the max sentence length and the number of ids of each session.
+
+	Arguments:
+		sessions (:class:`.RaggedArray`, list): a list of sessions.
+
+	Returns:
+		(tuple): containing:
+
+		* **turn_length** (:class:`numpy.ndarray`): the number of sentences in each session.
+		* **max_sent_length** (:class:`numpy.ndarray`): the length of the longest sentence in each session.
+		* **tokens** (:class:`numpy.ndarray`): the number of ids in each session.
+	'''
+	if isinstance(sessions, RaggedArray):
+		session_offsets, sent_offsets = sessions.offsets
+		turn_length = np.diff(session_offsets).astype(np.int64)
+		sent_length = np.append(np.diff(sent_offsets), 0).astype(np.int64)
+		max_sent_length = np.maximum.reduceat(sent_length, session_offsets[:-1]) \
+			if len(sessions) else np.zeros(0, dtype=np.int64)
+		max_sent_length[turn_length == 0] = 0
+		tokens = np.diff(sent_offsets[session_offsets]).astype(np.int64)
+		return turn_length, max_sent_length, tokens
+	turn_length = np.array([len(session) for session in sessions], dtype=np.int64)
+	max_sent_length = np.array([max(map(len, session), default=0) for session in sessions], dtype=np.int64)
+	tokens = np.array([sum(map(len, session)) for session in sessions], dtype=np.int64)
+	return turn_length, max_sent_length, tokens
+
+def sort_by_length(keys, bucket_size=None):
+	r'''Sort samples by their lengths. Samples with same lengths keep their original order.
+
+	Arguments:
+		keys (list): a list of 1-d arrays, the lengths of samples. The first array is the primary key,
+			the second array breaks ties of the first one, and so on.
+		bucket_size (int): if not ``None``, samples are split into buckets of ``bucket_size``
+			consecutive samples, and only sorted in each bucket. Default: ``None``.
+
+	Returns:
+		(:class:`numpy.ndarray`): the sorted indexes.
+	'''
+	keys = list(reversed(keys))
+	if bucket_size is not None:
+		keys.append(np.arange(len(keys[0])) // bucket_size)
+	return np.lexsort(keys)
+
+def bucket_by_length(keys, batch_size, bucket_size, rng):
+	r'''Shuffle samples, while samples in the same batch have similar lengths.
+	Samples are shuffled and split into buckets of ``bucket_size``, then samples are sorted by
+	:func:`sort_by_length` in each bucket and cut into batches. At last, batches of all buckets
+	are shuffled. The last incomplete batch (if exists) is always placed at the end.
+
+	Arguments:
+		keys (list): a list of 1-d arrays, the lengths of samples. See :func:`sort_by_length`.
+		batch_size (int): the number of samples in a batch.
+		bucket_size (int): the number of samples in a bucket. It is rounded down to a multiple
+			of ``batch_size`` (at least ``batch_size``). Larger buckets produce less padding
+			but batches are less random.
+		rng (:class:`numpy.random.RandomState`): the random generator.
+
+	Returns:
+		(:class:`numpy.ndarray`): the shuffled indexes.
+	'''
+	size = len(keys[0])
+	permutation = rng.permutation(size)
+	bucket_size = max(bucket_size // batch_size, 1) * batch_size
+	bucket_id = np.arange(size) // bucket_size
+	order = permutation[np.lexsort([key[permutation] for key in reversed(keys)] + [bucket_id])]
+
+	batch_num = size // batch_size
+	batches = order[:batch_num * batch_size].reshape(batch_num, batch_size)
+	batches = batches[rng.permutation(batch_num)]
+	return np.concatenate([batches.reshape(-1), order[batch_num * batch_size:]])
+
+def batch_by_tokens(shapes, index, max_tokens, max_batch_size=None):
+	r'''Split samples into batches, where the padded size of each batch is at most ``max_tokens``.
+	Samples are packed into batches greedily in the order of ``index``, so sorting samples
+	by :func:`sort_by_length` first makes batches larger and reduces padding.
+
+	The end of the greedy batch starting at every sample is found at once by binary lifting over
+	sparse tables of the max shapes, then the batches are picked by pointer jumping from the first sample.
+	It takes ``O(N log W)`` time and memory, where ``N`` is the number of samples and ``W`` is the max number
+	of samples in a batch, i.e., ``min(N, max_tokens, max_batch_size)``.
+
+	Arguments:
+		shapes (list): a list of 2-d arrays, the shapes of samples in each padded array.
+			See :func:`padding_ratio`.
+		index (list): the order of samples.
+		max_tokens (int): the max number of ids (including paddings) of all padded arrays in a batch.
+			A sample exceeding ``max_tokens`` forms a batch alone.
+		max_batch_size (int): the max number of samples in a batch. Default: if ``None``, no limit.
+
+	Returns:
+		(:class:`numpy.ndarray`): ``offsets``, where the ``i``-th batch is
+		``index[offsets[i]:offsets[i+1]]``.
+	'''
+	if max_tokens <= 0:
+		raise ValueError("max_tokens should be positive.")
+	index = np.fromiter(index, dtype=np.int64)
+	size = len(index)
+	if not size:
+		return np.zeros(1, dtype=np.int64)
+	shapes = [shape[index] for shape in shapes]
+	window = min(size if max_batch_size is None else max_batch_size, max_tokens, size)
+
+	# ``tables[k][j][i]`` is the max shape in the ``j``-th array of samples ``i`` to ``i + 2 ** k - 1``
+	tables = [shapes]
+	while 2 ** len(tables) < window:
+		step = 2 ** (len(tables) - 1)
+		tables.append([np.maximum(shape[:-step], shape[step:]) for shape in tables[-1]])
+
+	# ``ends[i]`` is the end of the batch starting at sample ``i``, which is extended by ``2 ** k`` samples
+	# if the padded size is still in the budget. The padded size is non-decreasing with the end.
+	starts = np.arange(size)
+	ends = starts + 1
+	limits = np.minimum(starts + window, size)
+	batch_shapes = shapes
+	for level in reversed(tables):
+		step = len(shapes[0]) - len(level[0]) + 1
+		new_ends = ends + step
+		valid = new_ends <= limits
+		pos = np.minimum(ends, len(level[0]) - 1)
+		new_shapes = [np.maximum(batch_shape, table[pos]) for batch_shape, table in zip(batch_shapes, level)]
+		cost = (new_ends - starts) * sum(np.prod(new_shape, axis=1) for new_shape in new_shapes)
+		accept = valid & (cost <= max_tokens)
+		ends = np.where(accept, new_ends, ends)
+		batch_shapes = [np.where(accept[:, None], new_shape, batch_shape) \
+			for batch_shape, new_shape in zip(batch_shapes, new_shapes)]
+
+	# the batches are the path from sample 0 to the end, where a node ``i`` points to ``ends[i]``.
+	# After ``k`` rounds, ``on_path`` marks the first ``2 ** k`` nodes of the path, and ``jump[i]`` is
+	# the node ``2 ** k`` steps after ``i``.
+	jump = np.append(ends, size)
+	on_path = np.zeros(size + 1, dtype=bool)
+	on_path[0] = True
+	reached = 1
+	while reached <= size:
+		on_path[jump[on_path]] = True
+		jump = jump[jump]
+		reached *= 2
+	return np.flatnonzero(on_path).astype(np.int64)
+
+def _take_batches(index, offsets, batch_ids):
+	# concatenate the batches ``batch_ids`` without iterating over batches
+	sizes = np.diff(offsets)[batch_ids]
+	new_offsets = np.append(0, np.cumsum(sizes)).astype(np.int64)
+	positions = np.repeat(offsets[:-1][batch_ids] - new_offsets[:-1], sizes) + np.arange(new_offsets[-1])
+	return index[positions], new_offsets
+
+def shuffle_batches(index, offsets, rng):
+	r'''Shuffle the order of batches, while samples in each batch are not changed.
+
+	Arguments:
+		index (list): the order of samples.
+		offsets (:class:`numpy.ndarray`): the offsets of batches, see :func:`batch_by_tokens`.
+		rng (:class:`numpy.random.RandomState`): the random generator.
+
+	Returns:
+		(tuple): the shuffled ``index`` and ``offsets``.
+	'''
+	index = np.fromiter(index, dtype=np.int64)
+	offsets = np.asarray(offsets, dtype=np.int64)
+	batch_ids = rng.permutation(len(offsets) - 1)
+	if not len(batch_ids):
+		return index, offsets
+	return _take_batches(index, offsets, batch_ids)
+
+def shard_index(index, rank, world_size, batch_size, pad=True):
+	r'''Get the shard of samples for a process in data-parallel training.
+	``index`` is split into groups of ``batch_size * world_size`` samples, which are the samples of
+	a step in all processes, and each group is split evenly into processes. So that if ``index`` is
+	ordered by :func:`bucket_by_length` with ``batch_size * world_size``, batches in all processes
+	at a step have similar lengths.
+
+	Arguments:
+		index (list): the order of samples, which must be the same in all processes.
+		rank (int): the rank of the process.
+		world_size (int): the number of processes.
+		batch_size (int): the number of samples in a batch of a process.
+		pad (bool): if ``len(index)`` is not divisible by ``world_size``, whether to repeat samples
+			from the beginning of ``index``, or drop the left samples. Default: ``True``.
+
+	Returns:
+		(:class:`numpy.ndarray`): the shard of ``index``. Shards of all processes have the same size.
+	'''
+	index = np.fromiter(index, dtype=np.int64)
+	if pad:
+		size = -(-len(index) // world_size) * world_size
+		index = index[np.arange(size) % max(len(index), 1)]
+	else:
+		index = index[:len(index) // world_size * world_size]
+	group_size = batch_size * world_size
+	group_num = len(index) // group_size
+	head = index[:group_num * group_size].reshape(group_num, world_size, batch_size)[:, rank]
+	tail = index[group_num * group_size:]
+	tail_size = len(tail) // world_size
+	return np.concatenate([head.reshape(-1), tail[rank * tail_size:(rank + 1) * tail_size]])
+
+def shard_batches(index, offsets, rank, world_size, pad=True):
+	r'''Get the shard of batches for a process in data-parallel training,
+	where the ``i``-th batch is assigned to the process ``i % world_size``.
+
+	Arguments:
+		index (list): the order of samples, which must be the same in all processes.
+		offsets (:class:`numpy.ndarray`): the offsets of batches, see :func:`batch_by_tokens`.
+		rank (int): the rank of the process.
+		world_size (int): the number of processes.
+		pad (bool): if the number of batches is not divisible by ``world_size``, whether to repeat
+			batches from the beginning, or drop the left batches. Default: ``True``.
+
+	Returns:
+		(tuple): the ``index`` and ``offsets`` of the shard. Shards of all processes have the same
+		number of batches.
+	'''
+	index = np.fromiter(index, dtype=np.int64)
+	batch_num = len(offsets) - 1
+	if pad:
+		total = -(-batch_num // world_size) * world_size
+	else:
+		total = batch_num // world_size * world_size
+	batch_ids = np.arange(rank, total, world_size) % max(batch_num, 1)
+	if not len(batch_ids):
+		return index[:0], np.zeros(1, dtype=np.int64)
+	return _take_batches(index, np.asarray(offsets, dtype=np.int64), batch_ids)
+
+def restore_index(index):
+	r'''Get the permutation restoring the original order of samples.
+
+	Arguments:
+		index (list): the order of samples, like ``dataloader.index[key]``.
+
+	Returns:
+		(:class:`numpy.ndarray`): ``restore``, where ``[outputs[i] for i in restore]`` is in the original
+		order if ``outputs[j]`` is the output of sample ``index[j]``.
+	'''
+	return np.argsort(np.fromiter(index, dtype=np.int64), kind='stable')
+
+def padding_ratio(shapes, tokens, index, batch_size, ignore_left_samples=False):
+	r'''Compute the ratio of padding in batches.
+
+	Arguments:
+		shapes (list): a list of 2-d arrays, one for each padded array in batches.
+			``shapes[k][i]`` is the shape of sample ``i`` in the ``k``-th padded array (without
+			the batch dimension), for example, ``[sent_length]`` or ``[turn_length, max_sent_length]``.
+		tokens (:class:`numpy.ndarray`): the number of ids of each sample in all padded arrays.
+		index (list): the order of samples.
+		batch_size (int, :class:`numpy.ndarray`): the number of samples in a batch, or the offsets
+			of batches with different sizes (see :func:`batch_by_tokens`).
+		ignore_left_samples (bool): whether the last incomplete batch is ignored.
+			It's only used when ``batch_size`` is an int. Default: ``False``.
+
+	Returns:
+		(float): the ratio of padding ids to all ids in batches.
+	'''
+	index = np.fromiter(index, dtype=np.int64)
+	if isinstance(batch_size, np.ndarray):
+		starts = batch_size[:-1]
+		index = index[:batch_size[-1]]
+	else:
+		if ignore_left_samples:
+			index = index[:len(index) // batch_size * batch_size]
+		starts = np.arange(0, len(index), batch_size)
+	if not len(index):
+		return 0.
+	batch_lengths = np.diff(np.append(starts, len(index)))
+	padded = 0
+	for shape in shapes:
+		batch_shape = np.maximum.reduceat(shape[index], starts, axis=0)
+		padded += int(np.sum(np.prod(batch_shape, axis=1) * batch_lengths))
+	if not padded:
+		return 0.
+	return 1 - int(np.sum(tokens[index])) / padded
@@ -10,6 +10,8 @@ import numpy as np
 from .._utils.file_utils import get_resource_file_path
 from .._utils import hooks
 from .dataloader import LanguageProcessingBase
+from .ragged_array import pad_sentences
+from .sampler import sentence_lengths
 from ..metric import MetricChain, AccuracyMetric
 
 
@@ -71,21 +73,26 @@ class SentenceClassification(LanguageProcessingBase):
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
 		res = {}
-		batch_size = len(indexes)
-		res["sent_length"] = np.array( \
-			list(map(lambda i: len(self.data[key]['sent'][i]), indexes)), dtype=int)
-		res_sent = res["sent"] = np.zeros( \
-			(batch_size, np.max(res["sent_length"])), dtype=int)
-		res["label"] = np.zeros(batch_size, dtype=int)
-		for i, j in enumerate(indexes):
-			sentence = self.data[key]['sent'][j]
-			res["sent"][i, :len(sentence)] = sentence
-			res["label"][i] = self.data[key]['label'][j]
+		res_sent, res["sent_length"] = pad_sentences(self.data[key]['sent'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["sent"] = res_sent
+		res["label"] = np.array([self.data[key]['label'][j] for j in indexes], dtype=int)
 
 		res["sent_allvocabs"] = res_sent.copy()
 		res_sent[res_sent >= self.valid_vocab_len] = self.unk_id
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = {}
+		res["sent"], res["sent_allvocabs"] = self._take_ids(key, 'sent', index)
+		res["sent_length"] = res["sent"].get_lengths().astype(self.length_dtype)
+		res["label"] = np.asarray(self.data[key]['label'], dtype=int)[index]
+		return res
+
+	def _get_padding_shapes(self, key):
+		sent_length = sentence_lengths(self.data[key]['sent'])
+		return [sent_length[:, None]], sent_length
+
 	def get_metric(self, prediction_key="prediction"):
 		'''Get metrics for accuracy. In other words, this function
 		provides metrics for sentence classification task.
@@ -123,6 +130,13 @@ class SST(SentenceClassification):
 					not less than `invalid_vocab_times` in the **whole dataset** (except valid words) will be
 					marked as invalid words. Otherwise, they are unknown words, both in training or
 					testing stages. Default: 0 (No unknown words).
+			cache_dir (str): A directory for caching the preprocessed dataset. The second construction
+					with the same arguments loads the cache instead of processing the raw files.
+					If ``None``, cache is disabled. Default: ``None``.
+			cpu_count (int): Number of used cpu for tokenizing the dataset. Multiprocessing
+					will **NOT** be used when ``cpu_count`` is set to ``1`` or the dataset is small.
+					Default: If ``None``, the environment variable ``CPU_COUNT`` will be used
+					when available, or all available cpu will be used otherwise.
 
 	Refer to :class:`.SentenceClassification` for attributes and methods.
 
@@ -135,12 +149,14 @@ class SST(SentenceClassification):
 
 	@hooks.hook_dataloader
 	def __init__(self, file_id, min_vocab_times=10, \
-				 max_sent_length=50, invalid_vocab_times=0):
+				 max_sent_length=50, invalid_vocab_times=0, cache_dir=None, cpu_count=None):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
 		self._max_sent_length = max_sent_length
 		self._invalid_vocab_times = invalid_vocab_times
+		self._cache_dir = cache_dir
+		self._cpu_count = cpu_count
 		super(SST, self).__init__()
 
 	def _load_data(self):
@@ -152,7 +168,9 @@ class SST(SentenceClassification):
 									self._min_vocab_times,
 									self._max_sent_length,
 									None,
-									self._invalid_vocab_times)
+									self._invalid_vocab_times,
+									cache_dir=self._cache_dir,
+									cpu_count=self._cpu_count)
 		for key in self.key_name:
 			with open(os.path.join(self._file_path, key + '_labels.json'), 'r', encoding='utf-8') as fp:
 				data[key]['label'] = json.load(fp)
@@ -169,3 +187,14 @@ class SST(SentenceClassification):
 		'''
 		# return [x.split(' ')[-1].lower() for x in sentence if x != '']
 		return super().tokenize(sentence, True, 'space')
+
+	def tokenize_batch(self, sentences):
+		r'''Convert a list of sentences(str) to lists of token(str)
+
+		Arguments:
+			sentences (list)
+
+		Returns:
+			(list): list of lists of token(str)
+		'''
+		return super().tokenize_batch(sentences, True, 'space')
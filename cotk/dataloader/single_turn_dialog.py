@@ -4,17 +4,19 @@ A module for single turn dialog.
 import os
 import time
 from collections import Counter
-from itertools import chain
+from itertools import chain, islice
 import multiprocessing
 from multiprocessing import Pool
-import tqdm
 
 import numpy as np
 
-from nltk.tokenize import WordPunctTokenizer
 from .._utils.file_utils import get_resource_file_path
+from .._utils.data_cache import get_cache_key, get_files_sha256, load_cache, save_cache
 from .._utils import hooks
-from .dataloader import LanguageProcessingBase
+from .dataloader import LanguageProcessingBase, _iter_chunks, _imap_bounded
+from .ragged_array import RaggedArray, pad_sentences, get_id_dtype
+from .vocab import VocabBuilder, Vocab
+from .sampler import sentence_lengths
 from .bert_dataloader import BERTLanguageProcessingBase
 from ..metric import MetricChain, PerplexityMetric, BleuCorpusMetric, SingleTurnDialogRecorder
 
@@ -43,9 +45,30 @@ class SingleTurnDialog(LanguageProcessingBase):
 				not less than ``invalid_vocab_times`` in the **whole dataset** (except valid words) will be
 				marked as invalid words. Otherwise, they are unknown words, which are ignored both for
 				model or metrics. {INVALID_VOCAB_TIMES_DEFAULT}
-			tokenizer (str): How to tokenize sentence. ``nltk.tokenize.WordPunctTokenizer`` is used if ``nltk`` is specified,
-				python built-in ``str.split`` is used if ``space`` is specified. {TOKENIZER_DEFAULT}
+			tokenizer (str): How to tokenize sentence. The results are the same as ``nltk.tokenize.WordPunctTokenizer``
+				if ``nltk`` is specified, and python built-in ``str.split`` if ``space`` is specified. Other tokenizers
+				can be registered by :func:`.tokenizer.register_tokenizer`. {TOKENIZER_DEFAULT}
 			remains_capital(bool): Whether remaining capital letter in data or converting them to lower case. {REMAINS_CAPITAL_DEFAULT}
+			cache_dir (str): A directory for caching the preprocessed dataset. The second construction
+				with the same arguments loads the cache instead of processing the raw files.
+				If ``None``, cache is disabled. Default: ``None``.
+			cpu_count (int): Number of used cpu for tokenizing the dataset. Multiprocessing
+				will **NOT** be used when ``cpu_count`` is set to ``1`` or the dataset is small.
+				Default: If ``None``, the environment variable ``CPU_COUNT`` will be used
+				when available, or all available cpu will be used otherwise.
+			streaming (bool): Whether to load the dataset in streaming mode, where sentences are stored
+				on disk instead of memory and read almost sequentially when getting batches.
+				It's useful for datasets which don't fit in memory. Default: ``False``.
+			shuffle_buffer_size (int): In streaming mode, data are shuffled by a buffer with size of
+				``shuffle_buffer_size`` when calling :meth:`restart`. The memory for shuffling is bounded
+				by it. Larger buffer makes the order more random. Default: ``10000``.
+			lazy (bool): Whether to convert each split (e.g. ``test``) to ids only when it's used for the
+				first time, which saves time and memory if some splits are never used. The vocabulary is the
+				same as the one built without ``lazy``. Default: ``False``.
+			dedup (bool, int): Whether to tokenize each distinct sentence only once, which saves the time of
+				tokenizing if the dataset contains many repeated sentences. Identical sentences share their tokens
+				while loading, but not the loaded ids. If it's an integer, at most ``dedup`` distinct sentences are
+				remembered at a time. The dataset is the same as the one loaded without ``dedup``. Default: ``False``.
 		'''
 	FILE_ID_DEFAULT = ''
 	VALID_VOCAB_TIMES_DEFAULT = ''
@@ -60,7 +83,8 @@ class SingleTurnDialog(LanguageProcessingBase):
 	def __init__(self, file_id, min_vocab_times, \
 			max_sent_length, invalid_vocab_times, \
 			tokenizer, remains_capital, \
-			):
+			cache_dir=None, cpu_count=None, \
+			streaming=False, shuffle_buffer_size=10000, lazy=False, dedup=False):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
@@ -68,6 +92,12 @@ class SingleTurnDialog(LanguageProcessingBase):
 		self._invalid_vocab_times = invalid_vocab_times
 		self._tokenizer = tokenizer
 		self._remains_capital = remains_capital
+		self._cache_dir = cache_dir
+		self._cpu_count = cpu_count
+		self._streaming = streaming
+		self._shuffle_buffer_size = shuffle_buffer_size if streaming else None
+		self._lazy = lazy
+		self._dedup = dedup
 		super().__init__()
 
 	def tokenize(self, sentence, remains_capital=None, tokenizer=None):
@@ -82,11 +112,26 @@ class SingleTurnDialog(LanguageProcessingBase):
 		return super().tokenize(sentence, remains_capital or self._remains_capital, \
 			tokenizer or self._tokenizer)
 
+	def tokenize_batch(self, sentences, remains_capital=None, tokenizer=None):
+		r'''Convert a list of sentences(str) to lists of tokens(str)
+
+		Arguments:
+			sentences (list): a list of strings to be tokenized
+
+		Returns:
+			list: a list of lists of tokens(str)
+		'''
+		return super().tokenize_batch(sentences, remains_capital or self._remains_capital, \
+			tokenizer or self._tokenizer)
+
 	def _load_data(self):
 		r'''Loading dataset, invoked during the initialization of :class:`LanguageProcessingBase`.
 		'''
 		return super()._general_load_data(self._file_path, [['post', 'Sentence'], ['resp', 'Sentence']], \
-			self._min_vocab_times, self._max_sent_length, None, self._invalid_vocab_times)
+			self._min_vocab_times, self._max_sent_length, None, self._invalid_vocab_times, \
+			cache_dir=self._cache_dir, tokenize_args=(self._tokenizer, self._remains_capital), \
+			cpu_count=self._cpu_count, streaming=self._streaming, lazy=self._lazy, \
+			dedup=self._dedup)
 
 	def get_batch(self, key, indexes):
 		'''{LanguageProcessingBase.GET_BATCH_DOC_WITHOUT_RETURNS}
@@ -142,16 +187,11 @@ class SingleTurnDialog(LanguageProcessingBase):
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
 		res = {}
-		batch_size = len(indexes)
-		res["post_length"] = np.array(list(map(lambda i: len(self.data[key]['post'][i]), indexes)), dtype=int)
-		res["resp_length"] = np.array(list(map(lambda i: len(self.data[key]['resp'][i]), indexes)), dtype=int)
-		res_post = res["post"] = np.zeros((batch_size, np.max(res["post_length"])), dtype=int)
-		res_resp = res["resp"] = np.zeros((batch_size, np.max(res["resp_length"])), dtype=int)
-		for i, j in enumerate(indexes):
-			post = self.data[key]['post'][j]
-			resp = self.data[key]['resp'][j]
-			res_post[i, :len(post)] = post
-			res_resp[i, :len(resp)] = resp
+		res_post, res["post_length"] = pad_sentences(self.data[key]['post'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res_resp, res["resp_length"] = pad_sentences(self.data[key]['resp'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["post"], res["resp"] = res_post, res_resp
 
 		res["post_allvocabs"] = res_post.copy()
 		res["resp_allvocabs"] = res_resp.copy()
@@ -159,6 +199,19 @@ class SingleTurnDialog(LanguageProcessingBase):
 		res_resp[res_resp >= self.valid_vocab_len] = self.unk_id
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = {}
+		res["post"], res["post_allvocabs"] = self._take_ids(key, 'post', index)
+		res["resp"], res["resp_allvocabs"] = self._take_ids(key, 'resp', index)
+		res["post_length"] = res["post"].get_lengths().astype(self.length_dtype)
+		res["resp_length"] = res["resp"].get_lengths().astype(self.length_dtype)
+		return res
+
+	def _get_padding_shapes(self, key):
+		post_length = sentence_lengths(self.data[key]['post'])
+		resp_length = sentence_lengths(self.data[key]['resp'])
+		return [post_length[:, None], resp_length[:, None]], post_length + resp_length
+
 	def get_teacher_forcing_metric(self, gen_log_prob_key="gen_log_prob",\
 					   invalid_vocab=False):
 		'''Get metrics for teacher-forcing.
@@ -231,10 +284,12 @@ class OpenSubtitles(SingleTurnDialog):
 	@hooks.hook_dataloader
 	def __init__(self, file_id="resources://OpenSubtitles", min_vocab_times=10, \
 			max_sent_length=50, invalid_vocab_times=0, \
-			tokenizer="nltk", remains_capital=False\
-			):
+			tokenizer="nltk", remains_capital=False, \
+			cache_dir=None, cpu_count=None, \
+			streaming=False, shuffle_buffer_size=10000, lazy=False, dedup=False):
 		super().__init__(file_id, min_vocab_times, max_sent_length, \
-			invalid_vocab_times, tokenizer, remains_capital)
+			invalid_vocab_times, tokenizer, remains_capital, cache_dir, cpu_count, \
+			streaming, shuffle_buffer_size, lazy, dedup)
 
 class BERTSingleTurnDialog(BERTLanguageProcessingBase):
 	r"""Base class for single-turn dialog datasets **with BERT input**.
@@ -283,23 +338,15 @@ class BERTSingleTurnDialog(BERTLanguageProcessingBase):
 		if key not in self.key_name:
 			raise ValueError("No set named %s." % key)
 		res = {}
-		batch_size = len(indexes)
-		res["post_length"] = np.array(list(map(lambda i: len(self.data[key]['post'][i]), indexes)), dtype=int)
-		res["resp_length"] = np.array(list(map(lambda i: len(self.data[key]['resp'][i]), indexes)), dtype=int)
-		res_post = res["post"] = np.zeros((batch_size, np.max(res["post_length"])), dtype=int)
-		res_resp = res["resp"] = np.zeros((batch_size, np.max(res["resp_length"])), dtype=int)
-		res_post_bert = res["post_bert"] = np.zeros((batch_size, np.max(res["post_length"])), dtype=int)
-		res_resp_bert = res["resp_bert"] = np.zeros((batch_size, np.max(res["resp_length"])), dtype=int)
-		for i, j in enumerate(indexes):
-			post = self.data[key]['post'][j]
-			resp = self.data[key]['resp'][j]
-			res_post[i, :len(post)] = post
-			res_resp[i, :len(resp)] = resp
-
-			post_bert = self.data[key]['post_bert'][j]
-			resp_bert = self.data[key]['resp_bert'][j]
-			res_post_bert[i, :len(post_bert)] = post_bert
-			res_resp_bert[i, :len(resp_bert)] = resp_bert
+		res_post, res["post_length"] = pad_sentences(self.data[key]['post'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res_resp, res["resp_length"] = pad_sentences(self.data[key]['resp'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["post"], res["resp"] = res_post, res_resp
+		res["post_bert"], _ = pad_sentences(self.data[key]['post_bert'], indexes, \
+			self.id_dtype, self.length_dtype)
+		res["resp_bert"], _ = pad_sentences(self.data[key]['resp_bert'], indexes, \
+			self.id_dtype, self.length_dtype)
 
 		res["post_allvocabs"] = res_post.copy()
 		res["resp_allvocabs"] = res_resp.copy()
@@ -308,6 +355,21 @@ class BERTSingleTurnDialog(BERTLanguageProcessingBase):
 
 		return res
 
+	def _get_all_batch(self, key, index):
+		res = {}
+		res["post"], res["post_allvocabs"] = self._take_ids(key, 'post', index)
+		res["resp"], res["resp_allvocabs"] = self._take_ids(key, 'resp', index)
+		res["post_length"] = res["post"].get_lengths().astype(self.length_dtype)
+		res["resp_length"] = res["resp"].get_lengths().astype(self.length_dtype)
+		_, res["post_bert"] = self._take_ids(key, 'post_bert', index)
+		_, res["resp_bert"] = self._take_ids(key, 'resp_bert', index)
+		return res
+
+	def _get_padding_shapes(self, key):
+		post_length = sentence_lengths(self.data[key]['post'])
+		resp_length = sentence_lengths(self.data[key]['resp'])
+		return [post_length[:, None], resp_length[:, None]], post_length + resp_length
+
 	def get_teacher_forcing_metric(self, gen_log_prob_key="gen_log_prob",\
 					   invalid_vocab=False):
 		'''Get metrics for teacher-forcing.
@@ -370,6 +432,11 @@ class BERTOpenSubtitles(BERTSingleTurnDialog):
 			testing stages. Default: 0 (No unknown words).
 		bert_vocab (str): The vocab file of BERT used for this task. It should be a bert model name
 							or local path. Default: `bert-base-uncased`.
+		cpu_count (int): Number of used cpu for tokenizing the dataset. Default: If ``None``, the environment
+			variable ``CPU_COUNT`` will be used when available, or all available cpu will be used otherwise.
+		cache_dir (str): A directory for caching the WordPiece tokens and bert ids of each split.
+			The cache is keyed by the content of the raw files, ``bert_vocab_name`` and ``max_sent_length``,
+			so the second construction skips tokenizing. If ``None``, cache is disabled. Default: ``None``.
 
 	Refer to :class:`.BERTLanguageProcessingBase` for attributes and methods.
 
@@ -380,15 +447,19 @@ class BERTOpenSubtitles(BERTSingleTurnDialog):
 		Movie and TV Subtitles. LREC 2016.
 	'''
 
+	_version = 2
+
 	@hooks.hook_dataloader
 	def __init__(self, file_id, min_vocab_times=10, \
 			max_sent_length=50, invalid_vocab_times=0, \
-			bert_vocab_name='bert-base-uncased', cpu_count=None):
+			bert_vocab_name='bert-base-uncased', cpu_count=None, cache_dir=None):
 		self._file_id = file_id
 		self._file_path = get_resource_file_path(file_id)
 		self._min_vocab_times = min_vocab_times
 		self._max_sent_length = max_sent_length
 		self._invalid_vocab_times = invalid_vocab_times
+		self._bert_vocab_name = bert_vocab_name
+		self._cache_dir = cache_dir
 
 		if cpu_count is not None:
 			self.cpu_count = cpu_count
@@ -399,76 +470,144 @@ class BERTOpenSubtitles(BERTSingleTurnDialog):
 
 		super().__init__(bert_vocab_name=bert_vocab_name)
 
+	@classmethod
+	def _tokenize_line(cls, line):
+		# BertTokenizer never merges text across spaces, so the words split by spaces are tokenized
+		# separately, and the WordPiece tokens of each word are remembered, since most words repeat.
+		tokens, bert_ids = [], []
+		for word in ('[CLS] %s [SEP]' % line).split(' '):
+			if word not in cls._word_memo:
+				word_tokens = cls.tokenizer.tokenize(word)
+				cls._word_memo[word] = (word_tokens, cls.tokenizer.convert_tokens_to_ids(word_tokens))
+			word_tokens, word_bert_ids = cls._word_memo[word]
+			tokens.extend(word_tokens)
+			bert_ids.extend(word_bert_ids)
+		return tokens, bert_ids
+
 	@classmethod
 	def _run_tokenize(cls, ele):
-		def _tokenize(tokenizer, line):
-			tokens = tokenizer.tokenize('[CLS] %s [SEP]' % (line))
-			bert_ids = tokenizer.convert_tokens_to_ids(tokens)
-			return tokens, bert_ids
 		(post, resp) = ele
-		post_tokens, post_bert_ids = _tokenize(cls.tokenizer, post)
-		resp_tokens, resp_bert_ids = _tokenize(cls.tokenizer, resp)
+		post_tokens, post_bert_ids = cls._tokenize_line(post)
+		resp_tokens, resp_bert_ids = cls._tokenize_line(resp)
 		return post_tokens, post_bert_ids, resp_tokens, resp_bert_ids
 
 	@classmethod
 	def _set_tokenizer(cls, tokenizer):
-		cls.tokenizer = tokenizer
+		# the memo of words is kept until another tokenizer is used, or it's cleared after loading
+		if getattr(cls, 'tokenizer', None) is not tokenizer:
+			cls.tokenizer = tokenizer
+			cls._word_memo = {}
 
-	MP_SMALL_SIZE = 100
-	def _mp_process(self, posts, resps):
-		tasks = ((post, resp) for post, resp in zip(posts, resps))
+	@classmethod
+	def _run_tokenize_chunk(cls, pairs):
+		# tokenize a chunk of (post, response) pairs, returning uncut bert ids and a counter of tokens
+		counter = Counter()
+		post_bert_ids, resp_bert_ids = [], []
+		for post, resp in pairs:
+			_post_tokens, _post_bert_ids, _resp_tokens, _resp_bert_ids = cls._run_tokenize((post, resp))
+			counter.update(_post_tokens)
+			counter.update(_resp_tokens)
+			post_bert_ids.append(_post_bert_ids)
+			resp_bert_ids.append(_resp_bert_ids)
+		return post_bert_ids, resp_bert_ids, counter
+
+	def _mp_process(self, posts, resps, get_pool):
+		r'''Tokenize posts and responses chunk by chunk. Lines are read lazily from ``posts`` and ``resps``,
+		and chunks with ``LOAD_CHUNK_SIZE`` pairs are tokenized by the processes of ``get_pool()`` in order,
+		so the memory doesn't grow with the text of the split. Multiprocessing won't be used if ``cpu_count``
+		is ``1`` or there is only one chunk.
 
-		pool = None
-		map_func = None
-		if len(posts) < __class__.MP_SMALL_SIZE:
-			self._set_tokenizer(self.tokenizer)
-			map_func = map
+		Returns:
+			(dict): containing:
+
+			* **post_bert** (:class:`.RaggedArray`): bert ids of posts, cut by ``max_sent_length``.
+			* **resp_bert** (:class:`.RaggedArray`): bert ids of responses, cut by ``max_sent_length``.
+			* **counter** (:class:`collections.Counter`): the number of occurrences of each token.
+			* **max_length** (int): the max length of sentences before cut.
+			* **cut_num** (int): the number of tokens cut off.
+		'''
+		chunks = _iter_chunks(zip(posts, resps), self.LOAD_CHUNK_SIZE)
+		head = list(islice(chunks, 2))
+		chunks = chain(head, chunks)
+		if len(head) > 1 and self.cpu_count > 1:
+			results = _imap_bounded(get_pool(), self._run_tokenize_chunk, chunks, 2 * self.cpu_count)
 		else:
-			pool = Pool(self.cpu_count, \
-				initializer=self._set_tokenizer, initargs=(self.tokenizer, ))
-			map_func = lambda func, tasks: tqdm.tqdm(pool.imap_unordered(func, tasks, chunksize=500), \
-				total=len(posts))
-				
-		post_tokens, post_bert_ids = [], []
-		resp_tokens, resp_bert_ids = [], []
-		
-		for _post_tokens, _post_bert_ids, _resp_tokens, _resp_bert_ids in \
-				map_func(self._run_tokenize, tasks):
-			post_tokens.append(_post_tokens)
-			post_bert_ids.append(_post_bert_ids[:self._max_sent_length])
-			resp_tokens.append(_resp_tokens)
-			resp_bert_ids.append(_resp_bert_ids[:self._max_sent_length])
-
-		if pool is not None:
-			pool.close()
-			pool.join()
+			self._set_tokenizer(self.tokenizer)
+			results = map(self._run_tokenize_chunk, chunks)
+
+		dtype = get_id_dtype(len(self.bert_id2word))
+		values = {'post_bert': [], 'resp_bert': []}
+		lengths = {'post_bert': [], 'resp_bert': []}
+		res = {'counter': Counter(), 'max_length': 0, 'cut_num': 0}
+		for post_bert_ids, resp_bert_ids, counter in results:
+			res['counter'].update(counter)
+			for name, sents in (('post_bert', post_bert_ids), ('resp_bert', resp_bert_ids)):
+				sent_length = np.fromiter(map(len, sents), dtype=np.int64, count=len(sents))
+				if len(sents):
+					res['max_length'] = max(res['max_length'], int(sent_length.max()))
+				res['cut_num'] += int(np.sum(np.maximum(sent_length - self._max_sent_length + 1, 0)))
+				sents = [sent[:self._max_sent_length] for sent in sents]
+				lengths[name].append(np.minimum(sent_length, self._max_sent_length))
+				values[name].append(np.fromiter(chain.from_iterable(sents), dtype=dtype))
+
+		for name in ('post_bert', 'resp_bert'):
+			offsets = np.concatenate([[0]] + lengths[name]).cumsum()
+			res[name] = RaggedArray(np.concatenate([np.zeros(0, dtype=dtype)] + values[name]), [offsets])
+		return res
 
-		return post_tokens, post_bert_ids, resp_tokens, resp_bert_ids
+	def _load_tokenized_split(self, key, get_pool):
+		r'''Tokenize the raw files of a split, or load the bert ids from cache if ``cache_dir``
+		is specified. See :meth:`_mp_process` for arguments and returns.
+		'''
+		file_paths = ["%s/opensub_pair_%s.post" % (self._file_path, key), \
+			"%s/opensub_pair_%s.response" % (self._file_path, key)]
+		if self._cache_dir is not None:
+			cache_key = get_cache_key(self.__class__.__name__, self._version, self._bert_vocab_name, \
+				self._max_sent_length, get_files_sha256(file_paths))
+			cache = load_cache(self._cache_dir, cache_key)
+			if cache is not None:
+				print("load tokenized %s set from cache %s" % (key, cache_key))
+				return cache
+
+		with open(file_paths[0], 'r', encoding='utf-8') as f_file, \
+				open(file_paths[1], 'r', encoding='utf-8') as g_file:
+			res = self._mp_process(f_file, g_file, get_pool)
+		if self._cache_dir is not None:
+			save_cache(self._cache_dir, cache_key, res)
+		return res
 
 	def _load_data(self):
 		r'''Loading dataset, invoked by `BERTLanguageProcessingBase.__init__`
 		'''
 		print('begin load data...')
 		begin_time = time.time()
-		origin_data = {}
-		for key in self.key_name:
-			f_file = open("%s/opensub_pair_%s.post" % (self._file_path, key), 'r', encoding='utf-8')
-			g_file = open("%s/opensub_pair_%s.response" % (self._file_path, key), 'r', encoding='utf-8')
-			post_tokens, post_bert_ids, resp_tokens, resp_bert_ids = \
-						self._mp_process(f_file.readlines(), g_file.readlines())
-			origin_data[key] = {}
-			origin_data[key]['post'] = post_tokens
-			origin_data[key]['resp'] = resp_tokens
-			origin_data[key]['post_bert'] = post_bert_ids
-			origin_data[key]['resp_bert'] = resp_bert_ids
+
+		# one pool is shared by all the splits, and it's created only if a split needs multiprocessing
+		pool = None
+		def get_pool():
+			nonlocal pool
+			if pool is None:
+				pool = Pool(self.cpu_count, initializer=self._set_tokenizer, initargs=(self.tokenizer, ))
+			return pool
+
+		tokenized = {}
+		try:
+			for key in self.key_name:
+				tokenized[key] = self._load_tokenized_split(key, get_pool)
+		finally:
+			if pool is not None:
+				pool.terminate()
+			# the memo grows with the words of the dataset, so it isn't kept after loading
+			type(self)._word_memo = {}
 
 		print('finish tokenizing sentences...%f' % (time.time() - begin_time))
 
-		raw_vocab_list = list(chain(*(origin_data['train']['post'] + origin_data['train']['resp'])))
+		vocab_builder = VocabBuilder()
+		for key in self.key_name:
+			vocab_builder.update(key, tokenized[key]['counter'])
 		# Important: Sort the words preventing the index changes between different runs
-		vocab = sorted(Counter(raw_vocab_list).most_common(), key=lambda pair: (-pair[1], pair[0]))
-		left_vocab = list(filter(lambda x: x[1] >= self._min_vocab_times, vocab))
-		vocab_list = self.ext_vocab + [x[0] for x in left_vocab if x[0] not in self.ext_vocab]
+		vocab_list = self.ext_vocab + vocab_builder.get_vocab(self._min_vocab_times, ['train'], \
+			exclude=set(self.ext_vocab))
 		valid_vocab_len = len(vocab_list)
 		valid_vocab_set = set(vocab_list)
 
@@ -478,32 +617,27 @@ class BERTOpenSubtitles(BERTSingleTurnDialog):
 		print("valid vocab list length = %d" % valid_vocab_len)
 		print("vocab list length = %d" % len(vocab_list))
 
-		word2id = {w: i for i, w in enumerate(vocab_list)}
-		line2id = lambda line: ( \
-						list(map(lambda word: word2id[word], line)) \
-					)[:self._max_sent_length]
+		vocab = Vocab(vocab_list, valid_vocab_len)
+		word2id = vocab.word2id
+		# all the tokens are in the vocabulary of bert, so ids are converted from bert ids directly
+		bert_id_to_id = np.array(vocab.encode(self.bert_id2word, invalid_vocab=True), \
+			dtype=get_id_dtype(len(vocab_list)))
 
 		data = {}
 		data_size = {}
 		for key in self.key_name:
 			data[key] = {}
-			data[key]['post_bert'] = origin_data[key]['post_bert']
-			data[key]['resp_bert'] = origin_data[key]['resp_bert']
-
-			data[key]['post'] = list(map(line2id, origin_data[key]['post']))
-			data[key]['resp'] = list(map(line2id, origin_data[key]['resp']))
+			for name in ('post', 'resp'):
+				bert_ids = tokenized[key][name + '_bert']
+				data[key][name + '_bert'] = bert_ids
+				data[key][name] = RaggedArray(bert_id_to_id.take(bert_ids.values), bert_ids.offsets)
 			data_size[key] = len(data[key]['post'])
-			vocab = list(chain(*(origin_data[key]['post'] + origin_data[key]['resp'])))
-			vocab_num = len(vocab)
-			oov_num = len(list(filter(lambda word: word not in word2id, vocab)))
-			invalid_num = len( \
-				list( \
-					filter( \
-						lambda word: word not in valid_vocab_set, \
-						vocab))) - oov_num
-			length = list(map(len, origin_data[key]['post'] + origin_data[key]['resp']))
-			cut_num = np.sum(np.maximum(np.array(length) - self._max_sent_length + 1, 0))
+			counter = vocab_builder.get_counter([key])
+			vocab_num = sum(counter.values())
+			oov_num = sum(times for word, times in counter.items() if word not in word2id)
+			invalid_num = sum(times for word, times in counter.items() if word not in valid_vocab_set) - oov_num
 			print("%s set. invalid rate: %f, unknown rate: %f, max length before cut: %d, \
 					cut word rate: %f" % \
-					(key, invalid_num / vocab_num, oov_num / vocab_num, max(length), cut_num / vocab_num))
+					(key, invalid_num / vocab_num, oov_num / vocab_num, tokenized[key]['max_length'], \
+					tokenized[key]['cut_num'] / vocab_num))
 		return vocab_list, valid_vocab_len, data, data_size
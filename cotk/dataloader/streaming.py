@@ -0,0 +1,138 @@
+'''
+A module for the streaming mode of dataloaders, where the processed data is
+stored on disk and read sequentially.
+'''
+import random
+import numbers
+
+import numpy as np
+
+
+def shuffle_buffer(iterable, buffer_size, rng):
+	r'''Shuffle an iterable approximately, while only ``buffer_size`` elements are kept in memory.
+	The first ``buffer_size`` elements fill a buffer, then each new element replaces a random element
+	in the buffer, which is yielded.
+
+	Arguments:
+		iterable (Iterable): elements to be shuffled.
+		buffer_size (int): the size of buffer. Larger buffer makes the result more random.
+		rng (:class:`random.Random`): the random generator.
+	'''
+	buffer = []
+	for element in iterable:
+		if len(buffer) < buffer_size:
+			buffer.append(element)
+		else:
+			i = rng.randrange(buffer_size)
+			yield buffer[i]
+			buffer[i] = element
+	rng.shuffle(buffer)
+	yield from buffer
+
+
+class ShuffleBufferIndex:
+	r'''A list of indexes from ``0`` to ``size - 1``, which are shuffled by :func:`shuffle_buffer`.
+	The indexes are generated lazily, so reading them sequentially, e.g. slicing batches in order,
+	uses memory proportional to ``buffer_size`` instead of ``size``. It can be indexed by integers
+	and slices with step 1.
+
+	Arguments:
+		size (int): the number of indexes.
+		buffer_size (int): the size of shuffle buffer.
+		seed (int): the random seed. The same seed produces the same order.
+	'''
+
+	def __init__(self, size, buffer_size, seed):
+		self._size = size
+		self._buffer_size = buffer_size
+		self._seed = seed
+		self._iter = None
+		self._pos = 0
+
+	def __len__(self):
+		return self._size
+
+	def __iter__(self):
+		return shuffle_buffer(range(self._size), self._buffer_size, random.Random(self._seed))
+
+	def __eq__(self, other):
+		if isinstance(other, ShuffleBufferIndex):
+			return (self._size, self._buffer_size, self._seed) == \
+				(other._size, other._buffer_size, other._seed)
+		return NotImplemented
+
+	def __getitem__(self, index):
+		if isinstance(index, numbers.Integral):
+			# reading indexes in order is efficient, while reading them backward restarts the shuffling
+			pos = index + self._size if index < 0 else index
+			if not 0 <= pos < self._size:
+				raise IndexError("ShuffleBufferIndex index out of range.")
+			return self[pos:pos + 1][0]
+		if not isinstance(index, slice) or index.step not in (None, 1):
+			raise TypeError("ShuffleBufferIndex only supports integers and slices with step 1.")
+		start, stop, _ = index.indices(self._size)
+		if self._iter is None or start < self._pos:
+			self._iter = iter(self)
+			self._pos = 0
+		for _ in range(start - self._pos):
+			next(self._iter)
+		res = [next(self._iter) for _ in range(max(stop - start, 0))]
+		self._pos = max(stop, start)
+		return res
+
+
+class ShardIndex:
+	r'''The shard of ``index`` for a process in data-parallel training, which is the same as
+	:func:`.sampler.shard_index`, but ``index`` is read lazily by slices. So the shard of a
+	:class:`ShuffleBufferIndex` can be read sequentially without keeping all indexes in memory.
+	It can be indexed by integers and slices with step 1.
+
+	Arguments:
+		index (list): the order of samples, which must be the same in all processes.
+		rank (int): the rank of the process.
+		world_size (int): the number of processes.
+		batch_size (int): the number of samples in a batch of a process.
+		pad (bool): whether to repeat samples from the beginning of ``index``. Default: ``True``.
+	'''
+
+	def __init__(self, index, rank, world_size, batch_size, pad=True):
+		self._index = index
+		self._rank = rank
+		self._batch_size = batch_size
+		self._group_size = batch_size * world_size
+		size = -(-len(index) // world_size) * world_size if pad else len(index) // world_size * world_size
+		self._group_num = size // self._group_size
+		self._tail_size = (size - self._group_num * self._group_size) // world_size
+		self._size = self._group_num * batch_size + self._tail_size
+
+	def __len__(self):
+		return self._size
+
+	def __iter__(self):
+		for start in range(0, self._size, self._batch_size):
+			yield from self[start:start + self._batch_size]
+
+	def __getitem__(self, index):
+		if isinstance(index, numbers.Integral):
+			pos = index + self._size if index < 0 else index
+			if not 0 <= pos < self._size:
+				raise IndexError("ShardIndex index out of range.")
+			return self[pos:pos + 1][0]
+		if not isinstance(index, slice) or index.step not in (None, 1):
+			raise TypeError("ShardIndex only supports integers and slices with step 1.")
+		start, stop, _ = index.indices(self._size)
+		# positions in the padded ``index``, see :func:`.sampler.shard_index`
+		pos = np.arange(start, max(stop, start))
+		head_size = self._group_num * self._batch_size
+		pos = np.where(pos < head_size, \
+			pos // self._batch_size * self._group_size + self._rank * self._batch_size + pos % self._batch_size, \
+			self._group_num * self._group_size + self._rank * self._tail_size + pos - head_size)
+		res = np.zeros(len(pos), dtype=np.int64)
+		size = len(self._index)
+		# the padded samples are repeated from the beginning, which are read separately
+		for mask in (pos < size, pos >= size):
+			if mask.any():
+				part = pos[mask] % size
+				low = int(part.min())
+				res[mask] = np.array(self._index[low:int(part.max()) + 1], dtype=np.int64)[part - low]
+		return res.tolist()
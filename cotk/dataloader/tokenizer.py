@@ -0,0 +1,103 @@
+'''
+A module for tokenizers used by dataloaders.
+'''
+import re
+
+from .._utils.metaclass import LoadClassInterface
+
+
+class Tokenizer(LoadClassInterface):
+	r'''Base class of tokenizers. A tokenizer splits a sentence(str) into a list of tokens(str).
+
+	Subclasses should implement :meth:`tokenize`. :meth:`tokenize_batch` can be
+	overridden if there is a faster way to tokenize many sentences at once.
+	'''
+
+	def tokenize(self, sentence):
+		r'''Convert a sentence(str) to a list of tokens(str).
+
+		Arguments:
+			sentence (str): a string to be tokenized.
+
+		Returns:
+			(list): a list of tokens(str).
+		'''
+		raise NotImplementedError( \
+			"This function should be implemented by subclasses.")
+
+	def tokenize_batch(self, sentences):
+		r'''Convert a list of sentences to lists of tokens.
+
+		Arguments:
+			sentences (list): a list of strings to be tokenized.
+
+		Returns:
+			(list): a list of lists of tokens(str).
+		'''
+		return [self.tokenize(sentence) for sentence in sentences]
+
+
+class RegexTokenizer(Tokenizer):
+	r'''A tokenizer which returns all matches of a precompiled regular expression.
+
+	Arguments:
+		pattern (str): the regular expression of tokens.
+		flags (int): flags of :func:`re.compile`. Default: ``re.UNICODE | re.MULTILINE | re.DOTALL``.
+	'''
+
+	def __init__(self, pattern, flags=re.UNICODE | re.MULTILINE | re.DOTALL):
+		self._regex = re.compile(pattern, flags)
+		self._findall = self._regex.findall
+
+	def tokenize(self, sentence):
+		return self._findall(sentence)
+
+	def tokenize_batch(self, sentences):
+		findall = self._findall
+		return [findall(sentence) for sentence in sentences]
+
+
+class SpaceTokenizer(Tokenizer):
+	r'''A tokenizer which splits sentences by whitespace, the same as python built-in ``str.split``.'''
+
+	def tokenize(self, sentence):
+		return sentence.split()
+
+	def tokenize_batch(self, sentences):
+		return [sentence.split() for sentence in sentences]
+
+
+# The same pattern as ``nltk.tokenize.WordPunctTokenizer``.
+WORD_PUNCT_PATTERN = r'\w+|[^\w\s]+'
+
+_TOKENIZERS = {}
+
+def register_tokenizer(name, tokenizer):
+	r'''Register a tokenizer, which can be used by dataloaders with the argument ``tokenizer=name``.
+
+	Arguments:
+		name (str): the name of tokenizer.
+		tokenizer (:class:`Tokenizer`): an instance of tokenizer.
+	'''
+	if not isinstance(tokenizer, Tokenizer):
+		raise TypeError("tokenizer must be an instance of Tokenizer.")
+	_TOKENIZERS[name] = tokenizer
+
+def get_tokenizer(name):
+	r'''Get a registered tokenizer by name.
+
+	Arguments:
+		name (str): the name of tokenizer. ``nltk`` and ``space`` are registered by default.
+			``nltk`` produces the same results as ``nltk.tokenize.WordPunctTokenizer``,
+			``space`` produces the same results as python built-in ``str.split``.
+
+	Returns:
+		(:class:`Tokenizer`): the registered tokenizer.
+	'''
+	if name not in _TOKENIZERS:
+		raise ValueError('tokenizer of dataloader should be one of %s' % \
+			", ".join('"%s"' % key for key in _TOKENIZERS))
+	return _TOKENIZERS[name]
+
+register_tokenizer('nltk', RegexTokenizer(WORD_PUNCT_PATTERN))
+register_tokenizer('space', SpaceTokenizer())
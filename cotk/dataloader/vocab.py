@@ -0,0 +1,207 @@
+'''
+A module for vocabulary lists, which are built from token counts and convert between tokens and ids.
+'''
+import heapq
+from collections import Counter
+from itertools import chain, repeat
+
+import numpy as np
+
+from .ragged_array import RaggedArray
+
+
+class VocabBuilder:
+	r'''Count tokens of each dataset (e.g. ``train``, ``dev``, ``test``) in a single pass,
+	and build vocabulary lists ordered by frequency.
+
+	Each dataset has its own :class:`collections.Counter`. Counters produced separately, for example
+	by worker processes tokenizing different chunks, are merged by :meth:`update` or :meth:`merge`.
+	The counts don't depend on the order of merging, so the vocabulary is the same
+	as the one counted by a single process.
+
+	Examples:
+		>>> builder = VocabBuilder()
+		>>> builder.count("train", ["how", "are", "you", "how"])
+		>>> builder.count("test", ["how", "old", "are", "you"])
+		>>> builder.get_vocab(2, ["train"])
+		['how']
+		>>> builder.get_vocab(1)
+		['how', 'are', 'you', 'old']
+	'''
+	def __init__(self):
+		self.counters = {}
+
+	def _get_counter(self, key):
+		if key not in self.counters:
+			self.counters[key] = Counter()
+		return self.counters[key]
+
+	def count(self, key, tokens):
+		r'''Count tokens of a dataset.
+
+		Arguments:
+			key (str): the name of dataset.
+			tokens (Iterable): tokens in the dataset.
+		'''
+		self._get_counter(key).update(tokens)
+
+	def update(self, key, counter):
+		r'''Add the counts of a dataset, which are counted elsewhere (e.g. in a worker process).
+
+		Arguments:
+			key (str): the name of dataset.
+			counter (:class:`collections.Counter`): the number of occurrences of each token.
+		'''
+		self._get_counter(key).update(counter)
+
+	def merge(self, other):
+		r'''Add the counts of all datasets in another builder.
+
+		Arguments:
+			other (:class:`VocabBuilder`): the builder to be merged.
+
+		Returns:
+			(:class:`VocabBuilder`): ``self``.
+		'''
+		for key, counter in other.counters.items():
+			self.update(key, counter)
+		return self
+
+	def get_counter(self, keys=None):
+		r'''Get the counts of tokens in some datasets.
+
+		Arguments:
+			keys (list): the names of datasets. Default: if ``None``, all datasets are used.
+
+		Returns:
+			(:class:`collections.Counter`): the number of occurrences of each token. If only one dataset
+			is used, the counter of the builder is returned without copying, and should not be modified.
+		'''
+		keys = list(self.counters) if keys is None else list(keys)
+		if len(keys) == 1:
+			return self._get_counter(keys[0])
+		res = Counter()
+		for key in keys:
+			res.update(self._get_counter(key))
+		return res
+
+	def get_vocab(self, min_times, keys=None, exclude=(), max_size=None):
+		r'''Get the tokens appearing at least ``min_times`` in some datasets, which are sorted by
+		descending counts, and tokens with the same count are sorted in lexicographic order.
+		Only the selected tokens are sorted, so the long tail of rare tokens costs linear time.
+
+		Arguments:
+			min_times (int): the min number of occurrences of a token.
+			keys (list): the names of datasets. Default: if ``None``, all datasets are used.
+			exclude (set): tokens excluded from the result, e.g. special tokens or tokens which are
+				already in the vocabulary. Default: ``()``.
+			max_size (int): If not ``None``, only the first ``max_size`` tokens are returned,
+				which are selected by a heap. Default: ``None``.
+
+		Returns:
+			(list): a list of tokens.
+		'''
+		counter = self.get_counter(keys)
+		candidates = ((-times, token) for token, times in counter.items() \
+			if times >= min_times and token not in exclude)
+		if max_size is not None:
+			return [token for _, token in heapq.nsmallest(max_size, candidates)]
+		return [token for _, token in sorted(candidates)]
+
+
+class Vocab:
+	r'''A vocabulary list, which converts tokens to ids and vice versa.
+	``all_vocab_list[:valid_vocab_len]`` are valid tokens, and the others are invalid tokens.
+	Besides the conversions of a single sentence, :meth:`encode_batch` and :meth:`decode_batch`
+	convert a batch of sentences without a python call for each token.
+
+	Arguments:
+		all_vocab_list (list): vocabulary list, including valid and invalid tokens.
+		valid_vocab_len (int): the number of valid tokens.
+		pad_id (int): id of ``<pad>``. Default: ``0``.
+		unk_id (int): id of ``<unk>``. Default: ``1``.
+		go_id (int): id of ``<go>``. Default: ``2``.
+		eos_id (int): id of ``<eos>``. Default: ``3``.
+
+	Attributes:
+		all_vocab_list (list): vocabulary list, including valid and invalid tokens.
+		valid_vocab_len (int): the number of valid tokens.
+		word2id (dict): a dict mapping tokens to ids.
+		pad_id (int): id of ``<pad>``.
+		unk_id (int): id of ``<unk>``.
+		go_id (int): id of ``<go>``.
+		eos_id (int): id of ``<eos>``.
+	'''
+	def __init__(self, all_vocab_list, valid_vocab_len, pad_id=0, unk_id=1, go_id=2, eos_id=3):
+		self.all_vocab_list = all_vocab_list
+		self.valid_vocab_len = valid_vocab_len
+		self.word2id = {w: i for i, w in enumerate(all_vocab_list)}
+		self.pad_id = pad_id
+		self.unk_id = unk_id
+		self.go_id = go_id
+		self.eos_id = eos_id
+		self._id2word = np.empty(len(all_vocab_list), dtype=object)
+		self._id2word[:] = all_vocab_list
+
+	def __len__(self):
+		return len(self.all_vocab_list)
+
+	def encode(self, tokens, invalid_vocab=False):
+		r'''Convert a sentence from tokens to ids. Unknown tokens are converted to ``unk_id``.
+
+		Arguments:
+			tokens (list): a list of tokens.
+			invalid_vocab (bool): whether to provide invalid tokens. If ``False``, invalid tokens are
+				converted to ``unk_id``. If ``True``, invalid tokens use their own ids. Default: ``False``.
+
+		Returns:
+			(list): a list of ids.
+		'''
+		ids = list(map(self.word2id.get, tokens, repeat(self.unk_id)))
+		if not invalid_vocab:
+			ids = [idx if idx < self.valid_vocab_len else self.unk_id for idx in ids]
+		return ids
+
+	def encode_batch(self, sentences, invalid_vocab=False):
+		r'''Convert a batch of sentences from tokens to ids. The result is the same as
+		calling :meth:`encode` for each sentence.
+
+		Arguments:
+			sentences (list): a list of sentences, where each sentence is a list of tokens.
+			invalid_vocab (bool): whether to provide invalid tokens. See :meth:`encode`. Default: ``False``.
+
+		Returns:
+			(:class:`.RaggedArray`): ids of the sentences, which are stored in a flat array of ``int64``
+			with offsets.
+		'''
+		lengths = np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences))
+		offsets = np.concatenate(([0], np.cumsum(lengths)))
+		ids = np.fromiter(map(self.word2id.get, chain.from_iterable(sentences), repeat(self.unk_id)), \
+			dtype=np.int64, count=int(offsets[-1]))
+		if not invalid_vocab:
+			ids[ids >= self.valid_vocab_len] = self.unk_id
+		return RaggedArray(ids, [offsets])
+
+	def decode(self, ids):
+		r'''Convert a sentence from ids to tokens.
+
+		Arguments:
+			ids (list): a list of ids.
+
+		Returns:
+			(list): a list of tokens.
+		'''
+		return list(map(self.all_vocab_list.__getitem__, ids))
+
+	def decode_batch(self, ids):
+		r'''Convert an array of ids to tokens by a lookup table.
+
+		Arguments:
+			ids (:class:`numpy.ndarray`): an array of ids of any shape, e.g. a padded batch
+				of sentences with size ``[batch_size, max(sent_length)]``.
+
+		Returns:
+			(:class:`numpy.ndarray`): an array of tokens (``dtype=object``) with the same shape as ``ids``.
+			Use ``tolist()`` to get nested lists.
+		'''
+		return self._id2word.take(np.asarray(ids, dtype=np.int64))
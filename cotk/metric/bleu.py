@@ -8,7 +8,7 @@ from multiprocessing import Pool
 import numpy as np
 import tqdm
 from nltk.translate.bleu_score import corpus_bleu, sentence_bleu, SmoothingFunction
-from .metric import MetricBase
+from .metric import MetricBase, _remove_first_token
 from .._utils import hooks
 
 
@@ -118,12 +118,9 @@ class BleuCorpusMetric(MetricBase):
 		if len(resp) != len(gen):
 			raise ValueError("Batch num is not matched.")
 
-		relevant_data = []
-		for gen_sen, resp_sen in zip(gen, resp):
-			self.hyps.append(self.dataloader.trim(gen_sen))
-			reference = list(self.dataloader.trim(resp_sen[1:]))
-			relevant_data.append(reference)
-			self.refs.append([reference])
+		self.hyps.extend(self.dataloader.trim_batch(gen))
+		relevant_data = self.dataloader.trim_batch(_remove_first_token(resp))
+		self.refs.extend([reference] for reference in relevant_data)
 		self._hash_relevant_data(relevant_data)
 
 	@hooks.hook_metric_close
@@ -227,8 +224,7 @@ class SelfBleuCorpusMetric(MetricBase):
 		if not isinstance(gen, (np.ndarray, list)):
 			raise TypeError("Unknown type for gen.")
 
-		for gen_sen in gen:
-			self.hyps.append(self.dataloader.trim(gen_sen))
+		self.hyps.extend(self.dataloader.trim_batch(gen))
 
 	@hooks.hook_metric_close
 	def close(self):
@@ -362,8 +358,7 @@ class FwBwBleuCorpusMetric(MetricBase):
 		if not isinstance(gen, (np.ndarray, list)):
 			raise TypeError("Unknown type for gen.")
 
-		for gen_sen in gen:
-			self.hyps.append(list(self.dataloader.trim(gen_sen)))
+		self.hyps.extend(self.dataloader.trim_batch(gen))
 
 	@hooks.hook_metric_close
 	def close(self):
@@ -379,8 +374,7 @@ class FwBwBleuCorpusMetric(MetricBase):
 		if not self.hyps:
 			raise RuntimeError("The metric has not been forwarded data correctly.")
 
-		for resp_sen in self.reference_test_list:
-			self.refs.append(list(self.dataloader.trim(resp_sen[1:])))
+		self.refs.extend(self.dataloader.trim_batch(_remove_first_token(self.reference_test_list)))
 
 		sample_hyps = self.sample if self.sample < len(self.hyps) else len(self.hyps)
 		sample_refs = self.sample if self.sample < len(self.refs) else len(self.refs)
@@ -539,12 +533,11 @@ class MultiTurnBleuCorpusMetric(MetricBase):
 		if len(length) != len(reference_allvocabs) or len(length) != len(gen):
 			raise ValueError("Batch num is not matched.")
 
-		for i, turn_length in enumerate(length):
-			gen_session = gen[i]
-			ref_session = reference_allvocabs[i]
-			for j in range(turn_length):
-				self.hyps.append(list(self.dataloader.trim(gen_session[j])))
-				self.refs.append([list(self.dataloader.trim(ref_session[j])[1:])])
+		# the first ``turn_length`` turns of all sessions are trimmed in a batch
+		self.hyps.extend(self.dataloader.trim_batch( \
+			[sent for session, turn_length in zip(gen, length) for sent in session[:turn_length]]))
+		self.refs.extend([reference[1:]] for reference in self.dataloader.trim_batch( \
+			[sent for session, turn_length in zip(reference_allvocabs, length) for sent in session[:turn_length]]))
 
 	@hooks.hook_metric_close
 	def close(self):
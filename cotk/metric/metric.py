@@ -2,9 +2,17 @@ r"""
 ``cotk.metrics`` provides classes and functions evaluating results of models.
 It provides a fair metric for every model.
 """
+import numpy as np
+
 from .._utils.unordered_hash import UnorderedSha256
 from .._utils.metaclass import LoadClassInterface, DocStringInheritor
 
+def _remove_first_token(sentences):
+	# remove the first token (e.g. ``<go>``) of each sentence, a padded array is sliced without copying
+	if isinstance(sentences, np.ndarray) and sentences.ndim == 2:
+		return sentences[:, 1:]
+	return [sent[1:] for sent in sentences]
+
 class MetricBase(LoadClassInterface, metaclass=DocStringInheritor):
 	'''Base class for metrics.
 	'''
@@ -129,8 +137,7 @@ class MetricBase(LoadClassInterface, metaclass=DocStringInheritor):
 		Arguments:
 			data_list (list): relevant data organized as list.
 		'''
-		for item in data_list:
-			self.unordered_hash.update_data(repr(item).encode())
+		self.unordered_hash.update_many(repr(item).encode() for item in data_list)
 
 	def _hashvalue(self):
 		'''Invoked by :meth:`.close` to return the recorded hash value.
@@ -1,6 +1,6 @@
 r'''Containing NgramFwBwPerplexityMetric'''
 
-from .metric import MetricBase
+from .metric import MetricBase, _remove_first_token
 from ..models.ngram_language_model import KneserNeyInterpolated
 from .._utils import hooks
 
@@ -57,8 +57,7 @@ class NgramFwBwPerplexityMetric(MetricBase):
 					Size: `[batch_size, gen_sentence_length]`.
 		'''
 		gen = data[self.gen_key]
-		for gen_sent in gen:
-			self.hyps.append(list(self.dataloader.convert_ids_to_tokens(gen_sent, trim=True)))
+		self.hyps.extend(self.dataloader.convert_ids_to_tokens_batch(gen, trim=True))
 
 	@hooks.hook_metric_close
 	def close(self):
@@ -70,8 +69,8 @@ class NgramFwBwPerplexityMetric(MetricBase):
 			* **fw-bw-ppl hashvalue**: hash value of reference data.
 		'''
 
-		for resp_sent in self.reference_test_list:
-			self.refs.append(list(self.dataloader.convert_ids_to_tokens(resp_sent[1:], trim=True)))
+		self.refs.extend(self.dataloader.convert_ids_to_tokens_batch( \
+			_remove_first_token(self.reference_test_list), trim=True))
 
 		model = KneserNeyInterpolated(self.ngram, \
 					self.dataloader.vocab_list[2], self.dataloader.vocab_list[3], \
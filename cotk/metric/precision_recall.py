@@ -4,7 +4,7 @@ Containing some classes and functions about precision and recall evaluating resu
 from itertools import chain
 import numpy as np
 from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
-from .metric import MetricBase
+from .metric import MetricBase, _remove_first_token
 from .._utils import hooks
 
 class _PrecisionRecallMetric(MetricBase):
@@ -89,10 +89,9 @@ class _PrecisionRecallMetric(MetricBase):
 		if not isinstance(multiple_gen, (np.ndarray, list)):
 			raise TypeError("Unknown type for multiple_gen")
 
-		references = [[self.dataloader.trim(cand[1:]) for cand in inst] \
+		references = [self.dataloader.trim_batch(_remove_first_token(inst)) \
 					  for inst in candidate_allvocabs]
-		gens = [[self.dataloader.trim(cand) for cand in inst] \
-					  for inst in multiple_gen]
+		gens = [self.dataloader.trim_batch(inst) for inst in multiple_gen]
 
 		if len(references) != len(gens):
 			raise ValueError("Batch num is not matched.")
@@ -2,7 +2,7 @@ r"""
 Containing some recorders.
 """
 import numpy as np
-from .metric import MetricBase
+from .metric import MetricBase, _remove_first_token
 
 class SingleTurnDialogRecorder(MetricBase):
 	'''A metric-like class for recording generated sentences and references.
@@ -90,10 +90,9 @@ class SingleTurnDialogRecorder(MetricBase):
 
 		if len(post_allvocabs) != len(resp_allvocabs) or len(resp_allvocabs) != len(gen):
 			raise ValueError("Batch num is not matched.")
-		for i, post_sen in enumerate(post_allvocabs):
-			self.post_list.append(self.dataloader.convert_ids_to_tokens(post_sen[1:]))
-			self.resp_list.append(self.dataloader.convert_ids_to_tokens(resp_allvocabs[i][1:]))
-			self.gen_list.append(self.dataloader.convert_ids_to_tokens(gen[i]))
+		self.post_list.extend(self.dataloader.convert_ids_to_tokens_batch(_remove_first_token(post_allvocabs)))
+		self.resp_list.extend(self.dataloader.convert_ids_to_tokens_batch(_remove_first_token(resp_allvocabs)))
+		self.gen_list.extend(self.dataloader.convert_ids_to_tokens_batch(gen))
 
 	def close(self):
 		'''
@@ -207,15 +206,16 @@ class MultiTurnDialogRecorder(MetricBase):
 			len(turn_length) != len(gen):
 			raise ValueError("Batch num is not matched.")
 
-		for i, _ in enumerate(reference_allvocabs):
-			self.reference_list.append(self.dataloader.convert_multi_turn_ids_to_tokens( \
-				np.array(reference_allvocabs[i]), turn_length=turn_length[i], ignore_first_token=True))
-			self.gen_list.append(self.dataloader.convert_multi_turn_ids_to_tokens( \
-				np.array(gen[i]), turn_length=turn_length[i]))
+		reference_list = self.dataloader.convert_multi_turn_ids_to_tokens_batch( \
+			reference_allvocabs, turn_length=turn_length, ignore_first_token=True)
+		gen_list = self.dataloader.convert_multi_turn_ids_to_tokens_batch(gen, turn_length=turn_length)
+		for reference, gen_session in zip(reference_list, gen_list):
+			self.reference_list.append(reference)
+			self.gen_list.append(gen_session)
 
-			if len(self.reference_list[-1]) != len(self.gen_list[-1]):
+			if len(reference) != len(gen_session):
 				raise ValueError("Reference turn num %d != gen turn num %d." % \
-						(len(self.reference_list[-1]), len(self.gen_list[-1])))
+						(len(reference), len(gen_session)))
 
 	def close(self):
 		'''
@@ -283,8 +283,7 @@ class LanguageGenerationRecorder(MetricBase):
 		if not isinstance(gen, (np.ndarray, list)):
 			raise TypeError("Unknown type for gen")
 
-		for sen in gen:
-			self.gen_list.append(self.dataloader.convert_ids_to_tokens(sen))
+		self.gen_list.extend(self.dataloader.convert_ids_to_tokens_batch(gen))
 
 	def close(self):
 		'''
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from cotk._utils.data_cache import get_cache_key, load_cache, save_cache, save_cache_chunks, load_cache_chunks, \
+	remove_cache
+
+class TestDataCache():
+	def test_cache(self, tmpdir):
+		cache_dir = str(tmpdir)
+		key = get_cache_key("data", 1, [None])
+		assert key == get_cache_key("data", 1, [None])
+		assert key != get_cache_key("data", 2, [None])
+
+		assert load_cache(cache_dir, key) is None
+		save_cache(cache_dir, key, {"a": [1, 2]})
+		assert load_cache(cache_dir, key) == {"a": [1, 2]}
+		assert os.listdir(cache_dir) == [key + ".pkl"]
+
+	@pytest.mark.parametrize("content", [b"", b"\x80\x04broken", \
+		b"cnonexistent_module\nData\n.", b"ccotk._utils.data_cache\nRenamedData\n."])
+	def test_broken_cache(self, tmpdir, content):
+		cache_dir = str(tmpdir)
+		key = get_cache_key("data")
+		with open(os.path.join(cache_dir, key + ".pkl"), "wb") as cache_file:
+			cache_file.write(content)
+		# broken caches, or caches written before renaming classes or modules, are ignored
+		assert load_cache(cache_dir, key) is None
+		save_cache(cache_dir, key, [1])
+		assert load_cache(cache_dir, key) == [1]
+
+	def test_cache_chunks(self, tmpdir):
+		cache_dir = str(tmpdir)
+		key = get_cache_key("chunks")
+		chunks = save_cache_chunks(cache_dir, key, iter([[1, 2], [3], []]))
+		assert next(chunks) == [1, 2]
+		# the cache is saved after the iteration is finished
+		assert load_cache_chunks(cache_dir, key) is None
+		assert list(chunks) == [[3], []]
+		assert load_cache_chunks(cache_dir, key) == [[1, 2], [3], []]
+
+		chunks = save_cache_chunks(cache_dir, get_cache_key("stopped"), iter([[1], [2]]))
+		next(chunks)
+		chunks.close()
+		assert os.listdir(cache_dir) == [key + ".pkl"]
+
+		with open(os.path.join(cache_dir, key + ".pkl"), "ab") as cache_file:
+			cache_file.write(b"\x80\x04broken")
+		assert load_cache_chunks(cache_dir, key) is None
+		remove_cache(cache_dir, key)
+		assert os.listdir(cache_dir) == []
+		remove_cache(cache_dir, key)
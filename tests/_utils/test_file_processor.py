@@ -9,6 +9,7 @@ import shutil
 from checksumdir import dirhash
 
 from cotk._utils.file_utils import get_resource_file_path
+from cotk._utils.resource_processor import ResourceProcessor, MSCOCOResourceProcessor
 
 @pytest.fixture
 def r_mock():
@@ -82,3 +83,55 @@ class TestFileUtils():
 
 		shutil.rmtree(str(pathlib.Path('./tests/_utils/data/glove.6B.50d.zip_unzip')))
 
+
+	@pytest.mark.parametrize('name, processor', [('mscoco', 'MSCOCO'), ('opensubtitles', 'OpenSubtitles'), \
+		('ubuntu_dataset', 'Ubuntu'), ('switchboard_corpus', 'SwitchboardCorpus')])
+	def test_postprocess_once(self, tmpdir, mocker, name, processor):
+		local_path = str(tmpdir.join(name))
+		shutil.copytree(str(pathlib.Path('./tests/_utils/data', name)), local_path)
+		processor_class = ResourceProcessor.load_class(processor + 'ResourceProcessor')
+		process = mocker.spy(processor_class, '_process')
+
+		res_path = get_resource_file_path(local_path + '#' + processor)
+		assert process.call_count == 1
+		processed = {filename: pathlib.Path(res_path, filename).read_bytes() for filename in os.listdir(res_path)}
+		assert '.complete.json' in processed
+		assert sorted(os.listdir(local_path)) == sorted(os.listdir(str(pathlib.Path('./tests/_utils/data', name))) \
+			+ ['processed'])
+
+		# the processed files are reused
+		assert get_resource_file_path(local_path + '#' + processor) == res_path
+		assert process.call_count == 1
+
+		# they are processed again if the input files or the processor change
+		input_file = os.path.join(local_path, processor_class()._get_input_files(local_path)[0])
+		stat = os.stat(input_file)
+		os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+		assert get_resource_file_path(local_path + '#' + processor) == res_path
+		assert process.call_count == 2
+		mocker.patch.object(processor_class, '_version', processor_class._version + 1)
+		assert get_resource_file_path(local_path + '#' + processor) == res_path
+		assert process.call_count == 3
+		assert get_resource_file_path(local_path + '#' + processor) == res_path
+		assert process.call_count == 3
+		assert {filename: pathlib.Path(res_path, filename).read_bytes() for filename in os.listdir(res_path) \
+			if filename != '.complete.json'} == \
+			{filename: content for filename, content in processed.items() if filename != '.complete.json'}
+
+	def test_postprocess_failure(self, tmpdir, mocker):
+		local_path = str(tmpdir.join('mscoco'))
+		shutil.copytree(str(pathlib.Path('./tests/_utils/data/mscoco')), local_path)
+		# a directory processed by an old version of cotk is replaced
+		os.makedirs(os.path.join(local_path, 'processed'))
+		pathlib.Path(local_path, 'processed', 'train.txt').write_text('stale')
+		res_path = get_resource_file_path(local_path + '#MSCOCO')
+		check(os.path.join(res_path, 'train.txt'), os.path.join(local_path, 'mscoco_train.txt'))
+
+		# nothing is published if processing fails
+		mocker.patch.object(MSCOCOResourceProcessor, '_version', MSCOCOResourceProcessor._version + 1)
+		mocker.patch.object(MSCOCOResourceProcessor, '_process', side_effect=RuntimeError)
+		with pytest.raises(RuntimeError):
+			get_resource_file_path(local_path + '#MSCOCO')
+		assert sorted(os.listdir(local_path)) == ['mscoco_dev.txt', 'mscoco_test.txt', 'mscoco_train.txt', 'processed']
+		with open(os.path.join(res_path, '.complete.json'), 'r', encoding='utf-8') as marker_file:
+			assert json.load(marker_file)['version'] == MSCOCOResourceProcessor._version - 1
@@ -6,8 +6,14 @@ import pathlib
 import hashlib
 import json
 import shutil
+import random
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
 from checksumdir import dirhash
 
+from cotk._utils import file_utils
 from cotk._utils.file_utils import get_resource_file_path, import_local_resources
 
 @pytest.fixture
@@ -15,6 +21,77 @@ def r_mock():
 	with requests_mock.Mocker() as m:
 		yield m
 
+class LocalHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+	def __init__(self):
+		self.files = {}
+		self.support_range = False
+		# the number of responses which are broken after sending ``break_after`` bytes
+		self.broken_responses = 0
+		self.break_after = 0
+		self.stall = 0  # seconds of stalling before a response is broken
+		self.ranges = []  # the ``Range`` headers of requests
+		self.lock = threading.Lock()
+		super().__init__(('127.0.0.1', 0), LocalHTTPRequestHandler)
+		self.url = 'http://127.0.0.1:%d' % self.server_port
+
+class LocalHTTPRequestHandler(BaseHTTPRequestHandler):
+	def log_message(self, *args): #pylint: disable=arguments-differ
+		pass
+
+	def do_GET(self): #pylint: disable=invalid-name
+		content = self.server.files.get(self.path)
+		if content is None:
+			self.send_error(404)
+			return
+		range_header = self.headers.get('Range')
+		with self.server.lock:
+			self.server.ranges.append(range_header)
+		if self.server.support_range and range_header is not None:
+			start, end = range_header[len('bytes='):].split('-')
+			start, end = int(start), min(int(end), len(content) - 1)
+			if start >= len(content):
+				self.send_error(416)
+				return
+			self.send_response(206)
+			self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(content)))
+			self.send_header('ETag', '"%s"' % hashlib.sha256(content).hexdigest()[:16])
+			content = content[start:end + 1]
+		else:
+			self.send_response(200)
+		self.send_header('Content-Length', str(len(content)))
+		self.end_headers()
+		with self.server.lock:
+			broken = self.server.broken_responses > 0 and len(content) > self.server.break_after
+			self.server.broken_responses -= broken
+		if broken:
+			self.wfile.write(content[:self.server.break_after])
+			self.wfile.flush()
+			time.sleep(self.server.stall)
+			self.close_connection = True
+		else:
+			self.wfile.write(content)
+
+@pytest.fixture
+def http_server():
+	# a local stand-in of resource servers, serving ``server.files`` (a dict from paths to bytes)
+	server = LocalHTTPServer()
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+def random_content(size, seed=0):
+	rng = random.Random(seed)
+	return bytes(rng.getrandbits(8) for _ in range(size))
+
+def write_config(config_dir, name, url, hashtag):
+	os.makedirs(config_dir, exist_ok=True)
+	with open(os.path.join(config_dir, name + '.json'), 'w', encoding='utf-8') as config_file:
+		json.dump({"name": name, "type": "Default", "hashtag": hashtag, "link": {"default": url}}, config_file)
+
 class TestFileUtils():
 	def test_get_resource(self, r_mock):
 		r_mock.get('http://coai.cs.tsinghua.edu.cn/', text='coai')
@@ -117,3 +194,134 @@ class TestFileUtils():
 			assert meta['local_path'] == res_path
 		
 		shutil.rmtree(cache_dir)
+
+	def test_download_stream(self, http_server, tmpdir, mocker):
+		cache_dir = str(tmpdir.join('cache'))
+		config_dir = str(tmpdir.join('config'))
+		content = random_content(3 * file_utils.BUFFER_SIZE + 123)
+		http_server.files['/data.bin'] = content
+		hashtag = hashlib.sha256(content).hexdigest()
+		write_config(config_dir, 'local', http_server.url + '/data.bin', hashtag)
+		write_config(config_dir, 'bad_hash', http_server.url + '/data.bin', '0' * 64)
+		write_config(config_dir, 'not_found', http_server.url + '/none.bin', hashtag)
+
+		# the hashtag is computed while downloading, and the file isn't read again
+		get_file_sha256 = mocker.spy(file_utils, '_get_file_sha256')
+		res_path = get_resource_file_path('resources://local', cache_dir=cache_dir, config_dir=config_dir)
+		assert not get_file_sha256.called
+		with open(res_path, 'rb') as res_file:
+			assert res_file.read() == content
+		with open(res_path + '.json', 'r', encoding='utf-8') as meta_file:
+			assert json.load(meta_file) == {'hashtag': hashtag, 'local_path': res_path}
+		assert get_resource_file_path('resources://local', cache_dir=cache_dir, config_dir=config_dir) == res_path
+
+		with pytest.raises(ValueError) as excinfo:
+			get_resource_file_path('resources://bad_hash', cache_dir=cache_dir, config_dir=config_dir)
+		assert "bad hashtag" in str(excinfo.value)
+
+		# a failed download leaves nothing in the cache
+		files = set(os.listdir(cache_dir))
+		with pytest.raises(requests.HTTPError):
+			get_resource_file_path('resources://not_found', cache_dir=cache_dir, config_dir=config_dir)
+		assert set(os.listdir(cache_dir)) == files
+		assert not [name for name in files if name.endswith('.tmp')]
+
+		res_path = get_resource_file_path(http_server.url + '/data.bin', cache_dir=cache_dir)
+		with open(res_path, 'rb') as res_file:
+			assert res_file.read() == content
+
+	@pytest.mark.parametrize('connections', [1, 3])
+	def test_download_resume(self, http_server, tmpdir, mocker, connections):
+		cache_dir = str(tmpdir.join('cache'))
+		config_dir = str(tmpdir.join('config'))
+		content = random_content(3 * file_utils.BUFFER_SIZE + 123, connections)
+		http_server.files['/data.bin'] = content
+		http_server.support_range = True
+		write_config(config_dir, 'local', http_server.url + '/data.bin', hashlib.sha256(content).hexdigest())
+		mocker.patch.object(file_utils, 'BUFFER_SIZE', 1 << 16)
+		mocker.patch.dict(os.environ, {'DOWNLOAD_CONNECTIONS': str(connections)})
+
+		# the download is interrupted, and the downloaded part is kept
+		http_server.broken_responses = 100
+		http_server.break_after = 300000
+		mocker.patch.object(file_utils, 'DOWNLOAD_RETRIES', 0)
+		with pytest.raises(IOError):
+			get_resource_file_path('resources://local', cache_dir=cache_dir, config_dir=config_dir)
+		part_paths = [name for name in os.listdir(cache_dir) if name.endswith('.part')]
+		assert len(part_paths) == 1
+		with open(os.path.join(cache_dir, part_paths[0] + '.json'), 'r', encoding='utf-8') as state_file:
+			segments = json.load(state_file)['segments']
+		assert len(segments) == connections
+		assert all(start > 0 for start, _ in segments)
+
+		# continue after a restart, and broken connections are retried
+		http_server.ranges = []
+		http_server.broken_responses = connections
+		mocker.patch.object(file_utils, 'DOWNLOAD_RETRIES', 1)
+		res_path = get_resource_file_path('resources://local', cache_dir=cache_dir, config_dir=config_dir)
+		with open(res_path, 'rb') as res_file:
+			assert res_file.read() == content
+		assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(res_path), os.path.basename(res_path) + '.json'])
+		# each segment is requested from where it stopped, and again after the connection is broken
+		requested = [int(header[len('bytes='):].split('-')[0]) for header in http_server.ranges[1:]]
+		assert len(requested) == 2 * connections
+		assert {start for start, _ in segments} <= set(requested)
+
+	def test_download_range_refused(self, http_server, tmpdir, mocker):
+		cache_dir = str(tmpdir.join('cache'))
+		os.makedirs(cache_dir)
+		content = random_content(1000)
+		http_server.files['/data.bin'] = content
+		cache_path = os.path.join(cache_dir, 'data')
+
+		# the whole file is downloaded again if the server refuses range requests
+		http_server.broken_responses = 2  # the response of probing is broken as well
+		http_server.break_after = 500
+		with pytest.raises(requests.exceptions.ChunkedEncodingError):
+			file_utils._download_to_cache(http_server.url + '/data.bin', cache_path, 2)
+		assert not os.listdir(cache_dir)
+		assert file_utils._download_to_cache(http_server.url + '/data.bin', cache_path, 2) == \
+			hashlib.sha256(content).hexdigest()
+		with open(cache_path, 'rb') as cache_file:
+			assert cache_file.read() == content
+
+		# a partial download of a changed file isn't resumed
+		http_server.support_range = True
+		http_server.broken_responses = 1
+		mocker.patch.object(file_utils, 'DOWNLOAD_RETRIES', 0)
+		with pytest.raises(IOError):
+			file_utils._download_to_cache(http_server.url + '/data.bin', cache_path, 1)
+		content = random_content(2000, 1)
+		http_server.files['/data.bin'] = content
+		http_server.ranges = []
+		assert file_utils._download_to_cache(http_server.url + '/data.bin', cache_path, 1) == \
+			hashlib.sha256(content).hexdigest()
+		assert http_server.ranges == ['bytes=0-0', 'bytes=0-1999']
+
+		http_server.files['/empty.bin'] = b''
+		assert file_utils._download_to_cache(http_server.url + '/empty.bin', cache_path, 2) == \
+			hashlib.sha256(b'').hexdigest()
+
+	@pytest.mark.parametrize('connections', [1, 3])
+	def test_download_stalled(self, http_server, tmpdir, mocker, connections):
+		cache_dir = str(tmpdir)
+		content = random_content(3 * file_utils.BUFFER_SIZE + 123)
+		http_server.files['/data.bin'] = content
+		http_server.support_range = True
+		cache_path = os.path.join(cache_dir, 'data')
+		mocker.patch.object(file_utils, 'BUFFER_SIZE', 1 << 12)
+		save_state = mocker.spy(file_utils._RangeDownloader, '_save_state')
+
+		# a stalled connection times out and is retried
+		http_server.broken_responses = 1
+		http_server.break_after = 100000
+		http_server.stall = 3
+		mocker.patch.object(file_utils, 'DOWNLOAD_TIMEOUT', (5, 0.5))
+		start_time = time.time()
+		assert file_utils._download_to_cache(http_server.url + '/data.bin', cache_path, connections) == \
+			hashlib.sha256(content).hexdigest()
+		assert time.time() - start_time < http_server.stall
+		assert len(http_server.ranges) == connections + 2
+		# the state isn't saved after every chunk
+		assert save_state.call_count == 2
+		assert os.listdir(cache_dir) == ['data']
@@ -0,0 +1,53 @@
+import pickle
+import random
+import hashlib
+
+import numpy as np
+import pytest
+
+from cotk._utils.unordered_hash import UnorderedSha256
+
+def hash_one_by_one(items):
+	res = UnorderedSha256()
+	for item in items:
+		res.update_data(item)
+	return res
+
+class TestUnorderedSha256():
+	@pytest.mark.parametrize("size", [0, 1, 300, 1000])
+	def test_update_many(self, size, monkeypatch):
+		monkeypatch.setattr(UnorderedSha256, 'CHUNK_SIZE', 128)
+		rng = random.Random(size)
+		items = [bytes(rng.randrange(256) for _ in range(rng.randint(0, 20))) for _ in range(size)]
+		expect = hash_one_by_one(items)
+
+		res = UnorderedSha256()
+		res.update_many(iter(items))
+		assert res.digest() == expect.digest()
+
+		digests = [hashlib.sha256(item).digest() for item in items]
+		res = UnorderedSha256()
+		res.update_digests(np.array([list(x) for x in digests], dtype=np.uint8).reshape(-1, 32))
+		assert res.digest() == expect.digest()
+		res = UnorderedSha256()
+		res.update_digests(b"".join(digests))
+		assert res.digest() == expect.digest()
+
+	def test_order(self):
+		items = [str(i).encode() for i in range(100)]
+		res = UnorderedSha256()
+		res.update_many(reversed(items))
+		assert res.digest() == hash_one_by_one(items).digest()
+
+	def test_merge(self):
+		items = [str(i).encode() for i in range(1000)]
+		res = UnorderedSha256()
+		res.update_data(b"head")
+		parts = []
+		for i in range(0, 1000, 300):
+			part = UnorderedSha256()
+			part.update_many(items[i:i + 300])
+			parts.append(pickle.loads(pickle.dumps(part)))
+		for part in reversed(parts):
+			assert res.merge(part) is res
+		assert res.digest() == hash_one_by_one([b"head"] + items).digest()
@@ -0,0 +1,235 @@
+import copy
+import random
+import threading
+import multiprocessing
+import os
+import pickle
+import numpy as np
+import pytest
+
+from cotk.dataloader import LanguageProcessingBase, RaggedArray, dataloader
+from cotk.dataloader.sampler import shard_index
+from cotk.dataloader.streaming import ShardIndex
+
+# Options of loading dataloaders, which don't change the loaded data. See `base_test_load_options`.
+MULTIPROCESSING_OPTIONS = [dict(cpu_count=1), dict(cpu_count=2)]
+DEDUP_OPTIONS = [dict(dedup=True), dict(cpu_count=2, dedup=True), dict(cpu_count=2, dedup=2), \
+	dict(lazy=True, dedup=True)]
+LAZY_OPTIONS = [dict(lazy=True)]
+STREAMING_OPTIONS = [dict(streaming=True, shuffle_buffer_size=3), dict(streaming=True, lazy=True), \
+	dict(streaming=True, dedup=True)]
+
+def assert_same_dataloader(dl, expect):
+	assert dl.hash_value == expect.hash_value
+	assert dl.all_vocab_list == expect.all_vocab_list
+	assert dl.vocab_size == expect.vocab_size
+	assert dl.data_size == expect.data_size
+	for key in expect.key_name:
+		for data_key in expect.data[key]:
+			# splits in streaming mode are read by iterating them
+			assert list(dl.data[key][data_key]) == expect.data[key][data_key]
+
+def _run_shard(load_dl, modes, rank, world_size, queue):
+	'''Load the dataloader, and put the shards of each mode in ``queue``. See `base_test_shard`.'''
+	try:
+		dl = load_dl()
+		res = {}
+		for key in dl.key_name:
+			for i, mode in enumerate(modes):
+				for pad_shards in [True, False]:
+					for epoch in range(2):
+						dl.restart(key, shuffle=True, rank=rank, world_size=world_size, seed=1229, \
+							pad_shards=pad_shards, **mode)
+						step_num = len(list(iter(lambda: dl.get_next_batch(key), None)))
+						res[key, i, pad_shards, epoch] = (list(dl.index[key]), step_num)
+			# an unsharded epoch shuffled differently in each process doesn't affect the shards
+			random.seed(rank)
+			dl.restart(key, batch_size=2, shuffle=True)
+			dl.restart(key, batch_size=2, shuffle=False, rank=rank, world_size=world_size)
+			step_num = len(list(iter(lambda: dl.get_next_batch(key), None)))
+			res[key, len(modes), True, 0] = (list(dl.index[key]), step_num)
+		queue.put((rank, res, dl.data_size))
+	except BaseException as err:
+		queue.put((rank, repr(err), None))
+		raise
+
+class DataloaderTestBase():
+	'''Tests shared by all dataloaders of language processing.'''
+
+	def base_test_load_options(self, load_dl, mocker, options):
+		'''Load the dataloader with ``options``, and check that the loaded data is the same as the default one.'''
+		dl = load_dl()
+		# the data is tokenized in several chunks if multiprocessing is used
+		mocker.patch.object(LanguageProcessingBase, 'LOAD_CHUNK_SIZE', 3)
+		assert_same_dataloader(load_dl(**options), dl)
+
+	def base_test_spawn(self, load_dl, mocker):
+		'''Load the dataloader by processes created by ``spawn``, where the fields and the tokenizer are pickled.'''
+		dl = load_dl()
+		mocker.patch.object(LanguageProcessingBase, 'LOAD_CHUNK_SIZE', 3)
+		mocker.patch.object(LanguageProcessingBase, 'LOAD_START_METHOD', 'spawn')
+		can_send = mocker.spy(dataloader, '_can_send_to_workers')
+		pool = mocker.spy(multiprocessing.get_context('spawn'), 'Pool')
+		assert_same_dataloader(load_dl(cpu_count=2), dl)
+		assert pool.call_count == can_send.call_count > 0
+
+		# the dataset is loaded by a single process if the arguments of workers can't be pickled
+		pool.reset_mock()
+		mocker.patch.object(pickle, 'dumps', side_effect=pickle.PicklingError)
+		assert_same_dataloader(load_dl(cpu_count=2), dl)
+		assert not pool.called
+
+	def base_test_cache(self, load_dl, cache_dir, mocker):
+		dl = load_dl(cache_dir=cache_dir)
+		assert len(os.listdir(cache_dir)) == 1
+
+		tokenize = mocker.patch.object(dl.__class__, 'tokenize')
+		tokenize_batch = mocker.patch.object(dl.__class__, 'tokenize_batch')
+		dl_cached = load_dl(cache_dir=cache_dir)
+		assert not tokenize.called
+		assert not tokenize_batch.called
+		mocker.stopall()
+		assert_same_dataloader(dl_cached, dl)
+		assert dl_cached.hash_value == load_dl().hash_value
+
+		dl_other = load_dl(invalid_vocab_times=10000, cache_dir=cache_dir)
+		assert len(os.listdir(cache_dir)) == 2
+		assert dl_other.hash_value == load_dl(invalid_vocab_times=10000).hash_value
+
+	def base_test_streaming(self, load_dl, tmpdir, capsys):
+		capsys.readouterr()
+		dl = load_dl()
+		stats = [line for line in capsys.readouterr().out.split("\n") if " set. " in line]
+		dl_stream = load_dl(streaming=True, shuffle_buffer_size=3)
+		# the statistics of tokens are the same as the ones in eager mode
+		assert [line for line in capsys.readouterr().out.split("\n") if " set. " in line] == stats
+		dl_shards = [load_dl(streaming=True, shuffle_buffer_size=3) for _ in range(3)]
+		for key in dl.key_name:
+			batch, expect = dl_stream.get_batch(key, [0, 2]), dl.get_batch(key, [0, 2])
+			for name in expect:
+				assert np.array_equal(batch[name], expect[name])
+			dl_stream.restart(key, batch_size=2, shuffle=True)
+			index = list(dl_stream.index[key])
+			assert sorted(index) == list(range(dl.data_size[key]))
+			batches = []
+			while True:
+				batch = dl_stream.get_next_batch(key)
+				if batch is None:
+					break
+				batches.append(batch)
+			assert len(batches) == (len(index) + 1) // 2
+			for i, batch in enumerate(batches):
+				expect = dl.get_batch(key, index[i * 2: i * 2 + 2])
+				for name in expect:
+					assert np.array_equal(batch[name], expect[name])
+
+			# the shards are read from the shuffle buffer lazily
+			dl_stream.restart(key, batch_size=2, shuffle=True, seed=1229)
+			index = list(dl_stream.index[key])
+			for rank, dl_shard in enumerate(dl_shards):
+				dl_shard.restart(key, batch_size=2, shuffle=True, rank=rank, world_size=3, seed=1229)
+				assert isinstance(dl_shard.index[key], ShardIndex)
+				assert list(dl_shard.index[key]) == shard_index(index, rank, 3, 2).tolist()
+				batch = dl_shard.get_next_batch(key)
+				expect = dl.get_batch(key, dl_shard.index[key][:2])
+				for name in expect:
+					assert np.array_equal(batch[name], expect[name])
+
+		cache_dir = str(tmpdir.join('cache'))
+		dl_stream = load_dl(cache_dir=cache_dir, streaming=True)
+		dl_cached = load_dl(cache_dir=cache_dir, streaming=True)
+		assert_same_dataloader(dl_cached, dl)
+
+	def base_test_prefetch(self, dl):
+		thread_num = threading.active_count()
+		for key in dl.key_name:
+			batches = list(dl.get_batches(key, batch_size=3, shuffle=True, prefetch=2))
+			index = copy.copy(dl.index[key])
+			assert len(batches) == (len(index) + 2) // 3
+			for i, batch in enumerate(batches):
+				expect = dl.get_batch(key, index[i * 3: i * 3 + 3])
+				for name in expect:
+					assert all(np.array_equal(x, y) for x, y in zip(batch[name], expect[name]))
+
+			for batch in dl.get_batches(key, batch_size=1, shuffle=False, prefetch=2):
+				break
+			assert threading.active_count() == thread_num
+
+	def base_test_all_batch(self, dl):
+		for key in dl.key_name:
+			dl.restart(key, batch_size=3, shuffle=True)
+			res = dl.get_all_batch(key)
+			expect = LanguageProcessingBase._get_all_batch(dl, key, dl.index[key])
+			assert sorted(res) == sorted(expect)
+			for name in expect:
+				assert isinstance(res[name], list)
+				assert len(res[name]) == len(expect[name]) == len(dl.index[key])
+				assert all(np.array_equal(x, y) if isinstance(y, np.ndarray) else x == y \
+					for x, y in zip(res[name], expect[name]))
+
+			ragged = dl.get_all_batch(key, ragged=True)
+			for name, value in ragged.items():
+				assert isinstance(value, (RaggedArray, np.ndarray, list))
+				if isinstance(value, RaggedArray):
+					assert value.depth == 1 or [x.tolist() for x in res[name]] == \
+						[[sent + [0] * (x.shape[1] - len(sent)) for sent in session] \
+							for x, session in zip(res[name], value.tolist())]
+				else:
+					assert list(value) == [x.tolist() if isinstance(x, np.ndarray) else x for x in res[name]]
+		with pytest.raises(ValueError):
+			dl.get_all_batch("unknown set")
+
+		# the dtypes are the same as the ones of `get_batch`
+		dl.set_batch_dtype(id_dtype="auto", length_dtype="auto")
+		for key in dl.key_name:
+			batch = dl.get_batch(key, [0])
+			for name, value in dl.get_all_batch(key, ragged=True).items():
+				if isinstance(value, RaggedArray):
+					assert value.values.dtype == batch[name].dtype
+				elif isinstance(value, np.ndarray):
+					assert value.dtype == batch[name].dtype
+
+	def base_test_shard(self, load_dl, max_tokens, world_size=3):
+		'''``load_dl`` is pickled and called in each process. It must be defined at the top level of a module.'''
+		modes = [dict(batch_size=2), dict(batch_size=2, bucket_size=4), \
+			dict(max_tokens=max_tokens, max_batch_size=3)]
+		# resources are processed before starting the processes, since they can't be processed concurrently
+		load_dl()
+		ctx = multiprocessing.get_context("spawn")
+		queue = ctx.Queue()
+		processes = [ctx.Process(target=_run_shard, args=(load_dl, modes, rank, world_size, queue)) \
+			for rank in range(world_size)]
+		for process in processes:
+			process.start()
+		results = {}
+		for _ in processes:
+			rank, res, data_size = queue.get(timeout=300)
+			assert data_size is not None, res
+			results[rank] = res
+		for process in processes:
+			process.join()
+			assert process.exitcode == 0
+
+		for (key, mode, pad_shards, epoch), _ in results[0].items():
+			shards = [results[rank][key, mode, pad_shards, epoch][0] for rank in range(world_size)]
+			step_nums = [results[rank][key, mode, pad_shards, epoch][1] for rank in range(world_size)]
+			assert len(set(step_nums)) == 1
+			samples = sum(shards, [])
+			if mode == 2:
+				# batches are sharded
+				if pad_shards:
+					assert sorted(set(samples)) == list(range(data_size[key]))
+				else:
+					assert len(set(samples)) == len(samples)
+			else:
+				assert len(set(map(len, shards))) == 1
+				if pad_shards:
+					assert sorted(set(samples)) == list(range(data_size[key]))
+					assert len(samples) == -(-data_size[key] // world_size) * world_size
+				else:
+					assert sorted(samples) == sorted(set(samples))
+					assert len(samples) == data_size[key] // world_size * world_size
+			if epoch == 1 and mode == 0 and data_size[key] > 2 * world_size:
+				# different epochs are shuffled differently
+				assert samples != sum([results[rank][key, mode, pad_shards, 0][0] \
+					for rank in range(world_size)], [])
@@ -1,7 +1,9 @@
+import os
 import copy
 import random
 import operator
 import pytest
+import numpy as np
 from pytest_mock import mocker
 
 from cotk.dataloader import BERTLanguageProcessingBase, BERTOpenSubtitles
@@ -181,6 +183,16 @@ class TestBertBase():
 		assert sent_id == dl.convert_bert_ids_to_ids(bert_id)
 		assert bert_id == dl.convert_ids_to_bert_ids(sent_id)
 
+		batch = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		for invalid_vocab in [False, True]:
+			expect = [dl.convert_tokens_to_ids(dl.convert_bert_ids_to_tokens(bert_ids, False), invalid_vocab) \
+				for bert_ids in batch["post_bert"].tolist()]
+			assert dl.convert_bert_ids_to_ids_batch(batch["post_bert"], invalid_vocab).tolist() == expect
+		expect = [dl.convert_tokens_to_bert_ids(dl.convert_ids_to_tokens(ids, False)) \
+			for ids in batch["post_allvocabs"].tolist()]
+		assert dl.convert_ids_to_bert_ids_batch(batch["post_allvocabs"]).tolist() == expect
+		assert dl.convert_ids_to_bert_ids_batch(np.array([sent_id])).tolist() == [bert_id]
+
 	def base_test_teacher_forcing_metric(self, dl):
 		assert isinstance(dl.get_teacher_forcing_metric(), MetricBase)
 
@@ -190,12 +202,47 @@ class TestBertBase():
 	def base_test_multi_runs(self, dl_list):
 		assert all(x.vocab_list == dl_list[0].vocab_list for x in dl_list)
 
+	def base_test_tokenize(self, dl):
+		# tokenizing words separately gives the same result as tokenizing the whole line
+		for line in ["Hello, world!", "i'm  fine\tthanks\n", "", "unaffable unaffable"]:
+			tokens = dl.tokenizer.tokenize('[CLS] %s [SEP]' % line)
+			assert dl._tokenize_line(line) == (tokens, dl.tokenizer.convert_tokens_to_ids(tokens))
+
+	def base_test_cache(self, load_dl, cache_dir, mocker):
+		dl = load_dl(cache_dir=cache_dir)
+		assert len(os.listdir(cache_dir)) == len(dl.key_name)
+
+		mp_process = mocker.patch.object(dl.__class__, '_mp_process')
+		dl_cached = load_dl(cache_dir=cache_dir)
+		assert not mp_process.called
+		mocker.stopall()
+		assert dl_cached.all_vocab_list == dl.all_vocab_list
+		assert dl_cached.data == dl.data
+
+		load_dl(cache_dir=cache_dir, max_sent_length=10)
+		assert len(os.listdir(cache_dir)) == 2 * len(dl.key_name)
+
+	def base_test_multiprocessing(self, load_dl, mocker):
+		mocker.patch.object(BERTOpenSubtitles, 'LOAD_CHUNK_SIZE', 3)
+		dl = load_dl(cpu_count=1)
+		dl_mp = load_dl(cpu_count=2)
+		assert dl_mp.all_vocab_list == dl.all_vocab_list
+		assert dl_mp.data == dl.data
+		# the order of lines is kept
+		for key in dl.key_name:
+			with open("./tests/dataloader/dummy_opensubtitles/opensub_pair_%s.post" % key, encoding='utf-8') as f_file:
+				posts = f_file.readlines()
+			assert len(dl_mp.data[key]['post_bert']) == len(posts)
+			for i in [0, len(posts) - 1]:
+				assert dl_mp.data[key]['post_bert'][i] == dl.convert_tokens_to_bert_ids( \
+					dl.tokenize('[CLS] %s [SEP]' % posts[i]))[:dl._max_sent_length]
+
 @pytest.fixture
 def load_opensubtitles():
-	def _load_opensubtitles(invalid_vocab_times=0):
+	def _load_opensubtitles(invalid_vocab_times=0, max_sent_length=50, cpu_count=None, cache_dir=None):
 		return BERTOpenSubtitles("./tests/dataloader/dummy_opensubtitles", \
-					invalid_vocab_times=invalid_vocab_times, \
-					bert_vocab_name="bert-base-uncased")
+					invalid_vocab_times=invalid_vocab_times, max_sent_length=max_sent_length, \
+					bert_vocab_name="bert-base-uncased", cpu_count=cpu_count, cache_dir=cache_dir)
 	return _load_opensubtitles
 
 class TestBertOpenSubtitles(TestBertBase):
@@ -203,6 +250,8 @@ class TestBertOpenSubtitles(TestBertBase):
 	@pytest.mark.dependency()
 	def test_init(self, load_opensubtitles):
 		super().base_test_init(load_opensubtitles())
+		# the memo of words used for tokenizing is dropped after loading
+		assert not BERTOpenSubtitles._word_memo
 
 	def test_restart(self, load_opensubtitles):
 		super().base_test_restart(load_opensubtitles())
@@ -232,3 +281,12 @@ class TestBertOpenSubtitles(TestBertBase):
 	def test_init_multi_runs(self, load_opensubtitles):
 		super().base_test_multi_runs([load_opensubtitles() for i in range(3)])
 
+	def test_tokenize(self, load_opensubtitles):
+		super().base_test_tokenize(load_opensubtitles())
+
+	def test_cache(self, load_opensubtitles, tmpdir, mocker):
+		super().base_test_cache(load_opensubtitles, str(tmpdir.join('cache')), mocker)
+
+	def test_multiprocessing(self, load_opensubtitles, mocker):
+		super().base_test_multiprocessing(load_opensubtitles, mocker)
+
@@ -3,10 +3,13 @@ import copy
 import hashlib
 from unittest import mock
 
+import numpy as np
 import pytest
 
 import cotk
-from cotk.dataloader.dataloader import LanguageProcessingBase, Label, Sentence, Session, DataField
+from cotk.dataloader import RaggedArray
+from cotk.dataloader.dataloader import LanguageProcessingBase, Label, Sentence, Session, DataField, DataloaderHash
+from cotk._utils.unordered_hash import UnorderedSha256
 
 
 @pytest.fixture
@@ -168,3 +171,35 @@ class TestHash:
 		assert hash_value1 == \
 			self._hash(ext_ids, unk_id, valid_vocabs, data_fields, fake_dataset2)
 		assert hash_value1 != self._hash(ext_ids, unk_id, valid_vocabs[:-1], data_fields, fake_dataset2)
+
+	@staticmethod
+	def _hash_by_loop(hash_obj, dataset, fields, id_to_word):
+		convert_ids_to_tokens = lambda sentence: hash_obj.convert_ids_to_tokens(sentence, id_to_word)
+		ordered_hash_obj = hashlib.sha256()
+		for data_key in sorted(dataset.keys()):
+			field = DataField.get_field(dict(fields)[data_key])
+			unordered_hash_obj = UnorderedSha256()
+			for element in dataset[data_key]:
+				unordered_hash_obj.update_data(field.convert_element_to_bytes(element, convert_ids_to_tokens))
+			ordered_hash_obj.update(unordered_hash_obj.result.tobytes())
+		return ordered_hash_obj.digest()
+
+	@pytest.mark.parametrize("cpu_count, chunk_size", [(1, 10000), (1, 3), (2, 3)])
+	def test_ragged_array(self, get_fake_dataset, cpu_count, chunk_size, monkeypatch):
+		"""
+		Test whether sentences and sessions stored in lists and ragged arrays are hashed as element by element.
+		"""
+		all_vocabs, word2index, key_name, data_fields, fake_dataset = get_fake_dataset
+		monkeypatch.setattr(DataloaderHash, 'HASH_CHUNK_SIZE', chunk_size)
+		# ids out of ``all_vocabs`` are invalid
+		fake_dataset = self.insert_token(fake_dataset, data_fields, [1, 3, len(all_vocabs) + 5, 0])
+		hash_obj = DataloaderHash([0, 2, 3], unk_id=1, cpu_count=cpu_count)
+		for key in key_name:
+			expect = self._hash_by_loop(hash_obj, fake_dataset[key], data_fields[key], all_vocabs[4:])
+			assert hash_obj._hash_dataset(fake_dataset[key], data_fields[key], all_vocabs[4:]) == expect
+			ragged_dataset = {data_key: (RaggedArray.from_list(data, 2 if field == 'Session' else 1, np.uint16) \
+				if field != 'Label' else data) for (data_key, field), data in \
+				zip(data_fields[key], fake_dataset[key].values())}
+			assert hash_obj._hash_dataset(ragged_dataset, data_fields[key], all_vocabs[4:]) == expect
+			assert hash_obj._hash_dataset(ragged_dataset, data_fields[key], dict(enumerate(all_vocabs))) == \
+				self._hash_by_loop(hash_obj, fake_dataset[key], data_fields[key], dict(enumerate(all_vocabs)))
@@ -0,0 +1,73 @@
+import pickle
+import random
+
+import pytest
+
+from cotk.dataloader import SentenceInterner
+
+class SplitTokenizer():
+	def __init__(self):
+		self.tokenized = []
+
+	def __call__(self, sentences):
+		self.tokenized.extend(sentences)
+		return [sentence.split() for sentence in sentences]
+
+def random_sentences(rng, size, distinct):
+	pool = [" ".join(rng.choice("abcde") * rng.randint(1, 3) for _ in range(rng.randint(0, 5))) \
+		for _ in range(distinct)]
+	return [rng.choice(pool) for _ in range(size)]
+
+class TestSentenceInterner():
+	def test_call(self):
+		rng = random.Random(0)
+		sentences = random_sentences(rng, 1000, 50)
+		tokenizer = SplitTokenizer()
+		interner = SentenceInterner(tokenizer)
+		res = interner(sentences[:500]) + interner(sentences[500:])
+		assert res == [sentence.split() for sentence in sentences]
+		# each distinct sentence is tokenized once, and identical sentences share one list
+		assert sorted(tokenizer.tokenized) == sorted(set(sentences))
+		assert len({id(tokens) for tokens in res}) == len(set(sentences))
+
+		stats = interner.get_stats()
+		assert stats["sentences"] == 1000
+		assert stats["distinct"] == len(set(sentences))
+		assert stats["dedup_ratio"] == pytest.approx(1 - len(set(sentences)) / 1000)
+		assert stats["saved_time"] >= 0
+		assert stats["saved_memory"] > 0
+		assert interner([]) == []
+
+	@pytest.mark.parametrize("max_size", [1, 3, 10])
+	def test_max_size(self, max_size):
+		rng = random.Random(max_size)
+		sentences = random_sentences(rng, 300, 20)
+		tokenizer = SplitTokenizer()
+		interner = SentenceInterner(tokenizer, max_size)
+		res = sum((interner(sentences[i:i + 7]) for i in range(0, len(sentences), 7)), [])
+		assert res == [sentence.split() for sentence in sentences]
+		assert len(interner._table) <= max_size
+		assert interner.get_stats()["distinct"] == len(tokenizer.tokenized)
+
+		with pytest.raises(ValueError):
+			SentenceInterner(tokenizer, 0)
+
+	def test_stats(self):
+		rng = random.Random(1)
+		sentences = random_sentences(rng, 200, 10)
+		interner = SentenceInterner(SplitTokenizer())
+		interner(sentences)
+
+		# the table is dropped when pickled, like an interner in a worker process
+		worker = pickle.loads(pickle.dumps(interner))
+		assert worker.get_stats()["sentences"] == 0
+		worker(sentences)
+		assert worker.get_stats()["distinct"] == len(set(sentences))
+
+		stats = interner.get_stats()
+		interner.add_stats(worker.pop_stats())
+		assert worker.get_stats()["sentences"] == 0
+		merged = interner.get_stats()
+		assert merged["sentences"] == 2 * stats["sentences"]
+		assert merged["distinct"] == 2 * stats["distinct"]
+		assert merged["saved_memory"] == 2 * stats["saved_memory"]
@@ -1,15 +1,19 @@
+import os
 import copy
 import random
 import operator
+import numpy as np
 import pytest
 from pytest_mock import mocker
 
-from cotk.dataloader import LanguageGeneration, MSCOCO
+from cotk.dataloader import LanguageGeneration, MSCOCO, RaggedArray
 from cotk.metric import MetricBase
 from cotk.dataloader import Dataloader
 from cotk.dataloader import LanguageProcessingBase
 
 from version_test_base import base_test_version
+from dataloader_test_base import DataloaderTestBase, MULTIPROCESSING_OPTIONS, DEDUP_OPTIONS, \
+	LAZY_OPTIONS, STREAMING_OPTIONS
 
 def setup_module():
 	import random
@@ -17,7 +21,7 @@ def setup_module():
 	import numpy as np
 	np.random.seed(0)
 
-class TestLanguageGeneration():
+class TestLanguageGeneration(DataloaderTestBase):
 	def base_test_init(self, dl):
 		assert isinstance(dl, LanguageGeneration)
 		assert isinstance(dl.ext_vocab, list)
@@ -38,7 +42,7 @@ class TestLanguageGeneration():
 		assert dl.all_vocab_size == len(dl.all_vocab_list)
 		for key in dl.key_name:
 			sentence = dl.data[key]['sent']
-			assert isinstance(sentence, list)
+			assert isinstance(sentence, RaggedArray)
 			assert isinstance(sentence[0], list)
 			assert sentence[0][0] == dl.go_id
 			assert sentence[0][-1] == dl.eos_id
@@ -193,6 +197,54 @@ class TestLanguageGeneration():
 		assert sent == dl.convert_ids_to_tokens(sent_id, trim=False)
 		assert not dl.convert_ids_to_tokens(sent_id)
 
+		assert dl.vocab.all_vocab_list is dl.all_vocab_list
+		assert dl.vocab.word2id is dl.word2id
+		batch = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		sents = [dl.convert_ids_to_tokens(sent_id) for sent_id in batch["sent_allvocabs"]]
+		assert dl.vocab.encode_batch(sents).tolist() == [dl.convert_tokens_to_ids(x) for x in sents]
+		assert dl.vocab.decode_batch(batch["sent_allvocabs"]).tolist() == \
+			[dl.convert_ids_to_tokens(sent_id, trim=False) for sent_id in batch["sent_allvocabs"]]
+
+	def base_test_trim_batch(self, dl):
+		batch = dl.get_batch(dl.key_name[0], list(range(10)))
+		sent_ids = batch["sent_allvocabs"]
+		assert dl.trim_batch(sent_ids) == [dl.trim(sent_id) for sent_id in sent_ids]
+		assert dl.convert_ids_to_tokens_batch(sent_ids) == \
+			[dl.convert_ids_to_tokens(sent_id) for sent_id in sent_ids]
+		assert dl.convert_ids_to_tokens_batch(sent_ids, trim=False) == \
+			[dl.convert_ids_to_tokens(sent_id, trim=False) for sent_id in sent_ids]
+
+		sent_ids = [[0, 1, 2, 3, 0, 1, 0, 0], [0, 0, 3], [3, 3, 3], [0, 0, 0], [2, 4, 0, 1]]
+		assert dl.trim_batch(sent_ids) == [dl.trim(sent_id) for sent_id in sent_ids]
+		sent_ids = [[0, 1, 2, 3, 0, 1], [0, 0, 3, 0, 0, 0], [3, 3, 3, 3, 3, 3], [0, 0, 0, 0, 0, 0], \
+			[2, 4, 0, 1, 0, 0]]
+		assert dl.trim_batch(np.array(sent_ids)) == [dl.trim(sent_id) for sent_id in sent_ids]
+		assert dl.convert_ids_to_tokens_batch(np.array(sent_ids)) == \
+			[dl.convert_ids_to_tokens(sent_id) for sent_id in sent_ids]
+		assert dl.trim_batch(np.zeros((2, 0), dtype=int)) == [[], []]
+
+	def base_test_batch_dtype(self, dl):
+		batch = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		assert batch["sent"].dtype == int and batch["sent_length"].dtype == int
+		dl.set_batch_dtype(id_dtype="auto", length_dtype=np.int16)
+		compact = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		assert compact["sent"].dtype == np.uint16
+		assert compact["sent_allvocabs"].dtype == np.uint16
+		assert compact["sent_length"].dtype == np.int16
+		for key in batch:
+			assert np.array_equal(batch[key], compact[key])
+		assert dl.trim_batch(compact["sent_allvocabs"]) == dl.trim_batch(batch["sent_allvocabs"])
+
+		dl.set_batch_dtype(length_dtype="auto")
+		assert dl.id_dtype == np.uint16 and dl.length_dtype == np.int32
+		with pytest.raises(TypeError):
+			dl.set_batch_dtype(id_dtype=np.float32)
+		with pytest.raises(TypeError):
+			dl.set_batch_dtype(length_dtype=float)
+		with pytest.raises(ValueError):
+			dl.set_batch_dtype(id_dtype=np.int8)
+		dl.set_batch_dtype(id_dtype=int, length_dtype=int)
+
 	def base_test_teacher_forcing_metric(self, dl):
 		assert isinstance(dl.get_teacher_forcing_metric(), MetricBase)
 
@@ -202,10 +254,104 @@ class TestLanguageGeneration():
 	def base_test_multi_runs(self, dl_list):
 		assert all(x.vocab_list == dl_list[0].vocab_list for x in dl_list)
 
+	def base_test_lazy(self, load_dl, cache_dir, mocker):
+		dl = load_dl()
+		dl_lazy = load_dl(lazy=True)
+		assert not any(dl_lazy.data.is_loaded(key) for key in dl.key_name)
+
+		key = dl.key_name[-1]
+		batch, expect = dl_lazy.get_batch(key, [0, 2]), dl.get_batch(key, [0, 2])
+		for name in expect:
+			assert np.array_equal(batch[name], expect[name])
+		assert [dl_lazy.data.is_loaded(name) for name in dl.key_name] == [name == key for name in dl.key_name]
+		dl_lazy.restart(dl.key_name[0], batch_size=2)
+		assert dl_lazy.data.is_loaded(dl.key_name[0])
+
+		dl_lazy = load_dl(streaming=True, lazy=True)
+		assert dl_lazy.get_batch(key, [0, 2])["sent"].tolist() == expect["sent"].tolist()
+
+		# the vocabulary and the tokenized splits are cached first, and each split is cached after it's loaded,
+		# which replaces its tokenized cache
+		dl_lazy = load_dl(cache_dir=cache_dir, lazy=True)
+		assert len(os.listdir(cache_dir)) == 1 + len(dl.key_name)
+		tokenize_batch = mocker.patch.object(dl.__class__, 'tokenize_batch')
+		assert dl_lazy.data[key] == dl.data[key]
+		assert not tokenize_batch.called
+		assert len(os.listdir(cache_dir)) == 1 + len(dl.key_name)
+		dl_cached = load_dl(cache_dir=cache_dir, lazy=True)
+		assert dl_cached.data[key] == dl.data[key]
+		assert not tokenize_batch.called
+		mocker.stopall()
+		assert dl_cached.all_vocab_list == dl.all_vocab_list
+		assert dl_cached.hash_value == dl.hash_value
+		assert load_dl(cache_dir=cache_dir, lazy=True).hash_value == dl.hash_value
+
+	def base_test_dedup(self, load_dl, capsys):
+		load_dl(dedup=True)
+		assert "dedup ratio" in capsys.readouterr().out
+
+	def base_test_bucket(self, dl, dl_copy):
+		for key in dl.key_name:
+			rng_state = random.getstate()
+			dl.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert random.getstate() == rng_state
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			dl_copy.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert dl_copy.index[key] == dl.index[key]
+
+			padding, size = 0, 0
+			for batch in dl.get_batches(key, shuffle=False):
+				padding += np.sum(batch["sent_allvocabs"] == dl.pad_id)
+				size += batch["sent_allvocabs"].size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+
+			random_ratio = dl.get_padding_ratio(key, index=np.random.permutation(dl.data_size[key]))
+			dl.restart(key, shuffle=False, bucket_size=dl.data_size[key])
+			assert dl.get_padding_ratio(key) <= random_ratio
+			sent_length = []
+			for batch in dl.get_batches(key, shuffle=False):
+				sent_length.extend(batch["sent_length"].tolist())
+			assert sent_length == sorted(sent_length)
+			assert [sent_length[i] for i in dl.get_restore_index(key)] == \
+				[len(sent) for sent in dl.data[key]['sent']]
+
+			assert len(list(dl.get_batches(key, 4, shuffle=True, bucket_size=8))) == \
+				(dl.data_size[key] + 3) // 4
+			dl_copy.restart(key, 4, shuffle=True, bucket_size=8)
+			assert dl_copy.index[key] == dl.index[key]
+
+	def base_test_max_tokens(self, dl):
+		for key in dl.key_name:
+			max_tokens = 40
+			batches = list(dl.get_batches(key, shuffle=True, max_tokens=max_tokens, max_batch_size=4))
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			assert sum(len(batch["sent_length"]) for batch in batches) == dl.data_size[key]
+			padding, size = 0, 0
+			for batch in batches:
+				assert len(batch["sent_length"]) <= 4
+				batch_size = sum(batch[name].size for name in ["sent_allvocabs"])
+				assert batch_size <= max_tokens or len(batch["sent_length"]) == 1
+				padding += sum(np.sum(batch[name] == dl.pad_id) for name in ["sent_allvocabs"])
+				size += batch_size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+			assert dl.get_next_batch(key) is None
+
+			dl.restart(key, shuffle=False, max_tokens=max_tokens)
+			lengths = []
+			for batch in iter(lambda: dl.get_next_batch(key), None):
+				assert sum(batch[name].size for name in ["sent_allvocabs"]) <= max_tokens or len(batch["sent_length"]) == 1
+				lengths.extend(batch["sent_length"].tolist())
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[len(element) for element in dl.data[key]['sent']]
+
+			dl.restart(key, batch_size=3, shuffle=False)
+			assert len(dl.get_next_batch(key)["sent_length"]) == min(3, dl.data_size[key])
+
+def _load_mscoco(invalid_vocab_times=0, **kwargs):
+	return MSCOCO("./tests/dataloader/dummy_mscoco#MSCOCO", invalid_vocab_times=invalid_vocab_times, **kwargs)
+
 @pytest.fixture
 def load_mscoco():
-	def _load_mscoco(invalid_vocab_times=0):
-		return MSCOCO("./tests/dataloader/dummy_mscoco#MSCOCO", invalid_vocab_times=invalid_vocab_times)
 	return _load_mscoco
 
 class TestMSCOCO(TestLanguageGeneration):
@@ -230,6 +376,12 @@ class TestMSCOCO(TestLanguageGeneration):
 	def test_convert(self, load_mscoco):
 		super().base_test_convert(load_mscoco())
 
+	def test_trim_batch(self, load_mscoco):
+		super().base_test_trim_batch(load_mscoco())
+
+	def test_batch_dtype(self, load_mscoco):
+		super().base_test_batch_dtype(load_mscoco())
+
 	def test_teacher_forcing_metric(self, load_mscoco):
 		super().base_test_teacher_forcing_metric(load_mscoco())
 
@@ -239,5 +391,39 @@ class TestMSCOCO(TestLanguageGeneration):
 	def test_init_multi_runs(self, load_mscoco):
 		super().base_test_multi_runs([load_mscoco() for i in range(3)])
 
+	def test_cache(self, load_mscoco, tmpdir, mocker):
+		super().base_test_cache(load_mscoco, str(tmpdir.join('cache')), mocker)
+
+	@pytest.mark.parametrize("options", MULTIPROCESSING_OPTIONS + DEDUP_OPTIONS + LAZY_OPTIONS + STREAMING_OPTIONS)
+	def test_load_options(self, load_mscoco, mocker, options):
+		super().base_test_load_options(load_mscoco, mocker, options)
+
+	def test_spawn(self, load_mscoco, mocker):
+		super().base_test_spawn(load_mscoco, mocker)
+
+	def test_streaming(self, load_mscoco, tmpdir, capsys):
+		super().base_test_streaming(load_mscoco, tmpdir, capsys)
+
+	def test_lazy(self, load_mscoco, tmpdir, mocker):
+		super().base_test_lazy(load_mscoco, str(tmpdir), mocker)
+
+	def test_dedup(self, load_mscoco, capsys):
+		super().base_test_dedup(load_mscoco, capsys)
+
+	def test_bucket(self, load_mscoco):
+		super().base_test_bucket(load_mscoco(), load_mscoco())
+
+	def test_max_tokens(self, load_mscoco):
+		super().base_test_max_tokens(load_mscoco())
+
+	def test_prefetch(self, load_mscoco):
+		super().base_test_prefetch(load_mscoco())
+
+	def test_all_batch(self, load_mscoco):
+		super().base_test_all_batch(load_mscoco())
+
+	def test_shard(self, load_mscoco):
+		super().base_test_shard(load_mscoco, 40)
+
 
 base_test_version(MSCOCO)
@@ -4,11 +4,12 @@ import pytest
 import random
 import operator
 import numpy as np
-from cotk.dataloader import MultiTurnDialog, UbuntuCorpus, SwitchboardCorpus
+from cotk.dataloader import MultiTurnDialog, UbuntuCorpus, SwitchboardCorpus, RaggedArray
 from cotk.metric import MetricBase
 from cotk.wordvector.gloves import Glove
 
 from version_test_base import base_test_version
+from dataloader_test_base import DataloaderTestBase, MULTIPROCESSING_OPTIONS, DEDUP_OPTIONS, LAZY_OPTIONS
 
 def setup_module():
 	import random
@@ -16,7 +17,7 @@ def setup_module():
 	import numpy as np
 	np.random.seed(0)
 
-class TestMultiTurnDialog():
+class TestMultiTurnDialog(DataloaderTestBase):
 	def base_test_init(self, dl):
 		assert isinstance(dl, MultiTurnDialog)
 		assert isinstance(dl.ext_vocab, list)
@@ -39,7 +40,7 @@ class TestMultiTurnDialog():
 		assert len(dl.data) >= 3
 		for key in dl.key_name:
 			assert isinstance(dl.data[key], dict)
-			assert isinstance(dl.data[key]['session'], list)
+			assert isinstance(dl.data[key]['session'], RaggedArray)
 			assert isinstance(dl.data[key]['session'][0], list)
 			content = dl.data[key]['session'][0][0]
 			assert content[0] == dl.go_id
@@ -207,6 +208,48 @@ class TestMultiTurnDialog():
 		assert [[1]] == dl.convert_multi_turn_tokens_to_ids(sent)
 		assert [[dl.vocab_size]] == dl.convert_multi_turn_tokens_to_ids(sent, invalid_vocab=True)
 
+	def base_test_multi_turn_trim_batch(self, dl):
+		batch = dl.get_batch(dl.key_name[0], dl.index[dl.key_name[0]])
+		sessions = batch["sent_allvocabs"]
+		turn_length = batch["turn_length"]
+		for length in [None, turn_length]:
+			for ignore_first_token in [False, True]:
+				assert dl.multi_turn_trim_batch(sessions, length, ignore_first_token) == \
+					[dl.multi_turn_trim(session, None if length is None else length[i], ignore_first_token) \
+						for i, session in enumerate(sessions)]
+				assert dl.convert_multi_turn_ids_to_tokens_batch(sessions, turn_length=length, \
+						ignore_first_token=ignore_first_token) == \
+					[dl.convert_multi_turn_ids_to_tokens(session, turn_length=None if length is None \
+						else length[i], ignore_first_token=ignore_first_token) for i, session in enumerate(sessions)]
+		assert dl.convert_multi_turn_ids_to_tokens_batch(sessions, trim=False) == \
+			[dl.convert_multi_turn_ids_to_tokens(session, trim=False) for session in sessions]
+
+		sessions = [[[0, 1, 2, 2, 0, 3, 1, 0, 0], [0, 3, 2], [1, 2, 2, 0], [1, 2, 2, 3]], [[2, 3], [2, 0]]]
+		assert dl.multi_turn_trim_batch(sessions) == [dl.multi_turn_trim(session) for session in sessions]
+		sessions = np.array([[[2, 4, 5, 3, 0], [2, 3, 0, 0, 0], [2, 4, 0, 0, 0]], \
+			[[2, 4, 3, 0, 0], [2, 5, 4, 0, 3], [0, 0, 0, 0, 0]]])
+		for length in [None, [2, 3], [0, 1]]:
+			for ignore_first_token in [False, True]:
+				assert dl.multi_turn_trim_batch(sessions, length, ignore_first_token) == \
+					[dl.multi_turn_trim(session, None if length is None else length[i], ignore_first_token) \
+						for i, session in enumerate(sessions)]
+
+	def base_test_batch_dtype(self, dl):
+		batch = dl.get_batch(dl.key_name[0], [0, 1])
+		dl.set_batch_dtype(id_dtype="auto", length_dtype="auto")
+		compact = dl.get_batch(dl.key_name[0], [0, 1])
+		assert compact["sent"].dtype == np.uint16
+		assert compact["sent_allvocabs"].dtype == np.uint16
+		assert compact["turn_length"].dtype == np.int32
+		for key in ["sent", "sent_allvocabs", "turn_length"]:
+			assert np.array_equal(batch[key], compact[key])
+		for lengths, compact_lengths in zip(batch["sent_length"], compact["sent_length"]):
+			assert compact_lengths.dtype == np.int32
+			assert np.array_equal(lengths, compact_lengths)
+		assert dl.multi_turn_trim_batch(compact["sent_allvocabs"], compact["turn_length"]) == \
+			dl.multi_turn_trim_batch(batch["sent_allvocabs"], batch["turn_length"])
+		dl.set_batch_dtype(id_dtype=int, length_dtype=int)
+
 	def base_test_teacher_forcing_metric(self, dl):
 		assert isinstance(dl.get_teacher_forcing_metric(), MetricBase)
 
@@ -216,10 +259,79 @@ class TestMultiTurnDialog():
 	def base_test_multi_runs(self, dl_list):
 		assert all(x.vocab_list == dl_list[0].vocab_list for x in dl_list)
 
+	def base_test_lazy(self, load_dl):
+		dl = load_dl()
+		dl_lazy = load_dl(lazy=True)
+		assert not any(dl_lazy.data.is_loaded(key) for key in dl.key_name)
+		for key in dl.key_name:
+			batch, expect = dl_lazy.get_batch(key, [0, 1]), dl.get_batch(key, [0, 1])
+			for name in ["sent", "sent_allvocabs", "turn_length"]:
+				assert np.array_equal(batch[name], expect[name])
+			assert dl_lazy.data.is_loaded(key)
+
+	def base_test_bucket(self, dl, dl_copy):
+		for key in dl.key_name:
+			rng_state = random.getstate()
+			dl.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert random.getstate() == rng_state
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			dl_copy.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert dl_copy.index[key] == dl.index[key]
+
+			padding, size = 0, 0
+			for batch in dl.get_batches(key, shuffle=False):
+				padding += np.sum(batch["sent_allvocabs"] == dl.pad_id)
+				size += batch["sent_allvocabs"].size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+
+			random_ratio = dl.get_padding_ratio(key, index=np.random.permutation(dl.data_size[key]))
+			dl.restart(key, shuffle=False, bucket_size=dl.data_size[key])
+			assert dl.get_padding_ratio(key) <= random_ratio
+			lengths = []
+			for batch in dl.get_batches(key, shuffle=False):
+				lengths.extend((turn_length, max(sent_length)) for turn_length, sent_length in \
+					zip(batch["turn_length"].tolist(), batch["sent_length"]))
+			assert lengths == sorted(lengths)
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[(len(session), max(map(len, session))) for session in dl.data[key]['session']]
+
+			assert len(list(dl.get_batches(key, 4, shuffle=True, bucket_size=8))) == \
+				(dl.data_size[key] + 3) // 4
+			dl_copy.restart(key, 4, shuffle=True, bucket_size=8)
+			assert dl_copy.index[key] == dl.index[key]
+
+	def base_test_max_tokens(self, dl):
+		for key in dl.key_name:
+			max_tokens = 400
+			batches = list(dl.get_batches(key, shuffle=True, max_tokens=max_tokens, max_batch_size=4))
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			assert sum(len(batch["turn_length"]) for batch in batches) == dl.data_size[key]
+			padding, size = 0, 0
+			for batch in batches:
+				assert len(batch["turn_length"]) <= 4
+				batch_size = sum(batch[name].size for name in ["sent_allvocabs"])
+				assert batch_size <= max_tokens or len(batch["turn_length"]) == 1
+				padding += sum(np.sum(batch[name] == dl.pad_id) for name in ["sent_allvocabs"])
+				size += batch_size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+			assert dl.get_next_batch(key) is None
+
+			dl.restart(key, shuffle=False, max_tokens=max_tokens)
+			lengths = []
+			for batch in iter(lambda: dl.get_next_batch(key), None):
+				assert sum(batch[name].size for name in ["sent_allvocabs"]) <= max_tokens or len(batch["turn_length"]) == 1
+				lengths.extend(batch["turn_length"].tolist())
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[len(element) for element in dl.data[key]['session']]
+
+			dl.restart(key, batch_size=3, shuffle=False)
+			assert len(dl.get_next_batch(key)["turn_length"]) == min(3, dl.data_size[key])
+
+def _load_ubuntucorpus(invalid_vocab_times=0, **kwargs):
+	return UbuntuCorpus("./tests/dataloader/dummy_ubuntucorpus#Ubuntu", invalid_vocab_times=invalid_vocab_times, **kwargs)
+
 @pytest.fixture
 def load_ubuntucorpus():
-	def _load_ubuntucorpus(invalid_vocab_times=0):
-		return UbuntuCorpus("./tests/dataloader/dummy_ubuntucorpus#Ubuntu", invalid_vocab_times=invalid_vocab_times)
 	return _load_ubuntucorpus
 
 class TestUbuntuCorpus(TestMultiTurnDialog):
@@ -246,6 +358,12 @@ class TestUbuntuCorpus(TestMultiTurnDialog):
 	def test_multi_turn_convert(self, load_ubuntucorpus):
 		super().base_test_multi_turn_convert(load_ubuntucorpus())
 
+	def test_multi_turn_trim_batch(self, load_ubuntucorpus):
+		super().base_test_multi_turn_trim_batch(load_ubuntucorpus())
+
+	def test_batch_dtype(self, load_ubuntucorpus):
+		super().base_test_batch_dtype(load_ubuntucorpus())
+
 	def test_teacher_forcing_metric(self, load_ubuntucorpus):
 		super().base_test_teacher_forcing_metric(load_ubuntucorpus())
 
@@ -255,10 +373,40 @@ class TestUbuntuCorpus(TestMultiTurnDialog):
 	def test_init_multi_runs(self, load_ubuntucorpus):
 		super().base_test_multi_runs([load_ubuntucorpus() for i in range(3)])
 
+	def test_cache(self, load_ubuntucorpus, tmpdir, mocker):
+		super().base_test_cache(load_ubuntucorpus, str(tmpdir.join('cache')), mocker)
+
+	@pytest.mark.parametrize("options", MULTIPROCESSING_OPTIONS + DEDUP_OPTIONS + LAZY_OPTIONS)
+	def test_load_options(self, load_ubuntucorpus, mocker, options):
+		super().base_test_load_options(load_ubuntucorpus, mocker, options)
+
+	def test_spawn(self, load_ubuntucorpus, mocker):
+		super().base_test_spawn(load_ubuntucorpus, mocker)
+
+	def test_bucket(self, load_ubuntucorpus):
+		super().base_test_bucket(load_ubuntucorpus(), load_ubuntucorpus())
+
+	def test_max_tokens(self, load_ubuntucorpus):
+		super().base_test_max_tokens(load_ubuntucorpus())
+
+	def test_prefetch(self, load_ubuntucorpus):
+		super().base_test_prefetch(load_ubuntucorpus())
+
+	def test_all_batch(self, load_ubuntucorpus):
+		super().base_test_all_batch(load_ubuntucorpus())
+
+	def test_shard(self, load_ubuntucorpus):
+		super().base_test_shard(load_ubuntucorpus, 400)
+
+	def test_lazy(self, load_ubuntucorpus):
+		super().base_test_lazy(load_ubuntucorpus)
+
+def _load_switchboardcorpus(invalid_vocab_times=0, **kwargs):
+	return SwitchboardCorpus("./tests/dataloader/dummy_switchboardcorpus#SwitchboardCorpus", invalid_vocab_times=invalid_vocab_times, \
+		**kwargs)
+
 @pytest.fixture
 def load_switchboardcorpus():
-	def _load_switchboardcorpus(invalid_vocab_times=0):
-		return SwitchboardCorpus("./tests/dataloader/dummy_switchboardcorpus#SwitchboardCorpus", invalid_vocab_times=invalid_vocab_times)
 	return _load_switchboardcorpus
 
 class TestSwitchboardCorpus(TestMultiTurnDialog):
@@ -309,6 +457,37 @@ class TestSwitchboardCorpus(TestMultiTurnDialog):
 	def test_init_multi_runs(self, load_switchboardcorpus):
 		super().base_test_multi_runs([load_switchboardcorpus() for i in range(3)])
 
+	@pytest.mark.parametrize("options", MULTIPROCESSING_OPTIONS + DEDUP_OPTIONS + LAZY_OPTIONS)
+	def test_load_options(self, load_switchboardcorpus, mocker, options):
+		super().base_test_load_options(load_switchboardcorpus, mocker, options)
+
+	def test_spawn(self, load_switchboardcorpus, mocker):
+		super().base_test_spawn(load_switchboardcorpus, mocker)
+
+	def test_bucket(self, load_switchboardcorpus):
+		super().base_test_bucket(load_switchboardcorpus(), load_switchboardcorpus())
+
+	def test_max_tokens(self, load_switchboardcorpus):
+		super().base_test_max_tokens(load_switchboardcorpus())
+
+	def test_prefetch(self, load_switchboardcorpus):
+		super().base_test_prefetch(load_switchboardcorpus())
+
+	def test_lazy(self, load_switchboardcorpus):
+		super().base_test_lazy(load_switchboardcorpus)
+
+		dl = load_switchboardcorpus(lazy=True)
+		dl.get_batch("train", [0])
+		assert not dl.data.is_loaded("multi_ref")
+		assert dl.data["multi_ref"]["candidate_allvocabs"] == \
+			load_switchboardcorpus().data["multi_ref"]["candidate_allvocabs"]
+
+	def test_all_batch(self, load_switchboardcorpus):
+		super().base_test_all_batch(load_switchboardcorpus())
+
+	def test_shard(self, load_switchboardcorpus):
+		super().base_test_shard(load_switchboardcorpus, 400)
+
 
 base_test_version(UbuntuCorpus)
 base_test_version(SwitchboardCorpus)
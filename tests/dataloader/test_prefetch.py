@@ -0,0 +1,53 @@
+import time
+import threading
+
+import pytest
+
+from cotk.dataloader.prefetch import PrefetchIterator
+
+class TestPrefetchIterator():
+	def test_order(self):
+		assert list(PrefetchIterator(lambda x, y: x * y, [(i, 2) for i in range(100)], 3)) == \
+			[i * 2 for i in range(100)]
+		assert list(PrefetchIterator(lambda x: x, [], 1)) == []
+		with pytest.raises(ValueError):
+			PrefetchIterator(lambda x: x, [], 0)
+
+	def test_bounded(self):
+		done = []
+		def func(x):
+			done.append(x)
+			return x
+		it = PrefetchIterator(func, ((i,) for i in range(100)), 2)
+		time.sleep(0.3)
+		# 2 results in the queue, and at most 1 result waiting for the queue
+		assert len(done) <= 3
+		assert next(it) == 0
+		time.sleep(0.3)
+		assert len(done) <= 4
+		it.close()
+
+	def test_close(self):
+		thread_num = threading.active_count()
+		it = PrefetchIterator(lambda x: x, ((i,) for i in range(100)), 2)
+		assert next(it) == 0
+		it.close()
+		assert threading.active_count() == thread_num
+		with pytest.raises(StopIteration):
+			next(it)
+
+		with PrefetchIterator(lambda x: x, ((i,) for i in range(100)), 2) as it:
+			assert next(it) == 0
+		assert threading.active_count() == thread_num
+
+	def test_exception(self):
+		def func(x):
+			if x == 3:
+				raise KeyError(x)
+			return x
+		it = PrefetchIterator(func, ((i,) for i in range(10)), 2)
+		assert [next(it) for _ in range(3)] == [0, 1, 2]
+		with pytest.raises(KeyError):
+			next(it)
+		with pytest.raises(StopIteration):
+			next(it)
@@ -0,0 +1,132 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from cotk.dataloader import RaggedArray
+from cotk.dataloader.ragged_array import RaggedArrayWriter, get_id_dtype, pad_sentences, pad_sessions
+
+SENTENCES = [[2, 4, 5, 3], [], [2, 3], [1] * 10, [7]]
+SESSIONS = [[[2, 4, 3], [2, 3]], [], [[2, 5, 6, 3]], [[], [7], [8, 9]]]
+
+class TestRaggedArray():
+	@pytest.mark.parametrize("elements, depth", [(SENTENCES, 1), (SESSIONS, 2)])
+	def test_from_list(self, elements, depth):
+		array = RaggedArray.from_list(elements, depth, np.uint16)
+		assert array.depth == depth
+		assert array.dtype == np.uint16
+		assert len(array) == len(elements)
+		assert list(array) == elements
+		assert array.tolist() == elements
+		assert [array[i] for i in range(len(elements))] == elements
+		assert array[-1] == elements[-1]
+		assert array[1:3] == elements[1:3]
+		assert array == elements
+		assert elements == array
+		assert array != elements[:-1]
+		assert array == RaggedArray.from_list(elements, depth)
+		assert list(array.get_lengths()) == [len(element) for element in elements]
+		assert list(array.get_lengths([2, 0])) == [len(elements[2]), len(elements[0])]
+		assert isinstance(array[0], list)
+		with pytest.raises(IndexError):
+			array[len(elements)]
+
+		assert pickle.loads(pickle.dumps(array)) == elements
+
+	@pytest.mark.parametrize("elements, depth", [(SENTENCES, 1), (SESSIONS, 2), ([], 1)])
+	def test_save_load(self, tmpdir, elements, depth):
+		path = str(tmpdir.join('data'))
+		RaggedArray.from_list(elements, depth).save(path)
+		array = RaggedArray.load(path)
+		assert isinstance(array.values, np.memmap)
+		assert array.tolist() == elements
+		assert pickle.loads(pickle.dumps(array)) == elements
+		assert RaggedArray.load(path, mmap_mode=None) == elements
+
+	def test_writer(self, tmpdir):
+		path = str(tmpdir.join('sent'))
+		with RaggedArrayWriter(path, np.uint16) as writer:
+			writer.extend(SENTENCES[:2])
+			writer.extend([])
+			writer.extend(SENTENCES[2:])
+		array = writer.close()
+		assert array.dtype == np.uint16
+		assert array.tolist() == SENTENCES
+		assert RaggedArray.load(path) == SENTENCES
+
+		assert RaggedArrayWriter(str(tmpdir.join('empty'))).close().tolist() == []
+
+	@pytest.mark.parametrize("elements, depth", [(SENTENCES, 1), (SESSIONS, 2)])
+	def test_take(self, tmpdir, elements, depth):
+		path = str(tmpdir.join('data'))
+		RaggedArray.from_list(elements, depth, np.uint16).save(path)
+		for array in [RaggedArray.from_list(elements, depth, np.uint16), RaggedArray.load(path)]:
+			for indexes in [[3, 0, -1], [1, 1], []]:
+				res = array.take(indexes)
+				assert res.depth == depth
+				assert res.dtype == np.uint16
+				assert res.tolist() == [elements[i] for i in indexes]
+
+	def test_split(self):
+		array = RaggedArray.from_list(SENTENCES)
+		res = array.split()
+		assert [x.tolist() for x in res] == SENTENCES
+		assert all(np.shares_memory(x, array.values) for x in res if len(x))
+		assert RaggedArray.from_list([]).split() == []
+		with pytest.raises(ValueError):
+			RaggedArray.from_list(SESSIONS, 2).split()
+
+	def test_pad_each(self):
+		res = RaggedArray.from_list(SESSIONS, 2).pad_each()
+		assert [x.shape for x in res] == [(2, 3), (0, 0), (1, 4), (3, 2)]
+		for padded, session in zip(res, SESSIONS):
+			assert np.array_equal(padded, pad_sentences_by_loop(session, range(len(session)))[0] \
+				if session else np.zeros((0, 0)))
+		assert RaggedArray.from_list([[], []], 2).pad_each()[1].shape == (0, 0)
+		with pytest.raises(ValueError):
+			RaggedArray.from_list(SENTENCES).pad_each()
+
+	def test_id_dtype(self):
+		assert get_id_dtype(100) == np.uint16
+		assert get_id_dtype(65536) == np.uint16
+		assert get_id_dtype(65537) == np.int32
+
+def pad_sentences_by_loop(sentences, indexes):
+	lengths = np.array([len(sentences[i]) for i in indexes], dtype=int)
+	res = np.zeros((len(indexes), np.max(lengths)), dtype=int)
+	for i, j in enumerate(indexes):
+		res[i, :len(sentences[j])] = sentences[j]
+	return res, lengths
+
+def pad_sessions_by_loop(sessions, indexes):
+	turn_lengths = np.array([len(sessions[i]) for i in indexes], dtype=int)
+	sent_lengths = [np.array([len(sent) for sent in sessions[i]], dtype=int) for i in indexes]
+	res = np.zeros((len(indexes), np.max(turn_lengths), max(max(x, default=0) for x in sent_lengths)), dtype=int)
+	for i, j in enumerate(indexes):
+		for k, sent in enumerate(sessions[j]):
+			res[i, k, :len(sent)] = sent
+	return res, turn_lengths, sent_lengths
+
+class TestPadding():
+	@pytest.mark.parametrize("indexes", [[0], [3, 1, 0], [1], [4, 4, -1, 2]])
+	def test_pad_sentences(self, tmpdir, indexes):
+		expect, expect_length = pad_sentences_by_loop(SENTENCES, indexes)
+		path = str(tmpdir.join('data'))
+		RaggedArray.from_list(SENTENCES, 1, np.uint16).save(path)
+		for sentences in [SENTENCES, RaggedArray.from_list(SENTENCES, 1, np.uint16), RaggedArray.load(path)]:
+			padded, length = pad_sentences(sentences, indexes)
+			assert padded.dtype == expect.dtype
+			assert np.array_equal(padded, expect)
+			assert np.array_equal(length, expect_length)
+
+	@pytest.mark.parametrize("indexes", [[0], [3, 1, 0], [2, 2, -1], [0, 1]])
+	def test_pad_sessions(self, indexes):
+		expect, expect_turn_length, expect_sent_length = pad_sessions_by_loop(SESSIONS, indexes)
+		for sessions in [SESSIONS, RaggedArray.from_list(SESSIONS, 2)]:
+			padded, turn_length, sent_length = pad_sessions(sessions, indexes)
+			assert padded.dtype == expect.dtype
+			assert np.array_equal(padded, expect)
+			assert np.array_equal(turn_length, expect_turn_length)
+			assert len(sent_length) == len(expect_sent_length)
+			for x, y in zip(sent_length, expect_sent_length):
+				assert np.array_equal(x, y)
@@ -0,0 +1,162 @@
+import numpy as np
+import pytest
+
+from cotk.dataloader import RaggedArray
+from cotk.dataloader.sampler import sentence_lengths, session_lengths, sort_by_length, \
+	bucket_by_length, batch_by_tokens, shuffle_batches, shard_index, shard_batches, restore_index, \
+	padding_ratio
+
+SENTENCES = [[2, 4, 5, 3], [], [2, 3], [1] * 10, [7]]
+SESSIONS = [[[2, 4, 3], [2, 3]], [], [[2, 5, 6, 3]], [[], [7], [8, 9]]]
+
+class TestSampler():
+	def test_lengths(self):
+		for sentences in [SENTENCES, RaggedArray.from_list(SENTENCES)]:
+			assert sentence_lengths(sentences).tolist() == [4, 0, 2, 10, 1]
+		for sessions in [SESSIONS, RaggedArray.from_list(SESSIONS, 2)]:
+			turn_length, max_sent_length, tokens = session_lengths(sessions)
+			assert turn_length.tolist() == [2, 0, 1, 3]
+			assert max_sent_length.tolist() == [3, 0, 4, 2]
+			assert tokens.tolist() == [5, 0, 4, 3]
+		for sessions in [[], RaggedArray.from_list([], 2)]:
+			assert [x.tolist() for x in session_lengths(sessions)] == [[], [], []]
+
+	def test_sort(self):
+		keys = [np.array([3, 1, 3, 2, 1]), np.array([0, 5, 0, 1, 4])]
+		assert sort_by_length(keys).tolist() == [4, 1, 3, 0, 2]
+		assert sort_by_length(keys[:1]).tolist() == [1, 4, 3, 0, 2]
+		assert sort_by_length(keys, 2).tolist() == [1, 0, 3, 2, 4]
+
+	@pytest.mark.parametrize("size, batch_size, bucket_size", [(100, 8, 32), (100, 8, 1000), (5, 8, 8), (0, 3, 6)])
+	def test_bucket(self, size, batch_size, bucket_size):
+		lengths = np.random.RandomState(1).randint(1, 50, size)
+		index = bucket_by_length([lengths], batch_size, bucket_size, np.random.RandomState(0))
+		assert sorted(index.tolist()) == list(range(size))
+		assert index.tolist() == bucket_by_length([lengths], batch_size, bucket_size, \
+			np.random.RandomState(0)).tolist()
+		if size > batch_size:
+			assert index.tolist() != bucket_by_length([lengths], batch_size, bucket_size, \
+				np.random.RandomState(1)).tolist()
+
+		shapes = [lengths[:, None]]
+		random_index = np.random.RandomState(0).permutation(size)
+		assert padding_ratio(shapes, lengths, index, batch_size) <= \
+			padding_ratio(shapes, lengths, random_index, batch_size)
+		if bucket_size >= size:
+			# batches are cut from sorted samples
+			batches = sorted(sorted(lengths[index[i:i + batch_size]]) for i in range(0, size, batch_size))
+			for batch, next_batch in zip(batches[:-1], batches[1:]):
+				assert batch[-1] <= next_batch[0]
+
+	@pytest.mark.parametrize("max_tokens, max_batch_size", [(100, None), (100, 4), (30, None), (1, None)])
+	def test_batch_by_tokens(self, max_tokens, max_batch_size):
+		lengths = np.random.RandomState(1).randint(1, 50, 100)
+		turn_length = np.random.RandomState(2).randint(1, 5, 100)
+		shapes = [lengths[:, None], np.stack([turn_length, lengths], axis=1)]
+		index = np.random.RandomState(0).permutation(100)
+		offsets = batch_by_tokens(shapes, index, max_tokens, max_batch_size)
+		assert offsets[0] == 0 and offsets[-1] == 100
+		for start, end in zip(offsets[:-1], offsets[1:]):
+			batch = index[start:end]
+			assert 0 < len(batch) <= (max_batch_size or 100)
+			size = len(batch) * (np.max(lengths[batch]) + np.max(turn_length[batch]) * np.max(lengths[batch]))
+			assert size <= max_tokens or len(batch) == 1
+			# batches are packed greedily
+			if end < 100 and len(batch) < (max_batch_size or 100):
+				batch = index[start:end + 1]
+				assert len(batch) * (np.max(lengths[batch]) + \
+					np.max(turn_length[batch]) * np.max(lengths[batch])) > max_tokens
+
+		sorted_index = sort_by_length([turn_length, lengths])
+		assert len(batch_by_tokens(shapes, sorted_index, max_tokens, max_batch_size)) <= len(offsets)
+		assert batch_by_tokens(shapes, [], max_tokens).tolist() == [0]
+		with pytest.raises(ValueError):
+			batch_by_tokens(shapes, index, 0)
+
+	@pytest.mark.parametrize("max_tokens, max_batch_size", [(5000, None), (5000, 32), (50, None)])
+	def test_batch_by_tokens_large(self, max_tokens, max_batch_size):
+		rng = np.random.RandomState(0)
+		size = 200000
+		lengths = rng.randint(0, 100, size)
+		turn_length = rng.randint(1, 10, size)
+		shapes = [lengths[:, None], np.stack([turn_length, lengths], axis=1)]
+		for index in [rng.permutation(size), sort_by_length([turn_length, lengths])]:
+			offsets = batch_by_tokens(shapes, index, max_tokens, max_batch_size)
+			starts, batch_sizes = offsets[:-1], np.diff(offsets)
+			assert offsets[0] == 0 and offsets[-1] == size
+			assert np.all(batch_sizes > 0) and np.all(batch_sizes <= (max_batch_size or size))
+
+			max_length = np.maximum.reduceat(lengths[index], starts)
+			max_turn_length = np.maximum.reduceat(turn_length[index], starts)
+			cost = batch_sizes * (max_length + max_turn_length * max_length)
+			assert np.all((cost <= max_tokens) | (batch_sizes == 1))
+			# batches are packed greedily: the next sample doesn't fit in the batch
+			next_sample = index[offsets[1:-1]]
+			next_length = np.maximum(max_length[:-1], lengths[next_sample])
+			next_cost = (batch_sizes[:-1] + 1) * (next_length + \
+				np.maximum(max_turn_length[:-1], turn_length[next_sample]) * next_length)
+			# a batch has at most ``max_tokens`` samples, even if they are empty
+			assert np.all((next_cost > max_tokens) | (batch_sizes[:-1] == min(max_batch_size or size, max_tokens)))
+
+	def test_shuffle_batches(self):
+		index, offsets = np.arange(10), np.array([0, 3, 4, 8, 10])
+		new_index, new_offsets = shuffle_batches(index, offsets, np.random.RandomState(0))
+		batches = [new_index[start:end].tolist() for start, end in zip(new_offsets[:-1], new_offsets[1:])]
+		assert sorted(batches) == [[0, 1, 2], [3], [4, 5, 6, 7], [8, 9]]
+		assert shuffle_batches([], np.array([0]), np.random.RandomState(0))[1].tolist() == [0]
+
+	@pytest.mark.parametrize("size, world_size, batch_size", [(100, 3, 4), (10, 4, 8), (2, 3, 1), (0, 2, 2)])
+	def test_shard_index(self, size, world_size, batch_size):
+		index = np.random.RandomState(0).permutation(size)
+		shards = [shard_index(index, rank, world_size, batch_size).tolist() for rank in range(world_size)]
+		assert len(set(map(len, shards))) == 1
+		assert len(shards[0]) == -(-size // world_size)
+		assert sorted(set(sum(shards, []))) == list(range(size))
+
+		shards = [shard_index(index, rank, world_size, batch_size, False).tolist() for rank in range(world_size)]
+		assert len(set(map(len, shards))) == 1
+		assert sorted(sum(shards, [])) == sorted(index[:size // world_size * world_size].tolist())
+
+		# samples of a step in all processes are adjacent in ``index``
+		if size >= world_size * batch_size:
+			assert sorted(sum([shard[:batch_size] for shard in shards], [])) == \
+				sorted(index[:world_size * batch_size].tolist())
+
+	@pytest.mark.parametrize("world_size", [1, 2, 3, 7])
+	def test_shard_batches(self, world_size):
+		index, offsets = np.arange(10), np.array([0, 3, 4, 8, 10])
+		for pad in [True, False]:
+			batches = []
+			for rank in range(world_size):
+				shard, shard_offsets = shard_batches(index, offsets, rank, world_size, pad)
+				assert shard_offsets[-1] == len(shard)
+				batches.append([shard[start:end].tolist() for start, end in \
+					zip(shard_offsets[:-1], shard_offsets[1:])])
+			assert len(set(map(len, batches))) == 1
+			if pad:
+				assert len(batches[0]) == -(-4 // world_size)
+				assert sorted(set(map(tuple, sum(batches, [])))) == [(0, 1, 2), (3,), (4, 5, 6, 7), (8, 9)]
+			else:
+				assert len(batches[0]) == 4 // world_size
+				assert len(set(map(tuple, sum(batches, [])))) == 4 // world_size * world_size
+
+	def test_restore(self):
+		index = [3, 0, 4, 1, 2]
+		outputs = [x * 10 for x in index]
+		assert [outputs[i] for i in restore_index(index)] == [0, 10, 20, 30, 40]
+
+	def test_padding_ratio(self):
+		lengths = np.array([1, 2, 3, 4, 5])
+		shapes = [lengths[:, None]]
+		assert padding_ratio(shapes, lengths, [0, 1, 2, 3, 4], 2) == pytest.approx(1 - 15 / 17)
+		assert padding_ratio(shapes, lengths, [0, 1, 2, 3, 4], 2, True) == pytest.approx(1 - 10 / 12)
+		assert padding_ratio(shapes, lengths, [0, 1, 2, 3, 4], 5) == pytest.approx(1 - 15 / 25)
+		assert padding_ratio(shapes, lengths, [], 2) == 0
+		assert padding_ratio(shapes, lengths, [0, 1, 2, 3, 4], np.array([0, 1, 4, 5])) == \
+			pytest.approx(1 - 15 / (1 + 3 * 4 + 5))
+		assert padding_ratio([lengths[:, None], lengths[:, None]], lengths * 2, [4, 0], 2) == \
+			pytest.approx(1 - 12 / 20)
+
+		turn_length, max_sent_length, tokens = session_lengths(SESSIONS)
+		shapes = [np.stack([turn_length, max_sent_length], axis=1)]
+		assert padding_ratio(shapes, tokens, [0, 2, 3, 1], 2) == pytest.approx(1 - 12 / (2 * 2 * 4 + 2 * 3 * 2))
@@ -4,10 +4,12 @@ import pytest
 from pytest_mock import mocker
 import random
 import operator
-from cotk.dataloader import SentenceClassification, SST
+import numpy as np
+from cotk.dataloader import SentenceClassification, SST, RaggedArray
 from cotk.metric import MetricBase
 
 from version_test_base import base_test_version
+from dataloader_test_base import DataloaderTestBase, MULTIPROCESSING_OPTIONS
 
 
 def setup_module():
@@ -16,7 +18,7 @@ def setup_module():
 	import numpy as np
 	np.random.seed(0)
 
-class TestSentenceClassification():
+class TestSentenceClassification(DataloaderTestBase):
 	def base_test_init(self, dl):
 		assert isinstance(dl, SentenceClassification)
 		assert isinstance(dl.ext_vocab, list)
@@ -39,6 +41,7 @@ class TestSentenceClassification():
 			sent = dl.data[key]['sent']
 			label = dl.data[key]['label']
 			assert len(sent) == len(label)
+			assert isinstance(sent, RaggedArray)
 			assert isinstance(sent[0], list)
 			assert isinstance(label[0], int)
 			assert sent[0][0] == dl.go_id
@@ -179,10 +182,68 @@ class TestSentenceClassification():
 	def base_test_multi_runs(self, dl_list):
 		assert all(x.vocab_list == dl_list[0].vocab_list for x in dl_list)
 
+	def base_test_bucket(self, dl, dl_copy):
+		for key in dl.key_name:
+			rng_state = random.getstate()
+			dl.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert random.getstate() == rng_state
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			dl_copy.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert dl_copy.index[key] == dl.index[key]
+
+			padding, size = 0, 0
+			for batch in dl.get_batches(key, shuffle=False):
+				padding += np.sum(batch["sent_allvocabs"] == dl.pad_id)
+				size += batch["sent_allvocabs"].size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+
+			random_ratio = dl.get_padding_ratio(key, index=np.random.permutation(dl.data_size[key]))
+			dl.restart(key, shuffle=False, bucket_size=dl.data_size[key])
+			assert dl.get_padding_ratio(key) <= random_ratio
+			sent_length = []
+			for batch in dl.get_batches(key, shuffle=False):
+				sent_length.extend(batch["sent_length"].tolist())
+			assert sent_length == sorted(sent_length)
+			assert [sent_length[i] for i in dl.get_restore_index(key)] == \
+				[len(sent) for sent in dl.data[key]['sent']]
+
+			assert len(list(dl.get_batches(key, 4, shuffle=True, bucket_size=8))) == \
+				(dl.data_size[key] + 3) // 4
+			dl_copy.restart(key, 4, shuffle=True, bucket_size=8)
+			assert dl_copy.index[key] == dl.index[key]
+
+	def base_test_max_tokens(self, dl):
+		for key in dl.key_name:
+			max_tokens = 40
+			batches = list(dl.get_batches(key, shuffle=True, max_tokens=max_tokens, max_batch_size=4))
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			assert sum(len(batch["sent_length"]) for batch in batches) == dl.data_size[key]
+			padding, size = 0, 0
+			for batch in batches:
+				assert len(batch["sent_length"]) <= 4
+				batch_size = sum(batch[name].size for name in ["sent_allvocabs"])
+				assert batch_size <= max_tokens or len(batch["sent_length"]) == 1
+				padding += sum(np.sum(batch[name] == dl.pad_id) for name in ["sent_allvocabs"])
+				size += batch_size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+			assert dl.get_next_batch(key) is None
+
+			dl.restart(key, shuffle=False, max_tokens=max_tokens)
+			lengths = []
+			for batch in iter(lambda: dl.get_next_batch(key), None):
+				assert sum(batch[name].size for name in ["sent_allvocabs"]) <= max_tokens or len(batch["sent_length"]) == 1
+				lengths.extend(batch["sent_length"].tolist())
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[len(element) for element in dl.data[key]['sent']]
+
+			dl.restart(key, batch_size=3, shuffle=False)
+			assert len(dl.get_next_batch(key)["sent_length"]) == min(3, dl.data_size[key])
+
+def _load_sst(invalid_vocab_times=0, **kwargs):
+	return SST("./tests/dataloader/dummy_sst#SST", invalid_vocab_times=invalid_vocab_times, **kwargs)
+
 @pytest.fixture
 def load_sst():
-	def _load_sst(invalid_vocab_times=0):
-		return SST("./tests/dataloader/dummy_sst#SST", invalid_vocab_times=invalid_vocab_times)
 	return _load_sst
 
 class TestSST(TestSentenceClassification):
@@ -213,5 +274,30 @@ class TestSST(TestSentenceClassification):
 	def test_init_multi_runs(self, load_sst):
 		super().base_test_multi_runs([load_sst() for i in range(3)])
 
+	def test_cache(self, load_sst, tmpdir, mocker):
+		super().base_test_cache(load_sst, str(tmpdir.join('cache')), mocker)
+
+	@pytest.mark.parametrize("options", MULTIPROCESSING_OPTIONS)
+	def test_load_options(self, load_sst, mocker, options):
+		super().base_test_load_options(load_sst, mocker, options)
+
+	def test_spawn(self, load_sst, mocker):
+		super().base_test_spawn(load_sst, mocker)
+
+	def test_bucket(self, load_sst):
+		super().base_test_bucket(load_sst(), load_sst())
+
+	def test_max_tokens(self, load_sst):
+		super().base_test_max_tokens(load_sst())
+
+	def test_prefetch(self, load_sst):
+		super().base_test_prefetch(load_sst())
+
+	def test_all_batch(self, load_sst):
+		super().base_test_all_batch(load_sst())
+
+	def test_shard(self, load_sst):
+		super().base_test_shard(load_sst, 40)
+
 
 base_test_version(SST)
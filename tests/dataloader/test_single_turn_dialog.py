@@ -4,10 +4,13 @@ import pytest
 from pytest_mock import mocker
 import random
 import operator
-from cotk.dataloader import SingleTurnDialog, OpenSubtitles
+import numpy as np
+from cotk.dataloader import SingleTurnDialog, OpenSubtitles, RaggedArray
 from cotk.metric import MetricBase
 
 from version_test_base import base_test_version
+from dataloader_test_base import DataloaderTestBase, MULTIPROCESSING_OPTIONS, DEDUP_OPTIONS, \
+	LAZY_OPTIONS, STREAMING_OPTIONS
 
 
 def setup_module():
@@ -16,7 +19,7 @@ def setup_module():
 	import numpy as np
 	np.random.seed(0)
 
-class TestSingleTurnDialog():
+class TestSingleTurnDialog(DataloaderTestBase):
 	def base_test_init(self, dl):
 		assert isinstance(dl, SingleTurnDialog)
 		assert isinstance(dl.ext_vocab, list)
@@ -39,6 +42,8 @@ class TestSingleTurnDialog():
 			post = dl.data[key]['post']
 			resp = dl.data[key]['resp']
 			assert len(post) == len(resp)
+			assert isinstance(post, RaggedArray)
+			assert isinstance(resp, RaggedArray)
 			assert isinstance(post[0], list)
 			assert isinstance(resp[0], list)
 			assert post[0][0] == dl.go_id
@@ -180,6 +185,23 @@ class TestSingleTurnDialog():
 		assert sent == dl.convert_ids_to_tokens(sent_id, trim=False)
 		assert not dl.convert_ids_to_tokens(sent_id)
 
+	def base_test_batch_dtype(self, dl):
+		batch = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		dl.set_batch_dtype(id_dtype=np.int32, length_dtype=np.int32)
+		compact = dl.get_batch(dl.key_name[0], [0, 1, 2])
+		for key in batch:
+			assert compact[key].dtype == np.int32
+			assert np.array_equal(batch[key], compact[key])
+
+		results = []
+		for data in [batch, compact]:
+			metric = dl.get_inference_metric()
+			data["gen"] = data["resp_allvocabs"][:, 1:]
+			metric.forward(data)
+			results.append(metric.close())
+		assert results[0] == results[1]
+		dl.set_batch_dtype(id_dtype=int, length_dtype=int)
+
 	def base_test_teacher_forcing_metric(self, dl):
 		assert isinstance(dl.get_teacher_forcing_metric(), MetricBase)
 
@@ -189,10 +211,69 @@ class TestSingleTurnDialog():
 	def base_test_multi_runs(self, dl_list):
 		assert all(x.vocab_list == dl_list[0].vocab_list for x in dl_list)
 
+	def base_test_bucket(self, dl, dl_copy):
+		for key in dl.key_name:
+			rng_state = random.getstate()
+			dl.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert random.getstate() == rng_state
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			dl_copy.restart(key, batch_size=3, shuffle=True, bucket_size=6)
+			assert dl_copy.index[key] == dl.index[key]
+
+			padding, size = 0, 0
+			for batch in dl.get_batches(key, shuffle=False):
+				for name in ["post_allvocabs", "resp_allvocabs"]:
+					padding += np.sum(batch[name] == dl.pad_id)
+					size += batch[name].size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+
+			random_ratio = dl.get_padding_ratio(key, index=np.random.permutation(dl.data_size[key]))
+			dl.restart(key, shuffle=False, bucket_size=dl.data_size[key])
+			assert dl.get_padding_ratio(key) <= random_ratio
+			lengths = []
+			for batch in dl.get_batches(key, shuffle=False):
+				lengths.extend(zip(batch["post_length"].tolist(), batch["resp_length"].tolist()))
+			assert lengths == sorted(lengths)
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[(len(post), len(resp)) for post, resp in zip(dl.data[key]['post'], dl.data[key]['resp'])]
+
+			assert len(list(dl.get_batches(key, 4, shuffle=True, bucket_size=8))) == \
+				(dl.data_size[key] + 3) // 4
+			dl_copy.restart(key, 4, shuffle=True, bucket_size=8)
+			assert dl_copy.index[key] == dl.index[key]
+
+	def base_test_max_tokens(self, dl):
+		for key in dl.key_name:
+			max_tokens = 40
+			batches = list(dl.get_batches(key, shuffle=True, max_tokens=max_tokens, max_batch_size=4))
+			assert sorted(dl.index[key]) == list(range(dl.data_size[key]))
+			assert sum(len(batch["post_length"]) for batch in batches) == dl.data_size[key]
+			padding, size = 0, 0
+			for batch in batches:
+				assert len(batch["post_length"]) <= 4
+				batch_size = sum(batch[name].size for name in ["post_allvocabs", "resp_allvocabs"])
+				assert batch_size <= max_tokens or len(batch["post_length"]) == 1
+				padding += sum(np.sum(batch[name] == dl.pad_id) for name in ["post_allvocabs", "resp_allvocabs"])
+				size += batch_size
+			assert dl.get_padding_ratio(key) == pytest.approx(padding / size)
+			assert dl.get_next_batch(key) is None
+
+			dl.restart(key, shuffle=False, max_tokens=max_tokens)
+			lengths = []
+			for batch in iter(lambda: dl.get_next_batch(key), None):
+				assert sum(batch[name].size for name in ["post_allvocabs", "resp_allvocabs"]) <= max_tokens or len(batch["post_length"]) == 1
+				lengths.extend(batch["post_length"].tolist())
+			assert [lengths[i] for i in dl.get_restore_index(key)] == \
+				[len(element) for element in dl.data[key]['post']]
+
+			dl.restart(key, batch_size=3, shuffle=False)
+			assert len(dl.get_next_batch(key)["post_length"]) == min(3, dl.data_size[key])
+
+def _load_opensubtitles(invalid_vocab_times=0, **kwargs):
+	return OpenSubtitles("./tests/dataloader/dummy_opensubtitles#OpenSubtitles", invalid_vocab_times=invalid_vocab_times, **kwargs)
+
 @pytest.fixture
 def load_opensubtitles():
-	def _load_opensubtitles(invalid_vocab_times=0):
-		return OpenSubtitles("./tests/dataloader/dummy_opensubtitles#OpenSubtitles", invalid_vocab_times=invalid_vocab_times)
 	return _load_opensubtitles
 
 class TestOpenSubtitles(TestSingleTurnDialog):
@@ -217,6 +298,9 @@ class TestOpenSubtitles(TestSingleTurnDialog):
 	def test_convert(self, load_opensubtitles):
 		super().base_test_convert(load_opensubtitles())
 
+	def test_batch_dtype(self, load_opensubtitles):
+		super().base_test_batch_dtype(load_opensubtitles())
+
 	def test_teacher_forcing_metric(self, load_opensubtitles):
 		super().base_test_teacher_forcing_metric(load_opensubtitles())
 
@@ -226,5 +310,33 @@ class TestOpenSubtitles(TestSingleTurnDialog):
 	def test_init_multi_runs(self, load_opensubtitles):
 		super().base_test_multi_runs([load_opensubtitles() for i in range(3)])
 
+	def test_cache(self, load_opensubtitles, tmpdir, mocker):
+		super().base_test_cache(load_opensubtitles, str(tmpdir.join('cache')), mocker)
+
+	@pytest.mark.parametrize("options", MULTIPROCESSING_OPTIONS + DEDUP_OPTIONS + LAZY_OPTIONS + STREAMING_OPTIONS)
+	def test_load_options(self, load_opensubtitles, mocker, options):
+		super().base_test_load_options(load_opensubtitles, mocker, options)
+
+	def test_spawn(self, load_opensubtitles, mocker):
+		super().base_test_spawn(load_opensubtitles, mocker)
+
+	def test_streaming(self, load_opensubtitles, tmpdir, capsys):
+		super().base_test_streaming(load_opensubtitles, tmpdir, capsys)
+
+	def test_bucket(self, load_opensubtitles):
+		super().base_test_bucket(load_opensubtitles(), load_opensubtitles())
+
+	def test_max_tokens(self, load_opensubtitles):
+		super().base_test_max_tokens(load_opensubtitles())
+
+	def test_prefetch(self, load_opensubtitles):
+		super().base_test_prefetch(load_opensubtitles())
+
+	def test_all_batch(self, load_opensubtitles):
+		super().base_test_all_batch(load_opensubtitles())
+
+	def test_shard(self, load_opensubtitles):
+		super().base_test_shard(load_opensubtitles, 80)
+
 
 base_test_version(OpenSubtitles)
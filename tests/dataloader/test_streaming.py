@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from cotk.dataloader.streaming import shuffle_buffer, ShuffleBufferIndex, ShardIndex
+from cotk.dataloader.sampler import shard_index
+
+class TestShuffleBuffer():
+	def test_shuffle_buffer(self):
+		res = list(shuffle_buffer(range(100), 10, random.Random(0)))
+		assert sorted(res) == list(range(100))
+		assert res != list(range(100))
+		# an element can't be yielded before it's read
+		for i, element in enumerate(res[:90]):
+			assert element < i + 10
+
+		assert list(shuffle_buffer(range(5), 10, random.Random(0))) != []
+		assert list(shuffle_buffer([], 10, random.Random(0))) == []
+
+	def test_index(self):
+		index = ShuffleBufferIndex(23, 4, 1229)
+		order = list(index)
+		assert len(index) == 23
+		assert sorted(order) == list(range(23))
+		assert list(index) == order
+		assert ShuffleBufferIndex(23, 4, 1229) == index
+		assert ShuffleBufferIndex(23, 4, 1) != index
+
+		assert index[0:5] == order[0:5]
+		assert index[5:10] == order[5:10]
+		assert index[15:30] == order[15:30]
+		assert index[0:3] == order[0:3]
+		assert [index[i] for i in range(23)] == order
+		assert index[-1] == order[-1] and index[3] == order[3]
+		with pytest.raises(IndexError):
+			index[23]
+		with pytest.raises(TypeError):
+			index[::2]
+		with pytest.raises(TypeError):
+			index["3"]
+
+	@pytest.mark.parametrize("size, world_size, batch_size", [(23, 3, 2), (23, 4, 3), (5, 3, 4), (2, 3, 1), (0, 2, 2)])
+	def test_shard_index(self, size, world_size, batch_size):
+		index = ShuffleBufferIndex(size, 4, 1229)
+		for pad in [True, False]:
+			for rank in range(world_size):
+				expect = shard_index(list(index), rank, world_size, batch_size, pad).tolist()
+				shard = ShardIndex(index, rank, world_size, batch_size, pad)
+				assert len(shard) == len(expect)
+				assert list(shard) == expect
+				assert [shard[i] for i in range(len(shard))] == expect
+				assert shard[1:4] == expect[1:4]
+				assert list(ShardIndex(range(size), rank, world_size, batch_size, pad)) == \
+					shard_index(range(size), rank, world_size, batch_size, pad).tolist()
+		with pytest.raises(IndexError):
+			ShardIndex(index, 0, world_size, batch_size)[size]
+		with pytest.raises(TypeError):
+			ShardIndex(index, 0, world_size, batch_size)[::2]
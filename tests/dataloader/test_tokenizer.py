@@ -0,0 +1,83 @@
+import os
+import glob
+
+import pytest
+from nltk.tokenize import WordPunctTokenizer
+
+from cotk.dataloader import MSCOCO, UbuntuCorpus, SwitchboardCorpus, SST, \
+	Tokenizer, RegexTokenizer, SpaceTokenizer, register_tokenizer, get_tokenizer
+
+DUMMY_DIRS = glob.glob("./tests/dataloader/dummy_*")
+
+def raw_lines():
+	lines = ["Hello, world!", "  it's   a\ttest...  ", "", " ", "naïve café — ¿qué? 中文，标点。", \
+		"e.g. $3.50/hr; a_b-c d'e", "<unk> <go>"]
+	for dirname in DUMMY_DIRS:
+		for name in sorted(os.listdir(dirname)):
+			path = os.path.join(dirname, name)
+			if os.path.isfile(path):
+				with open(path, encoding='utf-8') as f_file:
+					lines.extend(f_file.read().split('\n'))
+	return lines
+
+class TestTokenizer():
+	def test_nltk(self):
+		lines = raw_lines()
+		nltk_tokenizer = WordPunctTokenizer()
+		tokenizer = get_tokenizer('nltk')
+		expect = [nltk_tokenizer.tokenize(line) for line in lines]
+		assert [tokenizer.tokenize(line) for line in lines] == expect
+		assert tokenizer.tokenize_batch(lines) == expect
+
+	def test_space(self):
+		lines = raw_lines()
+		tokenizer = get_tokenizer('space')
+		expect = [line.split() for line in lines]
+		assert [tokenizer.tokenize(line) for line in lines] == expect
+		assert tokenizer.tokenize_batch(lines) == expect
+
+	def test_register(self):
+		class CharTokenizer(Tokenizer):
+			def tokenize(self, sentence):
+				return list(sentence.replace(" ", ""))
+		register_tokenizer("char", CharTokenizer())
+		assert get_tokenizer("char").tokenize_batch(["a b", "cd"]) == [["a", "b"], ["c", "d"]]
+		register_tokenizer("digits", RegexTokenizer(r"\d+"))
+		assert get_tokenizer("digits").tokenize("a1b22") == ["1", "22"]
+		assert isinstance(get_tokenizer("space"), SpaceTokenizer)
+
+		with pytest.raises(TypeError):
+			register_tokenizer("bad", str.split)
+		with pytest.raises(ValueError):
+			get_tokenizer("not_exist")
+
+def nltk_reference(lines, remains_capital):
+	if not remains_capital:
+		lines = [line.lower() for line in lines]
+	return [WordPunctTokenizer().tokenize(line.strip()) for line in lines]
+
+def processed_lines(dl):
+	lines = []
+	for key in dl.key_name:
+		with open("%s/%s.txt" % (dl._file_path, key), encoding='utf-8') as f_file:
+			lines.extend(f_file.read().split('\n'))
+	return lines
+
+@pytest.mark.parametrize("load_dl, reference", [
+	(lambda: MSCOCO("./tests/dataloader/dummy_mscoco#MSCOCO"), \
+		lambda lines: nltk_reference(lines, True)),
+	(lambda: MSCOCO("./tests/dataloader/dummy_mscoco#MSCOCO", remains_capital=False), \
+		lambda lines: nltk_reference(lines, False)),
+	(lambda: UbuntuCorpus("./tests/dataloader/dummy_ubuntucorpus#Ubuntu"), \
+		lambda lines: nltk_reference(lines, False)),
+	(lambda: SwitchboardCorpus("./tests/dataloader/dummy_switchboardcorpus#SwitchboardCorpus"), \
+		lambda lines: nltk_reference(lines, True)),
+	(lambda: SST("./tests/dataloader/dummy_sst#SST"), \
+		lambda lines: [line.strip().split() for line in lines]),
+])
+def test_dataloader_tokenize(load_dl, reference):
+	dl = load_dl()
+	lines = processed_lines(dl)
+	expect = reference(lines)
+	assert dl.tokenize_batch(lines) == expect
+	assert [dl.tokenize(line) for line in lines] == expect
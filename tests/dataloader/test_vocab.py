@@ -0,0 +1,95 @@
+import pickle
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from cotk.dataloader import Vocab, RaggedArray
+from cotk.dataloader.vocab import VocabBuilder
+
+def get_vocab_by_sort(counter, min_times, exclude=()):
+	vocab = sorted(counter.most_common(), key=lambda pair: (-pair[1], pair[0]))
+	return [x[0] for x in vocab if x[1] >= min_times and x[0] not in exclude]
+
+def random_tokens(rng, size):
+	return [rng.choice("abcdefghijklmnopqrstuvwxyz") * rng.randint(1, 3) for _ in range(size)]
+
+class TestVocabBuilder():
+	@pytest.mark.parametrize("min_times", [0, 1, 5, 20, 1000])
+	def test_get_vocab(self, min_times):
+		rng = random.Random(0)
+		datasets = {key: random_tokens(rng, 1000) for key in ["train", "dev", "test"]}
+		builder = VocabBuilder()
+		for key, tokens in datasets.items():
+			builder.count(key, tokens)
+
+		assert builder.get_vocab(min_times, ["train"]) == get_vocab_by_sort(Counter(datasets["train"]), min_times)
+		all_counter = Counter(sum(datasets.values(), []))
+		assert builder.get_counter() == all_counter
+		assert builder.get_vocab(min_times) == get_vocab_by_sort(all_counter, min_times)
+		exclude = set(builder.get_vocab(min_times, ["train"])[:5])
+		assert builder.get_vocab(min_times, exclude=exclude) == get_vocab_by_sort(all_counter, min_times, exclude)
+		for max_size in [0, 3, 10000]:
+			assert builder.get_vocab(min_times, max_size=max_size) == \
+				get_vocab_by_sort(all_counter, min_times)[:max_size]
+
+	def test_merge(self):
+		rng = random.Random(0)
+		chunks = [random_tokens(rng, 100) for _ in range(10)]
+		expect = VocabBuilder()
+		for chunk in chunks:
+			expect.count("train", chunk)
+
+		# counters of chunks, e.g. produced by worker processes, are merged in any order
+		builders = []
+		for chunk in chunks:
+			builder = VocabBuilder()
+			builder.count("train", chunk)
+			builders.append(pickle.loads(pickle.dumps(builder)))
+		rng.shuffle(builders)
+		merged = VocabBuilder()
+		for builder in builders:
+			assert merged.merge(builder) is merged
+		assert merged.get_vocab(2) == expect.get_vocab(2)
+
+		merged = VocabBuilder()
+		for chunk in reversed(chunks):
+			merged.update("train", Counter(chunk))
+		assert merged.get_counter(["train"]) == expect.get_counter(["train"])
+
+	def test_empty(self):
+		builder = VocabBuilder()
+		assert builder.get_vocab(0) == []
+		assert builder.get_vocab(0, ["train"]) == []
+		builder.count("train", ["a", "b", "a"])
+		assert builder.get_vocab(1, ["train", "test"]) == ["a", "b"]
+
+ALL_VOCAB_LIST = ["<pad>", "<unk>", "<go>", "<eos>", "I", "have", "been", "to", "China", "Japan"]
+
+class TestVocab():
+	def test_encode(self):
+		vocab = Vocab(ALL_VOCAB_LIST, 7)
+		assert len(vocab) == 10
+		assert vocab.word2id["China"] == 8
+		sent = ["<go>", "I", "have", "been", "to", "China", "<eos>", "Korea"]
+		assert vocab.encode(sent) == [2, 4, 5, 6, 1, 1, 3, 1]
+		assert vocab.encode(sent, invalid_vocab=True) == [2, 4, 5, 6, 7, 8, 3, 1]
+		assert vocab.encode([]) == []
+
+		sents = [sent, [], ["Japan", "I"]]
+		for invalid_vocab in [False, True]:
+			res = vocab.encode_batch(sents, invalid_vocab)
+			assert isinstance(res, RaggedArray)
+			assert res.tolist() == [vocab.encode(x, invalid_vocab) for x in sents]
+		assert vocab.encode_batch([]).tolist() == []
+
+	def test_decode(self):
+		vocab = Vocab(ALL_VOCAB_LIST, 7)
+		assert vocab.decode([2, 4, 9, 0]) == ["<go>", "I", "Japan", "<pad>"]
+		assert vocab.decode(np.array([8, 3])) == ["China", "<eos>"]
+		ids = np.array([[[2, 4, 9], [3, 0, 0]], [[5, 6, 7], [1, 1, 1]]])
+		res = vocab.decode_batch(ids)
+		assert res.shape == ids.shape
+		assert res.tolist() == [[vocab.decode(sent) for sent in session] for session in ids]
+		assert vocab.decode_batch(np.zeros((2, 0), dtype=int)).tolist() == [[], []]
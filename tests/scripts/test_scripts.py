@@ -43,6 +43,7 @@ class TestScripts():
 	def test_import_local_resources(self):
 		shutil.copyfile('./tests/_utils/dummy_coai/test.json', './cotk/resource_config/test.json')
 
-		dispatch('import', ['resources://test', './tests/_utils/data/test.zip'])
-
-		os.remove('./cotk/resource_config/test.json')
+		try:
+			dispatch('import', ['resources://test', './tests/_utils/data/test.zip'])
+		finally:
+			os.remove('./cotk/resource_config/test.json')